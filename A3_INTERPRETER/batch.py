@@ -0,0 +1,78 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from interpreter import Parser, SyntaxError, check_types, tokenize_file
+from tokenfile import SyntaxOnlyParser, lex_text_stream
+
+# Batch mode: check many program files in parallel and print a pass/fail line per file.
+# Each worker lexes, parses and type-checks (without running) one file at a time; files are handed
+# to the workers in chunks so the per-task overhead of the process pool stays small.
+# Token dumps from the A2 parser (*_lex.txt) have no identifier names or number values, so they are
+# only checked for syntax, as the interpreter does.
+
+
+def expand(patterns, extension='.txt'):
+    # Directories contribute their *.txt files, anything else is treated as a glob pattern
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, '*' + extension))))
+        else:
+            paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+def check_file(path):
+    # Returns (path, passed, message, number of tokens scanned)
+    tokens = parser = None
+    try:
+        if path.endswith('_lex.txt'):
+            tokens = lex_text_stream(path)
+            parser = SyntaxOnlyParser(tokens)
+            parser.program()
+        else:
+            tokens = tokenize_file(path)
+            parser = Parser(tokens)
+            check_types(parser.program())
+        passed, message = True, "Parsing successful."
+    except SyntaxError as e:
+        # Every error in the file, one per line
+        errors = parser.errors if parser is not None and parser.errors else [e]
+        passed, message = False, '\n    '.join(f"Syntax error: {error}" for error in errors)
+    except Exception as e:
+        # Type errors and the like carry their own prefix
+        passed, message = False, str(e)
+    # A failed parse stops early; count only what was scanned rather than scanning the rest
+    return path, passed, message, len(tokens.kinds) if tokens is not None else 0
+
+
+def run_batch(patterns, jobs=None, chunksize=None):
+    """
+    Check every file matched by patterns across a pool of worker processes.
+    Prints one line per file and a throughput summary; returns 0 if every file passed, else 1.
+    """
+    paths = expand(patterns)
+    if not paths:
+        print("No files matched.")
+        return 1
+    jobs = jobs or os.cpu_count() or 1
+    if chunksize is None:
+        # A few chunks per worker balances the load without paying per-file dispatch costs
+        chunksize = max(1, len(paths) // (jobs * 4))
+
+    start = time.perf_counter()
+    passed = 0
+    total_tokens = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for path, ok, message, token_count in executor.map(check_file, paths, chunksize=chunksize):
+            passed += ok
+            total_tokens += token_count
+            print(f"{'PASS' if ok else 'FAIL'} {path}" + ('' if ok else f": {message}"))
+    elapsed = time.perf_counter() - start
+
+    failed = len(paths) - passed
+    print(f"{len(paths)} files: {passed} passed, {failed} failed in {elapsed:.2f} s "
+          f"({len(paths) / elapsed:,.0f} files/s, {total_tokens / elapsed:,.0f} tokens/s, {jobs} workers)")
+    return 0 if failed == 0 else 1
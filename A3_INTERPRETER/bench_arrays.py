@@ -0,0 +1,61 @@
+import argparse
+import time
+import tracemalloc
+
+from interpreter import Evaluator, Parser, tokenize
+from vm import VM, Compiler
+
+# Benchmark: fill a large array in a loop and check that peak memory stays within a fixed budget.
+# Elements live in a typed buffer (8 bytes each), so the budget is a small multiple of the raw data size.
+
+
+def fill_program(size):
+    return (
+        "Program Fill {\n"
+        f"int a[{size}];\n"
+        "int i;\n"
+        "int total;\n"
+        f"while ( i < {size} ) {{\n"
+        "    a[i] = i * 2;\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "total = a[0] + a[" + str(size - 1) + "];\n"
+        "}\n"
+    )
+
+
+def run_backend(backend, program):
+    if backend == 'vm':
+        bytecode = Compiler().compile(program)
+        return VM().run(bytecode)
+    return Evaluator().run(program)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Array fill benchmark with a memory budget.")
+    arg_parser.add_argument('--size', type=int, default=1000000, help="number of array elements")
+    arg_parser.add_argument('--budget-mb', type=float, default=16.0, help="allowed peak memory while running")
+    arg_parser.add_argument('--backend', choices=['ast', 'vm', 'both'], default='both')
+    args = arg_parser.parse_args()
+
+    program = Parser(tokenize(fill_program(args.size))).program()
+    backends = ['ast', 'vm'] if args.backend == 'both' else [args.backend]
+    failed = False
+    for backend in backends:
+        start = time.perf_counter()
+        run_backend(backend, program)
+        elapsed = time.perf_counter() - start
+        # Measure memory on a second run; tracing every allocation would distort the timing
+        tracemalloc.start()
+        symbol_table = run_backend(backend, program)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        total = symbol_table.lookup('total').value
+        expected = 2 * (args.size - 1)
+        peak_mb = peak / (1024 * 1024)
+        within = peak_mb <= args.budget_mb and total == expected
+        failed |= not within
+        print(f"{backend:<4} {args.size:>9} elements  {elapsed:7.2f} s  {args.size / elapsed:>12,.0f} iterations/s  "
+              f"peak {peak_mb:6.1f} MB of {args.budget_mb:.1f} MB  {'ok' if within else 'FAILED'}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+import time
+
+from service import Client, serve
+
+# Latency under concurrency for the asyncio service: many clients send a mix of short programs and
+# a few long-running ones to a local server, and the latency of each request is measured from the
+# client. Runs once with the default yielding interval and once with yielding effectively turned
+# off, where every short program queued behind a long one has to wait for it to finish.
+
+SHORT = """Program Short {
+int i;
+int s;
+while ( i < 200 ) {
+    s = s + i * 2;
+    i = i + 1;
+}
+}
+"""
+
+LONG = """Program Long {
+int i;
+int s;
+float f[64];
+while ( i < 100000 ) {
+    s = s + i / 3;
+    f[i - i / 64 * 64] = f[i - i / 64 * 64] + 0.5;
+    i = i + 1;
+}
+}
+"""
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def client_session(port, requests, long_fraction, rng, latencies, backend):
+    client = await Client.connect(port=port)
+    try:
+        for _ in range(requests):
+            kind = 'long' if rng.random() < long_fraction else 'short'
+            start = time.perf_counter()
+            response = await client.run(LONG if kind == 'long' else SHORT, backend)
+            latencies[kind].append(time.perf_counter() - start)
+            assert response['ok'], response
+    finally:
+        await client.close()
+
+
+async def measure(port, clients, requests, long_fraction, interval, backend, seed):
+    server = asyncio.create_task(serve(port=port, interval=interval))
+    await asyncio.sleep(0.1)  # let the server start listening
+    latencies = {'short': [], 'long': []}
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client_session(port, requests, long_fraction, random.Random(rng.random()),
+                                              latencies, backend)
+                               for _ in range(clients)))
+    finally:
+        server.cancel()
+    return latencies, time.perf_counter() - start
+
+
+def print_latencies(label, latencies, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    print(f"{label}: {total} requests in {elapsed:.2f} s ({total / elapsed:,.0f} requests/s)")
+    for kind, values in latencies.items():
+        if values:
+            print(f"  {kind:<6} n={len(values):<5} " + '  '.join(
+                f"p{int(fraction * 100)} {percentile(values, fraction) * 1000:8.2f} ms"
+                for fraction in (0.5, 0.9, 0.99)) + f"  max {max(values) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Latency percentiles of concurrent programs on one event loop.")
+    arg_parser.add_argument('--clients', type=int, default=100, help="concurrent connections")
+    arg_parser.add_argument('--requests', type=int, default=10, help="requests per client")
+    arg_parser.add_argument('--long', type=float, default=0.01, help="fraction of long-running programs")
+    arg_parser.add_argument('--interval', type=int, default=1000, help="loop iterations between turns of the event loop")
+    arg_parser.add_argument('--backend', choices=['vm', 'python'], default='vm')
+    arg_parser.add_argument('--port', type=int, default=8766)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    for label, interval in ((f"yielding every {args.interval} iterations", args.interval),
+                            ("without yielding", 10 ** 18)):
+        latencies, elapsed = asyncio.run(measure(args.port, args.clients, args.requests, args.long, interval,
+                                                 args.backend, args.seed))
+        print_latencies(label, latencies, elapsed)
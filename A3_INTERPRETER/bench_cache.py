@@ -0,0 +1,49 @@
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from cache import CompilationCache
+
+# Benchmark for the compilation cache: load a corpus of generated programs twice, once into an
+# empty cache (every load lexes and parses) and once more from the filled cache (every load hits).
+
+
+def generate_program(index, statements):
+    rng = random.Random(index)
+    names = [f"v{i}" for i in range(20)]
+    lines = [f"Program P{index} {{"]
+    lines += [f"int {name};" for name in names]
+    for _ in range(statements):
+        target, left, right = rng.choice(names), rng.choice(names), rng.choice(names)
+        lines.append(f"{target} = ( {left} + {rng.randint(0, 99)} ) * {right} - {rng.randint(0, 99)};")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def load_corpus(cache, corpus):
+    start = time.perf_counter()
+    for source in corpus:
+        cache.load_program(source)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Cold vs warm compilation cache benchmark.")
+    arg_parser.add_argument('--programs', type=int, default=200, help="number of programs in the corpus")
+    arg_parser.add_argument('--statements', type=int, default=500, help="statements per program")
+    args = arg_parser.parse_args()
+
+    corpus = [generate_program(i, args.statements) for i in range(args.programs)]
+    directory = tempfile.mkdtemp(prefix='a3_cache_')
+    try:
+        cold_cache = CompilationCache(directory)
+        cold = load_corpus(cold_cache, corpus)
+        warm_cache = CompilationCache(directory)
+        warm = load_corpus(warm_cache, corpus)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"cold {cold:7.3f} s  ({cold_cache.hits} hits, {cold_cache.misses} misses)")
+    print(f"warm {warm:7.3f} s  ({warm_cache.hits} hits, {warm_cache.misses} misses)  {cold / warm:5.1f}x faster")
@@ -0,0 +1,82 @@
+import argparse
+import random
+import time
+
+from incremental import Document
+from interpreter import Parser, tokenize
+
+# Benchmark for incremental reparsing: make small edits to a large program, as typing in an editor
+# would, and compare the time per edit with relexing and reparsing the whole buffer.
+
+
+def generate_program(blocks):
+    lines = ["Program Edit {", "int a;", "int b;", "int c[16];"]
+    for i in range(blocks):
+        lines.append(f"while ( a < {i} ) {{")
+        lines.append("    int t;")
+        lines.append(f"    t = a * {i % 7 + 1} + b;")
+        lines.append(f"    c[{i % 16}] = t - {i};")
+        lines.append("    a = a + 1;")
+        lines.append("}")
+        lines.append(f"b = b + {i};")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def edits(source, count, rng, burst=20):
+    # Bursts of edits around one place, as when typing: replace a digit with another digit, or
+    # insert a statement in front of a top-level one
+    cursor = 0
+    for i in range(count):
+        if i % burst == 0:
+            cursor = rng.randrange(len(source))
+        offset = cursor
+        if rng.random() < 0.5:
+            while not source[offset].isdigit():
+                offset = (offset + 1) % len(source)
+            edit = (offset, 1, str(rng.randrange(10)))
+        else:
+            offset = source.find("\nb = ", offset)
+            if offset < 0:
+                offset = source.find("\nb = ")
+            edit = (offset + 1, 0, "a = b;\n")
+        source = source[:edit[0]] + edit[2] + source[edit[0] + edit[1]:]
+        yield edit
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Incremental vs full reparse benchmark.")
+    arg_parser.add_argument('--blocks', type=int, default=5000, help="loops in the generated program")
+    arg_parser.add_argument('--edits', type=int, default=200)
+    arg_parser.add_argument('--burst', type=int, default=20, help="edits made around the same place in a row")
+    args = arg_parser.parse_args()
+
+    source = generate_program(args.blocks)
+    changes = list(edits(source, args.edits, random.Random(0), args.burst))
+
+    document = Document(source)
+    relexed = reparsed = 0
+    start = time.perf_counter()
+    for offset, deleted, inserted in changes:
+        diagnostics = document.edit(offset, deleted, inserted)
+        assert not diagnostics, diagnostics
+        relexed += document.relexed
+        reparsed += document.reparsed
+    incremental = (time.perf_counter() - start) / len(changes)
+
+    # The edited document must match a fresh parse of the final text
+    assert repr(Parser(tokenize(document.source)).program()) == repr(document.program)
+
+    # Full reparses are slow, so only time the first few edits
+    sample = changes[:20]
+    start = time.perf_counter()
+    for offset, deleted, inserted in sample:
+        source = source[:offset] + inserted + source[offset + deleted:]
+        Parser(tokenize(source)).program()
+    full = (time.perf_counter() - start) / len(sample)
+
+    print(f"{len(document.tokens):,} tokens, {len(changes)} edits")
+    print(f"full        {full * 1000:9.3f} ms/edit")
+    print(f"incremental {incremental * 1000:9.3f} ms/edit  "
+          f"({relexed / len(changes):.1f} tokens relexed, {reparsed / len(changes):.1f} reparsed per edit)  "
+          f"{full / incremental:6.1f}x faster")
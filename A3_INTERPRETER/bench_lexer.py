@@ -0,0 +1,113 @@
+import argparse
+import re
+import time
+
+from interpreter import lexer, tokenize
+
+# Benchmark: tokens per second of lexer(), which yields Token objects, against the original named-group
+# regex lexer, and of tokenize(), which fills a TokenStream instead (what the parser uses).
+
+# The original lexer, kept here as the baseline
+LEGACY_TOKEN_TYPES = {
+    'WHITESPACE': r'\s+',
+    'PROGRAM': r'Program',
+    'NUM': r'\d+',
+    'TYPE': r'\bint\b|\bfloat\b|\bvoid\b',
+    'ADDOP': r'\+|-',
+    'MULOP': r'\*|/',
+    'RELOP': r'<=|>=|>|<|==|!=',
+    "ASSIGN": r'=',
+    'IF': r'if',
+    'ELSE': r'else',
+    'WHILE': r'while',
+    'SEMI': r';',
+    'COMMA': r',',
+    'LPAREN': r'\(',
+    'RPAREN': r'\)',
+    'LBRACKET': r'\[',
+    'RBRACKET': r'\]',
+    'LBRACE': r'\{',
+    'RBRACE': r'\}',
+    'ID': r'[a-zA-Z_]\w*'
+}
+
+legacy_token_pattern = '|'.join('(?P<%s>%s)' % pair for pair in LEGACY_TOKEN_TYPES.items())
+
+class LegacyToken:
+    def __init__(self, type, value, line_no = None, char_pos = None):
+        self.type = type
+        self.value = value
+        self.line_no = line_no
+        self.char_pos = char_pos
+
+def legacy_lexer(code):
+    lineno = 1
+    line_start = 0
+    for mo in re.finditer(legacy_token_pattern, code):
+        kind = mo.lastgroup
+        value = mo.group(kind)
+        char_pos = mo.start() - line_start
+        if kind == 'WHITESPACE':
+            newline_count = value.count('\n')
+            if newline_count > 0:
+                line_start = mo.end() - value.rfind('\n') - 1
+                lineno += newline_count
+            continue
+        yield LegacyToken(kind, value, lineno, char_pos)
+
+
+def generate_source(size_mb):
+    # Integer-only code with identifiers that do not start with a keyword, so both lexers agree
+    declarations = ''.join(f"    int v{i};\n" for i in range(50))
+    block = (
+        "    v1 = ( v2 + 35 ) * ( v3 - 7 ) / 2;\n"
+        "    if ( v4 >= v5 ) {\n"
+        "        v6 = v6 + 1;\n"
+        "    } else {\n"
+        "        v7 = v7 - 1;\n"
+        "    }\n"
+        "    while ( v8 != 100 ) v8 = v8 + 1;\n"
+    )
+    target = int(size_mb * 1024 * 1024)
+    body = block * max(1, (target - len(declarations)) // len(block))
+    return "Program Bench {\n" + declarations + body + "}\n"
+
+
+def count_tokens(lex):
+    # A function lexing code and returning the number of tokens
+    return lambda code: sum(1 for _ in lex(code))
+
+
+def time_lexer(count_tokens, code, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = count_tokens(code)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare lexer throughput against the original lexer.")
+    arg_parser.add_argument('--size-mb', type=float, default=4.0, help="size of the generated source")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per lexer; the best time is reported")
+    args = arg_parser.parse_args()
+
+    code = generate_source(args.size_mb)
+    print(f"Source: {len(code) / (1024 * 1024):.1f} MB")
+
+    # Sanity check: both lexers must produce the same token sequence on this input
+    for new, old in zip(lexer(code[:100000]), legacy_lexer(code[:100000])):
+        if (new.type, new.value) != (old.type, old.value):
+            raise SystemExit(f"Lexers disagree: {new} vs {old.type} {old.value!r}")
+
+    results = {}
+    for name, count_function in [('legacy', count_tokens(legacy_lexer)), ('lexer', count_tokens(lexer)),
+                                 ('tokenize', lambda code: len(tokenize(code)))]:
+        count, elapsed = time_lexer(count_function, code, args.repeat)
+        results[name] = count / elapsed
+        print(f"{name:<8} {count:>10} tokens  {elapsed:8.3f} s  {count / elapsed:>12,.0f} tokens/s")
+    for name in ('lexer', 'tokenize'):
+        print(f"Speedup of {name}: {results[name] / results['legacy']:.2f}x")
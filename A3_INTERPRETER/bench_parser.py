@@ -0,0 +1,58 @@
+import argparse
+import time
+
+from interpreter import Evaluator, Parser, tokenize
+
+# Stress benchmark for the parser: very long declaration lists and very deeply nested expressions and
+# statements, all of which used to exceed Python's recursion limit. Deeply nested programs are also
+# run, type checking and evaluation included, since those passes recurse over the AST.
+
+
+def many_declarations(count):
+    declarations = ''.join(f"int v{i};\n" for i in range(count))
+    return "Program Decls {\n" + declarations + "v0 = 1;\n}\n"
+
+
+def deep_parentheses(depth):
+    # x = ((...((1 + 1) - 1) * 1 ...) + 1); one operator per level, so the AST is as deep as the nesting
+    expression = "1"
+    for level in range(depth):
+        expression = f"({expression} {'+-*'[level % 3]} 1)"
+    return "Program Parens {\nint x;\nx = " + expression + ";\n}\n"
+
+
+def deep_indexes(depth):
+    # a[a[a[...a[0]...]]]
+    expression = "a[" * depth + "0" + "]" * depth
+    return "Program Indexes {\nint a[10];\nint x;\nx = " + expression + ";\n}\n"
+
+
+def deep_blocks(depth):
+    # if (x < 1) { if (x < 1) { ... x = 1; ... } }
+    return "Program Blocks {\nint x;\n" + "if (x < 1) {\n" * depth + "x = 1;\n" + "}\n" * depth + "}\n"
+
+
+def time_parse(name, code, run=False):
+    start = time.perf_counter()
+    tokens = tokenize(code)
+    lexed = time.perf_counter()
+    program = Parser(tokens).program()
+    parsed = time.perf_counter()
+    line = (f"{name:<32} {len(tokens):>9} tokens  lex {lexed - start:7.3f} s  parse {parsed - lexed:7.3f} s  "
+            f"{len(tokens) / (parsed - lexed):>10,.0f} tokens/s")
+    if run:
+        Evaluator().run(program)
+        line += f"  run {time.perf_counter() - parsed:7.3f} s"
+    print(line)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parser stress benchmark.")
+    arg_parser.add_argument('--declarations', type=int, default=100000)
+    arg_parser.add_argument('--depth', type=int, default=10000)
+    args = arg_parser.parse_args()
+
+    time_parse(f"{args.declarations} declarations", many_declarations(args.declarations))
+    time_parse(f"{args.depth}-deep parentheses", deep_parentheses(args.depth), run=True)
+    time_parse(f"{args.depth}-deep array indexes", deep_indexes(args.depth), run=True)
+    time_parse(f"{args.depth}-deep if blocks", deep_blocks(args.depth), run=True)
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark: startup cost of short-lived interpreter processes, for a small program.
+#
+# Time to first token is measured from just before a process is spawned to the moment it holds the
+# program's first token, which the child reports by printing time.time(). The children load the
+# lexer the way each entry point does: `python interpreter.py` compiles the whole script from source
+# (scripts are never loaded from cached bytecode) and imports argparse before it lexes anything;
+# cli.py imports interpreter as a module, from cached bytecode. Then whole runs of both entry points
+# are timed end to end, and runs sent to a warm `cli.py --serve` server over a Unix socket, both from
+# a new client process each time and from one client that stays connected.
+#
+# Children write and use cached bytecode in a temporary directory, as an installed copy would, even if
+# PYTHONDONTWRITEBYTECODE is set here. --baseline runs another copy of interpreter.py as "the script",
+# e.g. one checked out from an older revision.
+
+PROGRAM = """Program Small {
+int a;
+int b;
+int c;
+a = 10;
+b = 20;
+c = a + b;
+if (a >= b) {
+    c = a;
+}
+}
+"""
+
+# Child processes for time to first token; argv is the program file (and the script to load)
+SCRIPT_FIRST_TOKEN = """
+import sys, time
+import argparse
+with open(sys.argv[2]) as f:
+    code = compile(f.read(), sys.argv[2], 'exec')
+namespace = {'__name__': 'interpreter'}
+exec(code, namespace)
+with open(sys.argv[1]) as f:
+    source = f.read()
+if 'tokenize' in namespace:
+    namespace['tokenize'](source).kinds[0]
+else:
+    # Older revisions, such as the baseline, only have the lexer generator
+    next(namespace['lexer'](source))
+print(time.time())
+"""
+
+MODULE_FIRST_TOKEN = """
+import sys, time
+from interpreter import tokenize
+with open(sys.argv[1]) as f:
+    tokenize(f.read()).kinds[0]
+print(time.time())
+"""
+
+
+def child_environment(pycache):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPYCACHEPREFIX'] = pycache
+    env['PYTHONPATH'] = os.path.dirname(os.path.abspath(__file__))
+    return env
+
+
+def first_token(command, env, repeat):
+    times = []
+    for _ in range(repeat + 1):  # the first run fills the bytecode cache
+        start = time.time()
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        times.append(float(output) - start)
+    return times[1:]
+
+
+def wall_time(command, env, repeat, stdin=None):
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times[1:]
+
+
+def connected_client(socket_path, repeat):
+    # Requests from one client that stays connected: the server's own latency
+    request = json.dumps({'source': PROGRAM, 'backend': 'vm'}).encode() + b'\n'
+    times = []
+    with socket.socket(socket.AF_UNIX) as connection:
+        connection.connect(socket_path)
+        responses = connection.makefile('rb')
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            connection.sendall(request)
+            assert json.loads(responses.readline())['ok']
+            times.append(time.perf_counter() - start)
+    return times[1:]
+
+
+def wait_for_socket(path, seconds=10):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX) as connection:
+                connection.connect(path)
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start listening on {path}")
+
+
+def report(label, times):
+    times = sorted(times)
+    print(f"{label:<40} min {times[0] * 1000:7.2f} ms  median {times[len(times) // 2] * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Startup time of the interpreter entry points.")
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    arg_parser.add_argument('--baseline', metavar='PATH', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interpreter.py'),
+                            help="interpreter.py to measure as the script (default: this one)")
+    args = arg_parser.parse_args()
+    here = os.path.dirname(os.path.abspath(__file__))
+    python = sys.executable
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = child_environment(os.path.join(directory, 'pycache'))
+        program = os.path.join(directory, 'program.txt')
+        with open(program, 'w') as f:
+            f.write(PROGRAM)
+
+        print("time to first token")
+        report("  python interpreter.py (script)", first_token([python, '-c', SCRIPT_FIRST_TOKEN, program, args.baseline], env, args.repeat))
+        report("  python cli.py (cached module)", first_token([python, '-c', MODULE_FIRST_TOKEN, program], env, args.repeat))
+        report("  python -c pass (interpreter startup)", wall_time([python, '-c', 'pass'], env, args.repeat))
+
+        print("whole run, new process each time")
+        report("  python interpreter.py FILE", wall_time([python, args.baseline, program], env, args.repeat))
+        report("  python cli.py FILE", wall_time([python, os.path.join(here, 'cli.py'), program], env, args.repeat))
+
+        socket_path = os.path.join(directory, 'a3.sock')
+        server = subprocess.Popen([python, os.path.join(here, 'cli.py'), '--serve', '--socket', socket_path],
+                                  env=env, stdout=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path)
+            print("warm server")
+            report("  python cli.py --socket PATH FILE",
+                   wall_time([python, os.path.join(here, 'cli.py'), '--socket', socket_path, program], env, args.repeat))
+            report("  request from a connected client", connected_client(socket_path, args.repeat))
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from generate import generate_program
+from interpreter import Evaluator, Parser, tokenize
+from pycodegen import PythonCompiler
+from vm import VM, Compiler
+
+# Benchmark suite for the whole pipeline over generated programs.
+# For each configuration it times lexing (tokenize), Parser.program() and
+# execution on each backend, best of a few repeats, and measures the peak memory of one full
+# run. Results are saved as JSON so two revisions can be compared:
+#   python bench_suite.py --output before.json
+#   (change something)
+#   python bench_suite.py --output after.json --compare before.json
+
+CONFIGS = {
+    'declarations': dict(declarations=10000, statements=50, depth=2, nesting=1),
+    'statements': dict(declarations=40, statements=5000, depth=3, nesting=1),
+    'expressions': dict(declarations=40, statements=500, depth=12, nesting=1),
+    'loops': dict(declarations=40, statements=100, depth=3, nesting=3, iterations=15),
+    'arrays': dict(declarations=40, statements=40, depth=2, nesting=1, arrays=8, array_size=100000, iterations=2000),
+}
+
+PHASES = ['lex', 'parse', 'ast', 'vm', 'python']
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def run_config(options, repeat):
+    source = generate_program(**options)
+    lex, tokens = best_time(lambda: tokenize(source), repeat)
+    parse, program = best_time(lambda: Parser(tokens).program(), repeat)
+    ast, _ = best_time(lambda: Evaluator().run(program), repeat)
+    vm, _ = best_time(lambda: VM().run(Compiler().compile(program)), repeat)
+    python, _ = best_time(lambda: PythonCompiler().compile(program).run(), repeat)
+
+    # Peak memory of a whole run, measured separately since tracing slows everything down
+    tracemalloc.start()
+    Evaluator().run(Parser(tokenize(source)).program())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'options': options, 'bytes': len(source), 'tokens': len(tokens),
+            'seconds': {'lex': lex, 'parse': parse, 'ast': ast, 'vm': vm, 'python': python}, 'peak_bytes': peak}
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'config':<14} {'tokens':>9} " + ' '.join(f"{phase:>10}" for phase in PHASES) + f" {'peak MB':>9}")
+    for name, result in results.items():
+        seconds = result['seconds']
+        print(f"{name:<14} {result['tokens']:>9,} " + ' '.join(f"{seconds[phase]:>9.3f}s" for phase in PHASES)
+              + f" {result['peak_bytes'] / (1024 * 1024):>9.1f}")
+        old = baseline.get(name) if baseline else None
+        if old is not None:
+            # Ratios above 1 are slowdowns (or more memory) relative to the baseline; phases the
+            # baseline did not measure are left blank
+            ratios = [seconds[phase] / old['seconds'][phase] if phase in old['seconds'] else None for phase in PHASES]
+            print(f"{'  vs baseline':<24} " + ' '.join(f"{ratio:>9.2f}x" if ratio is not None else ' ' * 10
+                                                       for ratio in ratios)
+                  + f" {result['peak_bytes'] / old['peak_bytes']:>8.2f}x")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark lexing, parsing and execution over generated programs.")
+    arg_parser.add_argument('configs', nargs='*', help=f"configurations to run: {', '.join(CONFIGS)} (default: all)")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per measurement; the best is kept")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--output', help="save the results to this JSON file")
+    arg_parser.add_argument('--compare', help="results file of an earlier run to compare against")
+    args = arg_parser.parse_args()
+    for name in args.configs:
+        if name not in CONFIGS:
+            arg_parser.error(f"unknown configuration {name!r}")
+
+    results = {}
+    for name in args.configs or CONFIGS:
+        results[name] = run_config(dict(CONFIGS[name], seed=args.seed), args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'revision': revision(), 'python': platform.python_version(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': args.repeat,
+                       'results': results}, f, indent=2)
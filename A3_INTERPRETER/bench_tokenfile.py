@@ -0,0 +1,53 @@
+import argparse
+import os
+import tempfile
+import time
+
+from generate import generate_program
+from interpreter import Parser, tokenize_file
+from tokenfile import TokenFile, TokenFileWriter
+
+# Benchmark: getting a large generated program ready to run from its source file (lex and parse),
+# from a token file (parse only) and from a token file holding the AST (decode only).
+
+
+def best_of(repeat, function):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def from_token_file(path, ast):
+    token_file = TokenFile(path)
+    program = token_file.program() if ast else Parser(token_file.stream()).program()
+    token_file.close()
+    return program
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Source files vs binary token files.")
+    arg_parser.add_argument('--statements', type=int, default=20000)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'program.txt')
+        tokens_path = os.path.join(directory, 'program.tok')
+        ast_path = os.path.join(directory, 'program_ast.tok')
+        with open(source_path, 'w') as f:
+            f.write(generate_program(statements=args.statements, seed=0))
+        with TokenFileWriter(tokens_path) as writer:
+            writer.write_source_file(source_path)
+        with TokenFileWriter(ast_path) as writer:
+            writer.write_stream(tokenize_file(source_path))
+            writer.write_program(Parser(tokenize_file(source_path)).program())
+
+        for label, path, load in (
+                ("source: lex + parse", source_path, lambda: Parser(tokenize_file(source_path)).program()),
+                ("token file: parse", tokens_path, lambda: from_token_file(tokens_path, False)),
+                ("token file: AST", ast_path, lambda: from_token_file(ast_path, True))):
+            elapsed = best_of(args.repeat, load)
+            print(f"{label:<22} {os.path.getsize(path) / 1e6:7.2f} MB  {elapsed * 1000:9.1f} ms")
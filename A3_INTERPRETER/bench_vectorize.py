@@ -0,0 +1,67 @@
+import argparse
+import time
+
+from interpreter import Evaluator, Parser, tokenize
+from vectorize import numpy
+
+# Benchmark: element-wise loops over large int and float arrays, run by the AST evaluator with
+# vectorization off and on. The final variables of both runs must be identical, element types included.
+
+
+def vector_program(size):
+    return (
+        "Program Vector {\n"
+        f"int a[{size}];\n"
+        f"int b[{size}];\n"
+        f"int c[{size}];\n"
+        f"float x[{size}];\n"
+        f"float y[{size}];\n"
+        "int i;\n"
+        "int n;\n"
+        f"n = {size};\n"
+        "while ( i < n ) {\n"
+        "    b[i] = i * 7 - 3;\n"
+        "    c[i] = i / 3;\n"
+        "    x[i] = 0.5;\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "i = 0;\n"
+        "while ( i < n ) {\n"
+        "    a[i] = b[i] * 2 + c[i];\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "i = 0;\n"
+        "while ( i < n ) {\n"
+        "    y[i] = x[i] * 2.5 + x[i] / 3.0;\n"
+        "    a[i] = a[i] / 7 - ( b[i] < c[i] );\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "}\n"
+    )
+
+
+def snapshot(symbol_table):
+    # Type, element type and exact contents of every variable
+    return {name: (entry.type, getattr(entry.value, 'typecode', None),
+                   entry.value.tobytes() if hasattr(entry.value, 'tobytes') else entry.value)
+            for name, entry in symbol_table.symbols.items()}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Vectorized vs element-by-element array loops.")
+    arg_parser.add_argument('--size', type=int, default=1000000, help="number of array elements")
+    args = arg_parser.parse_args()
+    if numpy is None:
+        print("NumPy is not installed; loops cannot be vectorized.")
+
+    program = Parser(tokenize(vector_program(args.size))).program()
+    results = {}
+    for vectorize in (False, True):
+        start = time.perf_counter()
+        symbol_table = Evaluator(vectorize=vectorize).run(program)
+        elapsed = time.perf_counter() - start
+        results[vectorize] = (elapsed, snapshot(symbol_table))
+        print(f"vectorize {'on ' if vectorize else 'off'}  {elapsed:8.3f} s")
+
+    assert results[True][1] == results[False][1], "vectorized results differ"
+    print(f"identical results, {results[False][0] / results[True][0]:.0f}x faster vectorized")
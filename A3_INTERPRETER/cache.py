@@ -0,0 +1,203 @@
+import hashlib
+import io
+import os
+import pickle
+import sys
+import zlib
+
+from interpreter import Diagnostic, Parser, SyntaxError, __version__, tokenize
+from tokenfile import decode_program, encode_program
+
+# On-disk compilation cache: the result of lexing and parsing a program is stored under a hash of
+# its source text, so running the same program again skips both phases.
+# Keys also cover the interpreter version and the kind of result (parsed AST or bytecode), so
+# entries written by an older interpreter are never read back. Parsed programs are stored in the
+# token file's AST encoding, which is written and read without recursing however deeply the program
+# nests; bytecode is flat and pickled. Entries are zlib-compressed, one file per entry; a hit touches
+# the file, and once the directory grows past
+# max_bytes the least recently used entries are deleted. A running total of the entries' size is
+# kept in USAGE_FILE so that writes only scan the directory when it may actually be too big.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.ast'
+USAGE_FILE = 'usage'
+
+# Everything a pickled cache entry may refer to. Unpickling can call any class or function an entry
+# names, so anyone able to write to the cache directory could run code in every process reading it;
+# entries naming anything else are treated as corrupt.
+ENTRY_CLASSES = {
+    'vm': {'Bytecode'},
+}
+
+
+class EntryUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if name not in ENTRY_CLASSES.get(module, ()):
+            raise pickle.UnpicklingError(f"cache entries cannot contain {module}.{name}")
+        return super().find_class(module, name)
+
+
+def parse(source):
+    parser = None
+    try:
+        parser = Parser(tokenize(source))
+        return parser.program()
+    except SyntaxError as e:
+        # A lexical error in the first tokens is raised before the parser records anything
+        e.errors = parser.errors if parser is not None and parser.errors else [Diagnostic.from_error(e)]
+        raise
+
+
+def pickle_entry(result):
+    return pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+
+
+def unpickle(data):
+    return EntryUnpickler(io.BytesIO(data)).load()
+
+
+def decode_ast(data):
+    return decode_program(memoryview(data), 0)
+
+
+def default_directory():
+    return os.environ.get('A3_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'a3_interpreter')
+
+
+class CompilationCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writable = True  # until a write fails; the cache is then only read
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            pass  # reported by the first write
+
+    def key(self, source, kind):
+        digest = hashlib.sha256()
+        digest.update(f"{__version__}\0{kind}\0".encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def load_program(self, source):
+        """
+        Return the Program for source, parsing it only on a cache miss.
+        A source with syntax errors is not cached: the first SyntaxError is raised, as Parser.program()
+        does, with the Diagnostic records of all of them in its errors attribute.
+        """
+        return self.load(source, 'ast', lambda: parse(source), encode_program, decode_ast)
+
+    def load_bytecode(self, source, optimize=False):
+        # Bytecode for source, optionally optimized first; built from the cached Program on a miss
+        def build():
+            program = self.load_program(source)
+            if optimize:
+                from optimizer import Optimizer
+                program = Optimizer().optimize(program)
+            from vm import Compiler
+            return Compiler().compile(program)
+        return self.load(source, 'bytecode-O' if optimize else 'bytecode', build)
+
+    def load(self, source, kind, build, encode=None, decode=None):
+        # encode and decode convert results to and from bytes; pickle by default
+        path = self.path(self.key(source, kind))
+        result = self.read(path, decode or unpickle)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = build()
+        self.write(path, (encode or pickle_entry)(result))
+        return result
+
+    def read(self, path, decode):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            result = decode(zlib.decompress(data))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or corrupt entry: drop it and rebuild
+            self.discard(path)
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def write(self, path, data):
+        # A cache that cannot be written to (read-only, full disk, ...) only costs the speedup
+        if not self.writable:
+            return
+        data = zlib.compress(data)
+        # Write to a temporary file first so a concurrent reader never sees a partial entry
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+            self.count(len(data))
+        except OSError as e:
+            self.discard(temporary)
+            self.writable = False
+            print(f"Warning: not caching in {self.directory}: {e}", file=sys.stderr)
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def count(self, size):
+        # Add a new entry to the running total, evicting only once the total passes max_bytes.
+        # Processes writing at the same moment can lose each other's updates, which only delays
+        # eviction; every eviction recounts the directory exactly.
+        usage = os.path.join(self.directory, USAGE_FILE)
+        try:
+            with open(usage) as f:
+                total = int(f.read()) + size
+        except (OSError, ValueError):
+            total = None  # not counted yet, e.g. a cache written by an older interpreter
+        if total is None or total > self.max_bytes:
+            total = self.evict()
+        temporary = f"{usage}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(str(total))
+        os.replace(temporary, usage)
+
+    def evict(self):
+        # Delete least recently used entries until the cache fits in max_bytes; returns the size left
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return total
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+        return total
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                self.discard(entry.path)
+        self.discard(os.path.join(self.directory, USAGE_FILE))
+
+    def stats(self):
+        return f"Cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,150 @@
+import sys
+
+# Entry point for short-lived runs, e.g. batch systems that start thousands of interpreter processes.
+# It does as little as possible before lexing: interpreter.py is imported as a module, so Python loads
+# its cached bytecode instead of compiling the whole file on every run as `python interpreter.py`
+# has to, arguments are read by hand rather than through argparse, the scanner is compiled on first
+# use, and the VM, the optimizer and the rest are imported only by the runs that use them.
+#
+# To skip even that, keep a warm interpreter running and send it programs:
+#   python cli.py --serve --socket /tmp/a3.sock &
+#   python cli.py --socket /tmp/a3.sock program.txt
+# A client imports next to nothing and prints the server's JSON response line (see service.py).
+# `python cli.py --serve` without a socket answers JSON request lines from stdin instead.
+
+USAGE = """usage: python cli.py [--backend ast|vm|python] [-O] [--max-steps N] [--timeout SECONDS] FILE
+       python cli.py --socket PATH [--backend vm|python] [-O] FILE
+       python cli.py --serve [--socket PATH] [--max-steps N] [--timeout SECONDS]
+FILE may be - to read the program from stdin."""
+
+BACKENDS = ('ast', 'vm', 'python')
+VALUE_OPTIONS = ('--backend', '--socket', '--max-steps', '--timeout')
+
+
+class UsageError(Exception):
+    pass
+
+
+def parse_args(argv):
+    options = {'file': None, 'backend': None, 'optimize': False, 'socket': None, 'serve': False,
+               'max_steps': None, 'timeout': None}
+    args = iter(argv)
+    for arg in args:
+        name, equals, value = arg.partition('=')
+        if name in VALUE_OPTIONS:
+            if not equals:
+                value = next(args, None)
+                if value is None:
+                    raise UsageError(f"{name} needs a value")
+            options[name[2:].replace('-', '_')] = value
+        elif arg in ('-O', '--optimize'):
+            options['optimize'] = True
+        elif arg == '--serve':
+            options['serve'] = True
+        elif arg in ('-h', '--help'):
+            print(USAGE)
+            sys.exit(0)
+        elif arg.startswith('-') and arg != '-':
+            raise UsageError(f"unknown option {arg}")
+        elif options['file'] is None:
+            options['file'] = arg
+        else:
+            raise UsageError(f"unexpected argument {arg}")
+    if options['backend'] is not None and options['backend'] not in BACKENDS:
+        raise UsageError(f"--backend must be one of {', '.join(BACKENDS)}")
+    try:
+        if options['max_steps'] is not None:
+            options['max_steps'] = int(options['max_steps'])
+            if options['max_steps'] < 0:
+                raise UsageError("--max-steps must be 0 or more")
+        if options['timeout'] is not None:
+            options['timeout'] = float(options['timeout'])
+    except ValueError as e:
+        raise UsageError(str(e))
+    if options['serve'] == (options['file'] is not None):
+        raise UsageError("give a program FILE, or --serve")
+    return options
+
+
+def read_source(path):
+    if path == '-':
+        return sys.stdin.read()
+    with open(path) as f:
+        return f.read()
+
+
+def run(path, backend, optimize, max_steps, timeout):
+    # Parse and run in this process, printing what `python interpreter.py` prints
+    from interpreter import ExecutionLimitError, ExecutionLimits, Parser, SyntaxError, tokenize
+    limits = None
+    if max_steps is not None or timeout is not None:
+        limits = ExecutionLimits(max_steps, timeout)
+    try:
+        parser = Parser(tokenize(read_source(path)))
+    except SyntaxError as e:
+        print(f"Syntax error: {e}")
+        return 1
+    try:
+        return 0 if parser.parse(backend=backend or 'ast', optimize=optimize, limits=limits) else 1
+    except ExecutionLimitError as e:
+        print(e)
+        return 1
+
+
+def send(path, socket_path, backend, optimize):
+    # Run on a warm server and print its response line. The json and socket modules take longer to
+    # import than a short program takes to run (both pull in re and enum), so the client uses their
+    # C halves: a request is only a source string, a backend name and a flag.
+    import _json
+    import _socket
+    request = '{"source": %s, "backend": %s, "optimize": %s}\n' % (
+        _json.encode_basestring_ascii(read_source(path)), _json.encode_basestring_ascii(backend or 'vm'),
+        'true' if optimize else 'false')
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+        connection.sendall(request.encode())
+        chunks = []
+        while not chunks or not chunks[-1].endswith(b'\n'):
+            chunk = connection.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        connection.close()
+    response = b''.join(chunks)
+    sys.stdout.write(response.decode())
+    # The server writes json.dumps({'ok': ..., ...}), so the outcome is at the start of the line
+    return 0 if response.startswith(b'{"ok": true') else 1
+
+
+def serve(socket_path, max_steps, timeout):
+    import asyncio
+    import service
+    service.warm_up()
+    options = {'max_steps': max_steps, 'timeout': timeout}
+    try:
+        if socket_path is None:
+            service.serve_lines(sys.stdin, sys.stdout, **options)
+        else:
+            asyncio.run(service.serve(path=socket_path, **options))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv):
+    try:
+        options = parse_args(argv)
+    except UsageError as e:
+        print(f"{USAGE}\ncli.py: error: {e}", file=sys.stderr)
+        return 2
+    if options['serve']:
+        return serve(options['socket'], options['max_steps'], options['timeout'])
+    if options['socket'] is not None:
+        return send(options['file'], options['socket'], options['backend'], options['optimize'])
+    return run(options['file'], options['backend'], options['optimize'], options['max_steps'], options['timeout'])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+import argparse
+import random
+
+# Synthetic program generator: valid programs of configurable size, for benchmarks.
+#
+# Generated programs always parse, type-check and run to completion without a runtime error:
+# - each expression has a single type, matching the variable it is assigned to
+# - scalars are split into inputs (assigned a literal once, at the start) and outputs (never read),
+#   and array elements are only computed from inputs, loop counters and literals, so values
+#   cannot compound from one iteration to the next and int elements stay well inside 64 bits
+# - arrays are indexed by a literal or by a loop counter whose bound is at most the array size
+# - the only divisors are non-zero literals
+
+# Deeper products could overflow a 64-bit int element
+MAX_ELEMENT_DEPTH = 12
+
+
+class ProgramGenerator:
+    def __init__(self, declarations=20, statements=200, depth=3, nesting=2, array_size=100,
+                 arrays=2, iterations=10, seed=0):
+        self.declarations = max(declarations, 4)
+        self.statements = statements
+        self.depth = depth
+        self.nesting = nesting
+        self.array_size = max(array_size, 1)
+        self.arrays = arrays
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+
+    def generate(self):
+        rng = self.rng
+        scalars = self.declarations
+        self.inputs = {'int': [f"i{n}" for n in range(scalars // 4)],
+                       'float': [f"f{n}" for n in range(scalars // 4)]}
+        self.outputs = {'int': [f"x{n}" for n in range(scalars // 4)],
+                        'float': [f"y{n}" for n in range(scalars - 3 * (scalars // 4))]}
+        self.array_names = {'int': [f"a{n}" for n in range((self.arrays + 1) // 2)],
+                            'float': [f"b{n}" for n in range(self.arrays // 2)]}
+        self.counters = [f"k{n}" for n in range(self.nesting)]
+
+        lines = ["Program Generated {"]
+        for var_type in ('int', 'float'):
+            lines += [f"{var_type} {name};" for name in self.inputs[var_type] + self.outputs[var_type]]
+            lines += [f"{var_type} {name}[{self.array_size}];" for name in self.array_names[var_type]]
+        lines += [f"int {name};" for name in self.counters]
+        for name in self.inputs['int']:
+            lines.append(f"{name} = {rng.randint(1, 9)};")
+        for name in self.inputs['float']:
+            lines.append(f"{name} = {rng.randint(1, 99)}.{rng.randint(0, 9)};")
+        self.active = []  # counters of the loops enclosing the code being generated
+        lines += self.block(self.statements, '')
+        lines.append("}")
+        return '\n'.join(lines) + '\n'
+
+    # Statements
+
+    def block(self, budget, indent):
+        lines = []
+        while budget > 0:
+            choice = self.rng.random()
+            if choice < 0.15 and len(self.active) < self.nesting and budget >= 4:
+                body = self.rng.randint(2, max(2, budget // 2))
+                lines += self.loop(body, indent)
+                budget -= body + 3
+            elif choice < 0.25 and budget >= 3:
+                lines += self.selection(indent)
+                budget -= 3
+            else:
+                lines.append(indent + self.assignment())
+                budget -= 1
+        return lines
+
+    def loop(self, budget, indent):
+        counter = self.counters[len(self.active)]
+        bound = min(self.iterations, self.array_size)
+        lines = [f"{indent}{counter} = 0;", f"{indent}while ( {counter} < {bound} ) {{"]
+        self.active.append(counter)
+        lines += self.block(budget, indent + '    ')
+        self.active.pop()
+        lines.append(f"{indent}    {counter} = {counter} + 1;")
+        lines.append(f"{indent}}}")
+        return lines
+
+    def selection(self, indent):
+        cond = f"{self.expression('int', 1, False)} {self.rng.choice(['<', '<=', '>', '>=', '==', '!='])} {self.expression('int', 1, False)}"
+        return [f"{indent}if ( {cond} ) {self.assignment()}",
+                f"{indent}else {{ {self.assignment()} }}"]
+
+    def assignment(self):
+        rng = self.rng
+        var_type = rng.choice(['int', 'float'])
+        if self.array_names[var_type] and rng.random() < 0.4:
+            # Element stores only use inputs, counters and literals
+            target = f"{rng.choice(self.array_names[var_type])}[{self.index()}]"
+            return f"{target} = {self.expression(var_type, min(self.depth, MAX_ELEMENT_DEPTH), False)};"
+        return f"{rng.choice(self.outputs[var_type])} = {self.expression(var_type, self.depth, True)};"
+
+    # Expressions
+
+    def index(self):
+        if self.active and self.rng.random() < 0.7:
+            return self.rng.choice(self.active)
+        return str(self.rng.randrange(self.array_size))
+
+    def expression(self, var_type, depth, read_arrays):
+        rng = self.rng
+        if depth <= 0 or rng.random() < 0.2:
+            return self.leaf(var_type, read_arrays)
+        op = rng.choice(['+', '-', '*', '/'])
+        left = self.expression(var_type, depth - 1, read_arrays)
+        if op == '*':
+            # One side of a product is a leaf, so values grow at most geometrically with depth
+            right = self.leaf(var_type, read_arrays)
+        elif op == '/':
+            right = str(rng.randint(1, 9)) + ('.0' if var_type == 'float' else '')
+        else:
+            right = self.expression(var_type, depth - 1, read_arrays)
+        if rng.random() < 0.5:
+            return f"( {left} {op} {right} )"
+        return f"{left} {op} {right}"
+
+    def leaf(self, var_type, read_arrays):
+        rng = self.rng
+        choice = rng.random()
+        if read_arrays and self.array_names[var_type] and choice < 0.25:
+            return f"{rng.choice(self.array_names[var_type])}[{self.index()}]"
+        if var_type == 'int' and self.active and choice < 0.5:
+            return rng.choice(self.active)
+        if self.inputs[var_type] and choice < 0.8:
+            return rng.choice(self.inputs[var_type])
+        return str(rng.randint(0, 9)) + ('.5' if var_type == 'float' else '')
+
+
+def generate_program(**options):
+    return ProgramGenerator(**options).generate()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a random valid program.")
+    arg_parser.add_argument('--declarations', type=int, default=20, help="scalar variables")
+    arg_parser.add_argument('--statements', type=int, default=200)
+    arg_parser.add_argument('--depth', type=int, default=3, help="expression depth")
+    arg_parser.add_argument('--nesting', type=int, default=2, help="deepest loop nesting")
+    arg_parser.add_argument('--array-size', type=int, default=100)
+    arg_parser.add_argument('--arrays', type=int, default=2)
+    arg_parser.add_argument('--iterations', type=int, default=10, help="iterations of each loop")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    print(generate_program(declarations=args.declarations, statements=args.statements, depth=args.depth,
+                           nesting=args.nesting, array_size=args.array_size, arrays=args.arrays,
+                           iterations=args.iterations, seed=args.seed), end='')
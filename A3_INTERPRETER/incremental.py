@@ -0,0 +1,419 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+from interpreter import (EOF, ID, ID_GROUP, KEYWORDS, NUM, NUM_GROUP, OPERATOR_GROUP, OPERATORS, RBRACE,
+                         TOKEN_KINDS, WHITESPACE_GROUP, Compound, Diagnostic, If, LexicalError, Node, Parser,
+                         SymbolTable, SyntaxError, Token, TokenStream, token_patterns, tokenize)
+
+# Incremental reparsing for editors: a Document keeps the source, its tokens and its parsed Program,
+# and applies text edits to all three.
+#
+# An edit is relexed from the token before it up to the first old token that starts on a later
+# line with exactly the same text after it; from there on the old tokens are reused as they are.
+# The parser records the token range of every statement it parses (a Span), so only the innermost
+# statement, or run of sibling statements, containing the relexed tokens is parsed again. When a
+# reparse does not end exactly on an old statement boundary (say a '}' was typed), the enclosing
+# statement is reparsed instead, up to the whole program.
+
+span_start = attrgetter('start')
+span_end = attrgetter('end')
+
+
+class Span:
+    __slots__ = ('node', 'start', 'end', 'children', 'moved')
+
+    def __init__(self, node, start, end, children):
+        self.node = node
+        self.start = start        # token range [start, end), relative to the parent span's start
+        self.end = end            # (the program's top-level statements use absolute positions)
+        self.children = children  # spans of the statements nested directly inside this one
+        self.moved = 0            # lines the subtree has moved by that its nodes do not show yet
+
+
+class EditableTokenStream(TokenStream):
+    """
+    TokenStream whose tokens can be replaced in place. Tokens before the gap store their offsets
+    and line numbers counted from the start of the source, tokens after it counted from the end,
+    so the tokens after an edit stay valid as they are. Only the tokens between the previous edit
+    and the current one are converted when the gap moves.
+    """
+    __slots__ = ('gap', 'newlines')
+
+    def __init__(self, stream):
+        super().__init__(stream.source)
+        self.kinds = stream.kinds
+        self.starts = stream.starts
+        self.ends = stream.ends
+        self.lines = stream.lines
+        self.cols = stream.cols
+        self.gap = len(self.kinds)
+        self.newlines = stream.source.count('\n')
+
+    def start(self, i):
+        return self.starts[i] + len(self.source) if i >= self.gap else self.starts[i]
+
+    def end(self, i):
+        return self.ends[i] + len(self.source) if i >= self.gap else self.ends[i]
+
+    def line(self, i):
+        return self.lines[i] + self.newlines if i >= self.gap else self.lines[i]
+
+    def value(self, i):
+        return self.source[self.start(i):self.end(i)]
+
+    def token(self, i):
+        kind = self.kinds[i]
+        if kind == EOF:
+            return None
+        return Token(TOKEN_KINDS[kind], self.value(i), self.line(i), self.cols[i])
+
+    def move_gap(self, gap):
+        if gap < self.gap:
+            lo, hi, chars, lines = gap, self.gap, -len(self.source), -self.newlines
+        else:
+            lo, hi, chars, lines = self.gap, gap, len(self.source), self.newlines
+        if lo < hi:
+            self.starts[lo:hi] = array('q', [value + chars for value in self.starts[lo:hi]])
+            self.ends[lo:hi] = array('q', [value + chars for value in self.ends[lo:hi]])
+            self.lines[lo:hi] = array('i', [value + lines for value in self.lines[lo:hi]])
+        self.gap = gap
+
+    def replace(self, first, last, tokens, newlines):
+        # Replace tokens [first, last) with tokens, a stream over the edited source
+        self.move_gap(last)
+        self.kinds[first:last] = tokens.kinds
+        self.starts[first:last] = tokens.starts
+        self.ends[first:last] = tokens.ends
+        self.lines[first:last] = tokens.lines
+        self.cols[first:last] = tokens.cols
+        self.gap = first + len(tokens.kinds)
+        self.source = tokens.source
+        self.newlines = newlines
+
+
+class SpanParser(Parser):
+    """
+    Parser that records a Span for every statement. It can also start in the middle of the
+    token stream, at a statement boundary, with a symbol table prepared for that point.
+    """
+    def __init__(self, tokens):
+        self.spans = []
+        super().__init__(tokens)
+
+    def line(self):
+        return self.tokens.line(self.pos)
+
+    def seek(self, pos):
+        self.pos = pos - 1
+        self.limit = len(self.kinds)
+        self.get_next_token()
+
+    def statement(self):
+        start = self.pos
+        outer = self.spans
+        self.spans = []
+        try:
+            node = super().statement()
+        finally:
+            children = self.spans
+            self.spans = outer
+        for child in children:
+            child.start -= start
+            child.end -= start
+        outer.append(Span(node, start, self.pos, children))
+        return node
+
+
+def shift_lines(node, delta):
+    # Move every node of a reused subtree by delta lines
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.line is not None:
+            node.line += delta
+        for name in node.__slots__:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(value)
+
+
+class Document:
+    """
+    A program being edited. After every edit, program is the AST a full parse of source would give
+    (or None) and diagnostics lists the Diagnostic records of the errors it would find.
+    relexed and reparsed count the tokens the last edit actually scanned and parsed.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.tokens = None
+        self.moved = False
+        self.relexed = 0
+        self.reparsed = 0
+        self.relex_all()
+
+    @property
+    def program(self):
+        # Statements after an edit that added or removed lines have their line numbers corrected
+        # here, when the AST is asked for, rather than on every keystroke
+        if self.moved:
+            self.settle(self.spans)
+            self.moved = False
+        return self.tree
+
+    def settle(self, spans):
+        stack = list(spans)
+        while stack:
+            span = stack.pop()
+            if span.moved:
+                shift_lines(span.node, span.moved)
+                span.moved = 0
+            stack.extend(span.children)
+
+    # Full passes, for the initial text and whenever an edit cannot be applied locally
+
+    def relex_all(self):
+        try:
+            self.tokens = EditableTokenStream(tokenize(self.source))
+        except SyntaxError as e:
+            self.tokens = None
+            self.fail([Diagnostic.from_error(e)])
+            return self.diagnostics
+        self.relexed = len(self.tokens.kinds)
+        return self.parse_all()
+
+    def parse_all(self):
+        parser = SpanParser(self.tokens)
+        self.reparsed = len(self.tokens.kinds)
+        try:
+            self.tree = parser.program()
+        except SyntaxError:
+            self.fail(parser.errors)
+            return self.diagnostics
+        except Exception as e:
+            # Not a syntax error as such
+            self.fail([Diagnostic(None, None, None, None, str(e))])
+            return self.diagnostics
+        self.spans = parser.spans
+        self.moved = False
+        self.diagnostics = []
+        return self.diagnostics
+
+    def fail(self, diagnostics):
+        self.tree = None
+        self.spans = None
+        self.moved = False
+        self.diagnostics = diagnostics
+
+    # Edits
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Replace deleted characters at offset with the inserted text and bring tokens, program and
+        diagnostics up to date. Returns the diagnostics.
+        """
+        self.source = self.source[:offset] + inserted + self.source[offset + deleted:]
+        if self.tokens is None:
+            # The previous text could not even be scanned
+            return self.relex_all()
+        try:
+            first, old_end, new_end, line_delta = self.relex(offset, deleted, inserted)
+        except SyntaxError as e:
+            self.tokens = None
+            self.fail([Diagnostic.from_error(e)])
+            return self.diagnostics
+        if self.spans is None or not self.reparse(first, old_end, new_end, line_delta):
+            return self.parse_all()
+        self.diagnostics = []
+        return self.diagnostics
+
+    def relex(self, offset, deleted, inserted):
+        """
+        Rescan the tokens an edit can have changed and splice them into the token stream.
+        Returns (first, old_end, new_end, line_delta): old tokens [first, old_end) were replaced by
+        new tokens [first, new_end), and the tokens after them moved by line_delta lines.
+        """
+        old = self.tokens
+        source = self.source
+        char_delta = len(inserted) - deleted
+        edit_end = offset + len(inserted)
+        indexes = range(len(old.kinds))
+        # The first token ending at or after the edit may grow into it, so scanning starts after the one before
+        first = bisect_left(indexes, offset, key=old.end)
+        if first:
+            pos = old.end(first - 1)
+            lineno = old.line(first - 1)
+            line_start = old.start(first - 1) - old.cols[first - 1]
+        else:
+            pos, lineno, line_start = 0, 1, 0
+        new = TokenStream(source)
+        append = new.append
+        old_end = len(old.kinds)
+        for mo in token_patterns()[0].finditer(source, pos):
+            group = mo.lastindex
+            start, end = mo.span()
+            if group == WHITESPACE_GROUP:
+                newline_count = source.count('\n', start, end)
+                if newline_count:
+                    lineno += newline_count
+                    line_start = source.rindex('\n', start, end) + 1
+                continue
+            if line_start > edit_end:
+                # Past the edit and on a later line: if an old token started here, everything from it
+                # on scans exactly as before, in the same column
+                j = bisect_left(indexes, start - char_delta, first, key=old.start)
+                if j < old_end and old.start(j) == start - char_delta:
+                    old_end = j
+                    break
+            if group == ID_GROUP:
+                kind = KEYWORDS.get(source[start:end], ID)
+            elif group == NUM_GROUP:
+                kind = NUM
+            elif group == OPERATOR_GROUP:
+                kind = OPERATORS[source[start:end]]
+            else:
+                value = source[start:end]
+                token = Token('MISMATCH', value, lineno, start - line_start)
+                raise LexicalError('a token', token, custom_message=f"Unexpected character {value!r} at line {lineno}, char {start - line_start}")
+            append(kind, start, end, lineno, start - line_start)
+        else:
+            append(EOF, len(source), len(source), lineno, len(source) - line_start)
+
+        line_delta = lineno - old.line(old_end) if old_end < len(old.kinds) else 0
+        newlines = old.newlines + inserted.count('\n') - old.source.count('\n', offset, offset + deleted)
+        old.replace(first, old_end, new, newlines)
+        self.relexed = len(new.kinds)
+        return first, old_end, first + len(new.kinds), line_delta
+
+    def reparse(self, first, old_end, new_end, line_delta):
+        """
+        Reparse the statements covering old tokens [first, old_end), now new tokens [first, new_end).
+        Returns False if only a full parse can tell the result.
+        """
+        delta = new_end - old_end
+        # levels[i] is (span, its children, absolute start of the span, index of the span among its siblings);
+        # the program itself is the outermost level
+        levels = [(None, self.spans, 0, None)]
+        while True:
+            _, siblings, base, _ = levels[-1]
+            lo = bisect_right(siblings, first - base, key=span_end)
+            hi = bisect_left(siblings, old_end - base, key=span_start)
+            if hi - lo != 1:
+                break
+            span = siblings[lo]
+            start = base + span.start
+            # Descend only while the damage stays strictly inside one statement with nested statements
+            if not (span.children and start < first and old_end < base + span.end):
+                break
+            if span.moved:
+                # Statements parsed inside it will have current line numbers already
+                shift_lines(span.node, span.moved)
+                span.moved = 0
+            levels.append((span, span.children, start, lo))
+
+        while True:
+            parent, siblings, base, index = levels[-1]
+            if lo < hi and base + siblings[lo].start <= first and old_end <= base + siblings[hi - 1].end:
+                try:
+                    last, spans = self.reparse_run(levels, lo, hi, new_end, delta)
+                except Exception:
+                    # Errors are reported the way a full parse reports them
+                    return False
+                if spans is not None:
+                    break
+            if parent is None:
+                return False
+            # Try again one level up, with the enclosing statement as the run
+            levels.pop()
+            lo, hi = index, index + 1
+
+        # Splice the new statements into the AST and the span tree
+        node = parent.node if parent is not None else self.tree
+        self.reparsed = spans[-1].end - spans[0].start
+        for span in spans:
+            span.start -= base
+            span.end -= base
+        if node.__class__ is If:
+            if lo == 0:
+                node.then = spans[0].node
+            else:
+                node.orelse = spans[0].node
+        elif hasattr(node, 'statements'):
+            node.statements[lo:last + 1] = [span.node for span in spans]
+        else:
+            node.body = spans[0].node
+        siblings[lo:last + 1] = spans
+        # The new statements have not been type-checked yet, and may nest more or less deeply than the old
+        self.tree.checked = False
+        self.tree.height = None
+        self.shift(siblings, lo + len(spans), delta, line_delta)
+        # Enclosing statements grow by delta tokens and everything after them moves
+        for level in range(len(levels) - 1, 0, -1):
+            span, _, _, index = levels[level]
+            span.end += delta
+            self.shift(levels[level - 1][1], index + 1, delta, line_delta)
+        return True
+
+    def reparse_run(self, levels, lo, hi, new_end, delta):
+        # Parse statements from the start of siblings[lo] until one ends exactly where an old
+        # statement at or after siblings[hi - 1] ended. Returns (index of that old statement, new spans),
+        # or (None, None) if the statements no longer line up.
+        parent, siblings, base, _ = levels[-1]
+        parser = SpanParser(self.tokens)
+        parser.symbol_table = self.scope(levels)
+        parser.depth = len(levels) - 1  # the statements enclosing this run
+        parser.seek(base + siblings[lo].start)
+        if parent is not None and parent.node.__class__ is not Compound:
+            # A branch or loop body is a single statement
+            if hi - lo != 1:
+                return None, None
+            parser.statement()
+            if parser.pos != base + siblings[lo].end + delta:
+                return None, None
+            last = lo
+        else:
+            last = self.reparse_list(parser, siblings, base, hi, new_end, delta)
+            if last is None:
+                return None, None
+        if parser.first_error is not None:
+            # Blocks inside the statements recovered from an error
+            raise parser.first_error
+        return last, parser.spans
+
+    def reparse_list(self, parser, siblings, base, hi, new_end, delta):
+        last = hi - 1
+        while parser.kind != RBRACE and parser.kind != EOF:
+            parser.statement()
+            if parser.pos < new_end:
+                continue
+            while last < len(siblings) and base + siblings[last].end + delta < parser.pos:
+                last += 1
+            if last == len(siblings):
+                break
+            if base + siblings[last].end + delta == parser.pos:
+                return last
+        return None
+
+    def scope(self, levels):
+        # The symbol table as the parser had it inside the innermost level
+        symbol_table = SymbolTable()
+        for declaration in self.tree.declarations:
+            symbol_table.declare(declaration.name, declaration.type, declaration.size)
+        for span, _, _, _ in levels[1:]:
+            if span.node.__class__ is Compound:
+                symbol_table.enter_scope()
+                for declaration in span.node.declarations:
+                    symbol_table.declare(declaration.name, declaration.type, declaration.size)
+        return symbol_table
+
+    def shift(self, siblings, start, delta, line_delta):
+        # Statements after an edit keep their subtrees but move by delta tokens and line_delta lines
+        for span in siblings[start:]:
+            span.start += delta
+            span.end += delta
+            span.moved += line_delta
+        if line_delta:
+            self.moved = True
+
@@ -1,28 +1,70 @@
-import re
+import mmap
+import operator
+import sys
+import time
+from array import array
+
+# Bumped whenever the AST or bytecode format changes; cached compilation results are keyed on it
+__version__ = '1.6'
 
 # DEFINE TOKEN TYPES AND PATTERNS
 
-TOKEN_TYPES = {
-    'WHITESPACE': r'\s+',
-    'PROGRAM': r'Program',
-    'NUM': r'\d+',
-    'TYPE': r'\bint\b|\bfloat\b|\bvoid\b',
-    'ADDOP': r'\+|-',
-    'MULOP': r'\*|/',
-    'RELOP': r'<=|>=|>|<|==|!=',
-    "ASSIGN": r'=',
-    'IF': r'if',
-    'ELSE': r'else',
-    'WHILE': r'while',
-    'SEMI': r';',
-    'COMMA': r',',
-    'LPAREN': r'\(',
-    'RPAREN': r'\)',
-    'LBRACKET': r'\[',
-    'RBRACKET': r'\]',
-    'LBRACE': r'\{',
-    'RBRACE': r'\}',
-    'ID': r'[a-zA-Z_]\w*'
+# Token kinds are small ints; TOKEN_KINDS maps them back to their names
+TOKEN_KINDS = [
+    'PROGRAM', 'ID', 'NUM', 'TYPE', 'IF', 'ELSE', 'WHILE',
+    'ADDOP', 'MULOP', 'RELOP', 'ASSIGN', 'SEMI', 'COMMA',
+    'LPAREN', 'RPAREN', 'LBRACKET', 'RBRACKET', 'LBRACE', 'RBRACE',
+    'EOF',
+]
+
+(PROGRAM, ID, NUM, TYPE, IF, ELSE, WHILE,
+ ADDOP, MULOP, RELOP, ASSIGN, SEMI, COMMA,
+ LPAREN, RPAREN, LBRACKET, RBRACKET, LBRACE, RBRACE,
+ EOF) = range(len(TOKEN_KINDS))
+
+# The scanner is one compiled regex with a capture group per token class. The number of the group that
+# matched (mo.lastindex) says which class it was, and the exact kind is then looked up in a table:
+# identifiers go through KEYWORDS, operators and punctuation through OPERATORS.
+SCANNER_RULES = [
+    ('WHITESPACE', r'\s+'),
+    ('ID', r'[a-zA-Z_]\w*'),
+    ('NUM', r'\d+\.\d*|\.\d+|\d+'),
+    ('OPERATOR', r'<=|>=|==|!=|[-+*/<>=;,()\[\]{}]'),
+    ('MISMATCH', r'.'),
+]
+
+(WHITESPACE_GROUP, ID_GROUP, NUM_GROUP, OPERATOR_GROUP, MISMATCH_GROUP) = range(1, len(SCANNER_RULES) + 1)
+
+KEYWORDS = {
+    'Program': PROGRAM,
+    'int': TYPE,
+    'float': TYPE,
+    'void': TYPE,
+    'if': IF,
+    'else': ELSE,
+    'while': WHILE,
+}
+
+OPERATORS = {
+    '+': ADDOP,
+    '-': ADDOP,
+    '*': MULOP,
+    '/': MULOP,
+    '<=': RELOP,
+    '>=': RELOP,
+    '<': RELOP,
+    '>': RELOP,
+    '==': RELOP,
+    '!=': RELOP,
+    '=': ASSIGN,
+    ';': SEMI,
+    ',': COMMA,
+    '(': LPAREN,
+    ')': RPAREN,
+    '[': LBRACKET,
+    ']': RBRACKET,
+    '{': LBRACE,
+    '}': RBRACE,
 }
 
 # Token class
@@ -38,27 +80,327 @@ class Token:
 
     def __repr__(self):
         return self.__str__()
+
+
+class TokenStream:
+    """
+    Compact token storage: kinds, start/end offsets, line numbers and columns live in parallel arrays,
+    so a token costs a few bytes instead of a Token object. Values are slices of the source, taken only
+    when asked for. The stream always ends with an EOF token, so the parser never runs off the end.
+    """
+    __slots__ = ('source', 'kinds', 'starts', 'ends', 'lines', 'cols')
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('i')
+        self.cols = array('i')
+
+    def __len__(self):
+        # Number of tokens, not counting the EOF sentinel
+        return len(self.kinds) - 1
+
+    def append(self, kind, start, end, line, col):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.cols.append(col)
+
+    def value(self, i):
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def fill(self):
+        # In-memory streams are complete from the start; MappedTokenStream overrides this
+        return False
+
+    def token(self, i):
+        # Materialize a Token, e.g. for an error message. Returns None at end of input.
+        kind = self.kinds[i]
+        if kind == EOF:
+            return None
+        return Token(TOKEN_KINDS[kind], self.value(i), self.lines[i], self.cols[i])
+
+    def tokens(self):
+        for i in range(len(self)):
+            yield self.token(i)
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """
+        Build a stream from Token objects (e.g. list(lexer(code))). Their values are joined into a
+        synthetic source so the stream can slice them back out.
+        """
+        values = []
+        stream = cls(None)
+        offset = 0
+        line = 1
+        for token in tokens:
+            stream.append(TOKEN_KINDS.index(token.type), offset, offset + len(token.value), token.line_no or 0, token.char_pos or 0)
+            values.append(token.value)
+            offset += len(token.value) + 1
+            line = token.line_no or line
+        stream.source = ' '.join(values) + ' '
+        stream.append(EOF, offset, offset, line, 0)
+        return stream
     
 
-# The token pattern is a combination of all the token regexes
-token_pattern = '|'.join('(?P<%s>%s)' % pair for pair in TOKEN_TYPES.items())
+# The token pattern is a combination of all the scanner rules, one group each. It is compiled (for str
+# and for bytes) the first time something is lexed, so importing this module compiles nothing, and
+# programs loaded from a cache or a token file never pay for it. The language is ASCII: the str
+# pattern is compiled with re.ASCII so that \s, \w and \d mean what they mean in the bytes pattern,
+# and every entry point accepts the same programs whether it scans text or a memory-mapped file.
+scanner_patterns = None
 
-# updated Lexer function
-def lexer(code):
+def token_patterns():
+    global scanner_patterns
+    if scanner_patterns is None:
+        import re
+        pattern = '|'.join('(%s)' % pattern for _, pattern in SCANNER_RULES)
+        scanner_patterns = (re.compile(pattern, re.DOTALL | re.ASCII), re.compile(pattern.encode(), re.DOTALL))
+    return scanner_patterns
+
+def __getattr__(name):
+    # token_pattern and byte_token_pattern, built on first access
+    if name == 'token_pattern':
+        return token_patterns()[0]
+    if name == 'byte_token_pattern':
+        return token_patterns()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Shorter ASCII sources are scanned by hand (scan_small): for a small program, importing re and
+# compiling the pattern take longer than the whole scan, and the scan itself is no slower
+SMALL_SOURCE = 16384
+
+# Tokenizer: a single pass over the source, tracking line and column as it goes
+def tokenize(code):
+    if len(code) < SMALL_SOURCE and code.isascii():
+        return scan_small(code)
+    token_pattern = token_patterns()[0]
+    stream = TokenStream(code)
+    append = stream.append
     lineno = 1
     line_start = 0
-    for mo in re.finditer(token_pattern, code):
-        kind = mo.lastgroup
-        value = mo.group(kind)
-        char_pos = mo.start() - line_start
-        if kind == 'WHITESPACE':
+    keywords = KEYWORDS
+    operators = OPERATORS
+    for mo in token_pattern.finditer(code):
+        group = mo.lastindex
+        start, end = mo.span()
+        if group == WHITESPACE_GROUP:
             # Update line number and line start position
-            newline_count = value.count('\n')
-            if newline_count > 0:
-                line_start = mo.end() - value.rfind('\n') - 1
+            newline_count = code.count('\n', start, end)
+            if newline_count:
+                lineno += newline_count
+                line_start = code.rindex('\n', start, end) + 1
+            continue
+        if group == ID_GROUP:
+            kind = keywords.get(code[start:end], ID)
+        elif group == NUM_GROUP:
+            kind = NUM
+        elif group == OPERATOR_GROUP:
+            kind = operators[code[start:end]]
+        else:
+            value = code[start:end]
+            token = Token('MISMATCH', value, lineno, start - line_start)
+            raise LexicalError('a token', token, custom_message=f"Unexpected character {value!r} at line {lineno}, char {start - line_start}")
+        append(kind, start, end, lineno, start - line_start)
+    append(EOF, len(code), len(code), lineno, len(code) - line_start)
+    return stream
+
+# What \s matches in ASCII mode
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+def scan_small(code):
+    # tokenize() without the regex, character by character; the same rules as SCANNER_RULES, for ASCII
+    whitespace = WHITESPACE
+    stream = TokenStream(code)
+    append = stream.append
+    keywords = KEYWORDS
+    operators = OPERATORS
+    size = len(code)
+    pos = 0
+    lineno = 1
+    line_start = 0
+    while pos < size:
+        start = pos
+        char = code[pos]
+        pos += 1
+        if char in whitespace:
+            while pos < size and code[pos] in whitespace:
+                pos += 1
+            newline_count = code.count('\n', start, pos)
+            if newline_count:
                 lineno += newline_count
+                line_start = code.rindex('\n', start, pos) + 1
             continue
-        yield Token(kind, value, lineno, char_pos)
+        if char.isalpha() or char == '_':
+            while pos < size and (code[pos].isalnum() or code[pos] == '_'):
+                pos += 1
+            kind = keywords.get(code[start:pos], ID)
+        elif char.isdigit() or (char == '.' and pos < size and code[pos].isdigit()):
+            # \d+\.\d* | \.\d+ | \d+
+            while pos < size and code[pos].isdigit():
+                pos += 1
+            if char != '.' and pos < size and code[pos] == '.':
+                pos += 1
+                while pos < size and code[pos].isdigit():
+                    pos += 1
+            kind = NUM
+        elif char in '<>=!' and code.startswith('=', pos):
+            kind = operators[char + '=']
+            pos += 1
+        elif char in operators:
+            kind = operators[char]
+        else:
+            token = Token('MISMATCH', char, lineno, start - line_start)
+            raise LexicalError('a token', token, custom_message=f"Unexpected character {char!r} at line {lineno}, char {start - line_start}")
+        append(kind, start, pos, lineno, start - line_start)
+    append(EOF, size, size, lineno, size - line_start)
+    return stream
+
+# Lexer function: yields Token objects, for callers that want them one by one. It makes them straight
+# from the regex matches rather than going through a TokenStream, which would cost a second pass.
+def lexer(code):
+    token_pattern = token_patterns()[0]
+    keywords = {word: TOKEN_KINDS[kind] for word, kind in KEYWORDS.items()}
+    operators = {op: TOKEN_KINDS[kind] for op, kind in OPERATORS.items()}
+    lineno = 1
+    line_start = 0
+    for mo in token_pattern.finditer(code):
+        group = mo.lastindex
+        start = mo.start()
+        if group == WHITESPACE_GROUP:
+            end = mo.end()
+            newline_count = code.count('\n', start, end)
+            if newline_count:
+                lineno += newline_count
+                line_start = code.rindex('\n', start, end) + 1
+            continue
+        value = mo.group()
+        if group == ID_GROUP:
+            kind = keywords.get(value, 'ID')
+        elif group == NUM_GROUP:
+            kind = 'NUM'
+        elif group == OPERATOR_GROUP:
+            kind = operators[value]
+        else:
+            token = Token('MISMATCH', value, lineno, start - line_start)
+            raise LexicalError('a token', token, custom_message=f"Unexpected character {value!r} at line {lineno}, char {start - line_start}")
+        yield Token(kind, value, lineno, start - line_start)
+
+# The same scanner rules over bytes, for memory-mapped files
+BYTE_KEYWORDS = {word.encode(): kind for word, kind in KEYWORDS.items()}
+BYTE_OPERATORS = {op.encode(): kind for op, kind in OPERATORS.items()}
+
+def scan_buffer(buffer, chunk_size=1 << 20):
+    """
+    Scan a bytes-like buffer (e.g. an mmap) one chunk at a time, yielding a list of
+    (kind, start, end, line, col) tuples per chunk and an EOF tuple at the very end.
+    A token that touches the end of a chunk might continue past it, so it is left for the
+    next chunk, which starts at that token instead of at the chunk boundary.
+    """
+    byte_token_pattern = token_patterns()[1]
+    size = len(buffer)
+    pos = 0
+    lineno = 1
+    line_start = 0
+    window = chunk_size
+    keywords = BYTE_KEYWORDS
+    operators = BYTE_OPERATORS
+    while pos < size:
+        end = min(pos + window, size)
+        final = end == size
+        batch = []
+        append = batch.append
+        for mo in byte_token_pattern.finditer(buffer, pos, end):
+            start, stop = mo.span()
+            if stop == end and not final:
+                break
+            group = mo.lastindex
+            if group == WHITESPACE_GROUP:
+                newline_count = buffer[start:stop].count(b'\n')
+                if newline_count:
+                    lineno += newline_count
+                    line_start = buffer.rfind(b'\n', start, stop) + 1
+            elif group == ID_GROUP:
+                append((keywords.get(buffer[start:stop], ID), start, stop, lineno, start - line_start))
+            elif group == NUM_GROUP:
+                append((NUM, start, stop, lineno, start - line_start))
+            elif group == OPERATOR_GROUP:
+                append((operators[buffer[start:stop]], start, stop, lineno, start - line_start))
+            else:
+                # The whole character, as the str scanner reports it; the line up to it is ASCII, so
+                # byte and character columns agree
+                value = bytes(buffer[start:start + 4]).decode(errors='replace')[0]
+                token = Token('MISMATCH', value, lineno, start - line_start)
+                raise LexicalError('a token', token, custom_message=f"Unexpected character {value!r} at line {lineno}, char {start - line_start}")
+            pos = stop
+        if batch or pos == end:
+            window = chunk_size
+            yield batch
+        else:
+            # A single token is longer than the window; widen it and rescan
+            window += chunk_size
+    yield [(EOF, size, size, lineno, size - line_start)]
+
+def map_file(path):
+    # mmap cannot map an empty file
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class MappedTokenStream(TokenStream):
+    """
+    A TokenStream over a memory-mapped file that is filled lazily: the parser pulls in the next
+    chunk of tokens only when its cursor reaches the end of what has been scanned so far.
+    """
+    __slots__ = ('batches',)
+
+    def __init__(self, path, chunk_size=1 << 20):
+        super().__init__(map_file(path))
+        self.batches = scan_buffer(self.source, chunk_size)
+
+    def __len__(self):
+        while self.fill():
+            pass
+        # Without the EOF sentinel, scanning stopped at an error
+        kinds = self.kinds
+        return len(kinds) - 1 if kinds and kinds[-1] == EOF else len(kinds)
+
+    def value(self, i):
+        return self.source[self.starts[i]:self.ends[i]].decode()
+
+    def fill(self):
+        # Scan the next chunk; returns False once the whole file has been scanned
+        if self.batches is None:
+            return False
+        for batch in self.batches:
+            for token in batch:
+                self.append(*token)
+            if batch:
+                return True
+        self.batches = None
+        return False
+
+# Tokenize a file into a MappedTokenStream; tokens are scanned as the parser asks for them
+def tokenize_file(path, chunk_size=1 << 20):
+    return MappedTokenStream(path, chunk_size)
+
+# Lex a file as a generator of Token objects. Only one chunk of tokens is held at a time,
+# so memory stays flat however large the file is.
+def lex_file(path, chunk_size=1 << 20):
+    buffer = map_file(path)
+    try:
+        for batch in scan_buffer(buffer, chunk_size):
+            for kind, start, end, line, col in batch:
+                if kind != EOF:
+                    yield Token(TOKEN_KINDS[kind], buffer[start:end].decode(), line, col)
+    finally:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
 
 class SyntaxError(Exception):
     def __init__(self, expected, current_token, custom_message=None):
@@ -76,311 +418,621 @@ class SyntaxError(Exception):
                 )
         super().__init__(self.message)
 
+# Raised by the scanners; the parser cannot recover from it, since there are no tokens past it
+class LexicalError(SyntaxError):
+    pass
+
+class Diagnostic:
+    """
+    A syntax error as a record: where it was found, what the parser expected there and what it found.
+    Parser collects these in Parser.errors as it recovers from each error.
+    """
+    __slots__ = ('line', 'column', 'expected', 'found', 'message')
+
+    def __init__(self, line, column, expected, found, message):
+        self.line = line
+        self.column = column
+        self.expected = expected
+        self.found = found
+        self.message = message
+
+    @classmethod
+    def from_error(cls, error, line=None, column=None):
+        # line and column place errors at the end of input, which have no token
+        token = error.current_token
+        if token is not None:
+            return cls(token.line_no, token.char_pos, error.expected, token.value, error.message)
+        return cls(line, column, error.expected, 'end of input', error.message)
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return (f"Diagnostic(line={self.line}, column={self.column}, expected={self.expected!r}, "
+                f"found={self.found!r}, message={self.message!r})")
+
+# AST node classes
+# The parser builds these once; the Evaluator (or any other pass) walks them as many times as needed.
+class Node:
+    __slots__ = ('line',)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class Program(Node):
+    __slots__ = ('name', 'declarations', 'statements', 'checked', 'height')
+
+    def __init__(self, name, declarations, statements, line=None, height=None):
+        self.name = name
+        self.declarations = declarations
+        self.statements = statements
+        self.checked = False  # set once TypeChecker has annotated the whole program
+        self.height = height  # levels of nesting, or None until program_height() counts them
+        self.line = line
+
+class VarDecl(Node):
+    __slots__ = ('type', 'name', 'size', 'slot')
+
+    def __init__(self, type, name, size=None, slot=None, line=None):
+        self.type = type
+        self.name = name
+        self.size = size  # None for scalars, element count for arrays
+        self.slot = slot  # position in its scope's frame
+        self.line = line
+
+class Assign(Node):
+    __slots__ = ('target', 'expr')
+
+    def __init__(self, target, expr, line=None):
+        self.target = target
+        self.expr = expr
+        self.line = line
+
+class Compound(Node):
+    __slots__ = ('declarations', 'statements', 'depth')
+
+    def __init__(self, declarations, statements, depth, line=None):
+        self.declarations = declarations
+        self.statements = statements
+        self.depth = depth  # scope depth of the block; the program's own scope is 0
+        self.line = line
+
+class If(Node):
+    __slots__ = ('cond', 'then', 'orelse')
+
+    def __init__(self, cond, then, orelse=None, line=None):
+        self.cond = cond
+        self.then = then
+        self.orelse = orelse
+        self.line = line
+
+class While(Node):
+    __slots__ = ('cond', 'body')
+
+    def __init__(self, cond, body, line=None):
+        self.cond = cond
+        self.body = body
+        self.line = line
+
+class BinOp(Node):
+    __slots__ = ('op', 'left', 'right', 'type')
+
+    def __init__(self, op, left, right, line=None, type=None):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.type = type  # type of the result, filled in by TypeChecker
+        self.line = line
+
+class Num(Node):
+    __slots__ = ('value', 'type')
+
+    def __init__(self, value, type, line=None):
+        self.value = value
+        self.type = type
+        self.line = line
+
+class Var(Node):
+    __slots__ = ('name', 'index', 'type', 'depth', 'slot')
+
+    def __init__(self, name, index=None, type=None, depth=None, slot=None, line=None):
+        self.name = name
+        self.index = index  # index expression for array accesses
+        # Resolved once by the parser: declared type, and where the value lives at run time (frames[depth][slot])
+        self.type = type
+        self.depth = depth
+        self.slot = slot
+        self.line = line
+
+# Values variables start out with
+INITIAL_VALUES = {'int': 0, 'float': 0.0}
+
+# Arrays are stored as typed contiguous buffers of 64-bit ints or doubles
+ARRAY_TYPECODES = {'int': 'q', 'float': 'd'}
+
+def new_array(var_type, size):
+    # A zero-filled buffer; repeating a one-element array fills it in a single bulk copy
+    return array(ARRAY_TYPECODES[var_type], [0]) * size
+
+def initial_value(declaration):
+    if declaration.size is not None:
+        return new_array(declaration.type, declaration.size)
+    return INITIAL_VALUES.get(declaration.type)
+
+def format_array(values, limit=8):
+    # Short debug rendering of an array's contents
+    shown = ', '.join(str(value) for value in values[:limit])
+    if len(values) > limit:
+        shown += f', ... ({len(values)} elements)'
+    return f'[{shown}]'
+
 class SymbolTableEntry:
-    def __init__(self, name, type, value=None, additional_info=None):
+    __slots__ = ('name', 'type', 'value', 'additional_info', 'depth', 'slot')
+
+    def __init__(self, name, type, value=None, additional_info=None, depth=0, slot=0):
         self.name = name
         self.type = type
         self.value = value
         self.additional_info = additional_info
+        self.depth = depth  # scope depth the variable was declared at
+        self.slot = slot    # index into that scope's frame
 
 class SymbolTable:
+    """
+    Lexically scoped symbol table. Names are only looked up here while parsing; each variable
+    reference is resolved to a (depth, slot) pair, and at run time a scope is just a list of values.
+    """
     def __init__(self):
-        self.symbols = {}
+        self.scopes = [{}]
+
+    @property
+    def symbols(self):
+        # The program's own (outermost) scope
+        return self.scopes[0]
+
+    @property
+    def depth(self):
+        return len(self.scopes) - 1
+
+    def enter_scope(self):
+        self.scopes.append({})
 
-    def declare(self, name, var_type):
-        if name in self.symbols:
-            raise Exception(f"Error: Variable '{name}' already declared.")
-        self.symbols[name] = SymbolTableEntry(name, var_type)
+    def exit_scope(self):
+        self.scopes.pop()
+
+    def declare(self, name, var_type, additional_info=None, token=None):
+        # token is where the parser found the declaration, for the syntax error if it is a duplicate
+        scope = self.scopes[-1]
+        if name in scope:
+            raise SyntaxError('a new variable name', token, custom_message=f"Variable '{name}' already declared")
+        entry = scope[name] = SymbolTableEntry(name, var_type, None, additional_info, self.depth, len(scope))
+        return entry
 
     def assign(self, name, value, value_type):
-        if name not in self.symbols:
+        entry = self.lookup(name)
+        if entry is None:
             raise Exception(f"Error: Variable '{name}' not declared.")
-        if self.symbols[name].type != value_type:
-            raise Exception(f"Type error: Cannot assign value of type {value_type} to variable '{name}' of type {self.symbols[name].type}.")
-        self.symbols[name].value = value
+        if entry.type != value_type:
+            raise Exception(f"Type error: Cannot assign value of type {value_type} to variable '{name}' of type {entry.type}.")
+        entry.value = value
 
     def lookup(self, name):
-        return self.symbols.get(name)
+        # Innermost declaration wins
+        for scope in reversed(self.scopes):
+            entry = scope.get(name)
+            if entry is not None:
+                return entry
+        return None
+
+    @classmethod
+    def from_frame(cls, declarations, frame):
+        # Debug view of a finished run: the declared variables with their values from a frame
+        symbol_table = cls()
+        for declaration in declarations:
+            symbol_table.declare(declaration.name, declaration.type, declaration.size).value = frame[declaration.slot]
+        return symbol_table
+
+    def print_table(self, file=None):
+        print("Symbol Table:", file=file)
+        print(f"{'Name':<10} {'Type':<10} {'Value':<10}", file=file)
+        for scope in self.scopes:
+            for name, entry in scope.items():
+                value = entry.value if entry.value is not None else ''
+                if isinstance(value, array):
+                    value = format_array(value)
+                print(f"{name:<10} {entry.type:<10} {value:<10}", file=file)
 
-    def print_table(self):
-        print("Symbol Table:")
-        print(f"{'Name':<10} {'Type':<10} {'Value':<10}")
-        for name, entry in self.symbols.items():
-            value = entry.value if entry.value is not None else ''
-            print(f"{name:<10} {entry.type:<10} {value:<10}")
+# Programs can nest as deeply as memory allows, but the passes over the AST (type checking, evaluation,
+# optimization, compilation) recurse once per level, and Python's default recursion limit only allows a
+# few hundred levels. Each pass makes room for the program it works on with nesting_room(), which raises
+# the limit while the pass runs. Calls between Python functions do not use the C stack, so that is safe
+# as long as the recursion does not go through C code, such as repr() or pickle.
+FRAMES_PER_LEVEL = 10  # with room to spare, e.g. for the profiler's wrappers
+ROOM_LEVELS = 100  # the parser makes room for this many more statement levels at a time
+
+class nesting_room:
+    # with nesting_room(levels): lets the block recurse levels more levels of nesting deep than the caller could.
+    # A class rather than contextlib.contextmanager, which would add an import to every start-up.
+    __slots__ = ('levels', 'limit')
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    def __enter__(self):
+        self.limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(self.limit + self.levels * FRAMES_PER_LEVEL)
+
+    def __exit__(self, *exception):
+        sys.setrecursionlimit(self.limit)
+
+def height(node):
+    # Levels of nesting in the subtree rooted at node, counted without recursing
+    deepest = 0
+    stack = [(node, 1)]
+    while stack:
+        node, level = stack.pop()
+        if level > deepest:
+            deepest = level
+        level += 1
+        cls = node.__class__
+        if cls is BinOp:
+            stack.append((node.left, level))
+            stack.append((node.right, level))
+        elif cls is Var:
+            if node.index is not None:
+                stack.append((node.index, level))
+        elif cls is Assign:
+            stack.append((node.target, level))
+            stack.append((node.expr, level))
+        elif cls is Compound or cls is Program:
+            stack.extend((statement, level) for statement in node.statements)
+        elif cls is If:
+            stack.append((node.cond, level))
+            stack.append((node.then, level))
+            if node.orelse is not None:
+                stack.append((node.orelse, level))
+        elif cls is While:
+            stack.append((node.cond, level))
+            stack.append((node.body, level))
+    return deepest
+
+def program_height(program):
+    # Levels of nesting in a program: recorded by the parser, or counted once for programs built otherwise
+    if program.height is None:
+        program.height = height(program)
+    return program.height
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = iter(tokens)
-        self.current_token = None
+        if not isinstance(tokens, TokenStream):
+            tokens = TokenStream.from_tokens(tokens)
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.pos = -1
+        self.limit = 0
         self.symbol_table = SymbolTable()
+        self.errors = []  # Diagnostic records, in the order the errors were found
+        self.first_error = None
+        self.depth = 0  # blocks, ifs and whiles being parsed, one inside the other
+        self.deepest = 0  # most levels of nesting seen so far, statements and expressions together
         self.get_next_token()
 
+    @property
+    def current_token(self):
+        # Only built on demand, for error messages
+        return self.tokens.token(self.pos)
+
+    def value(self):
+        return self.tokens.value(self.pos)
+
+    def line(self):
+        return self.tokens.lines[self.pos]
+
     def get_next_token(self):
         """
         Advance to the next token in the stream.
         """
-        self.current_token = next(self.tokens, None)
+        pos = self.pos + 1
+        if pos == self.limit:
+            # Reached the end of what has been scanned so far; streaming sources scan more here.
+            # pos only moves once that succeeds: if scanning raises, the parser stays on a real token.
+            while pos == len(self.kinds) and self.tokens.fill():
+                pass
+            self.limit = len(self.kinds)
+        self.pos = pos
+        self.kind = self.kinds[pos]
 
 
     def match(self, expected_type):
         """
         Match the current token type against the expected type.
         """
-        if self.current_token is None:
-            raise SyntaxError(f'Unexpected end of input, expected {expected_type}', None)
-
-        if self.current_token.type == expected_type:
+        if self.kind == expected_type:
             self.get_next_token()  # Consume the token
+        elif self.kind == EOF:
+            raise SyntaxError(TOKEN_KINDS[expected_type], None)
         else:
-            raise SyntaxError(f'{expected_type}, but found {self.current_token.type}', self.current_token)
+            raise SyntaxError(TOKEN_KINDS[expected_type], self.current_token)
 
-    def addop(self):
-        # addop -> + | -
-        if self.current_token.type =="ADDOP":
-            value = self.current_token.value
-            self.match('ADDOP')
-            return value
+    def error(self, error):
+        # Record a syntax error; one error per position is enough, however many rules give up there.
+        # Errors with a token, lexical errors included, carry their own position.
+        if error.current_token is not None:
+            diagnostic = Diagnostic.from_error(error)
         else:
-            raise SyntaxError('Expected "+" or "-"', self.current_token)
-
-    def term(self):
-        left_value, left_type = self.factor()
-        right_value, right_type = self.term_prime(left_value, left_type)
-        # Type checking and value computation will be done inside term_prime
-        return right_value, right_type
-
-    def term_prime(self, left_value, left_type):
-        if self.current_token and self.current_token.type == 'MULOP':
-            operation = self.current_token.value
-            self.match('MULOP')
-            right_value, right_type = self.factor()
-            if left_type != right_type:
-                raise Exception(f"Type error: Cannot perform operation '{operation}' on types {left_type} and {right_type}.")
-            # Perform the operation and return the result and type
-            result_value = self.compute_mulop_result(operation, left_value, right_value)
-            return result_value, left_type
-        else:
-            return left_value, left_type  # epsilon case; no operation to perform
-
+            diagnostic = Diagnostic.from_error(error, self.line(), self.tokens.cols[self.pos])
+        if self.errors and (self.errors[-1].line, self.errors[-1].column) == (diagnostic.line, diagnostic.column):
+            return
+        self.errors.append(diagnostic)
+        if self.first_error is None:
+            self.first_error = error
 
-    def mulop(self):
-        # mulop -> * | /
-        if self.current_token.type in ['*', '/']:
-            value = self.current_token.value
-            self.match('MULOP')
-            return value
-        else:
-            raise SyntaxError('Expected "*" or "/"', self.current_token)
+    def recover(self, error):
+        # Panic mode: record the error, then skip to the end of the statement or declaration it is in.
+        # A ';' is consumed, a '}' closing the current block is left for it, and blocks opened
+        # while skipping are skipped whole.
+        self.error(error)
+        if isinstance(error, LexicalError):
+            raise error
+        depth = 0
+        while self.kind != EOF:
+            if self.kind == LBRACE:
+                depth += 1
+            elif self.kind == RBRACE:
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    self.get_next_token()
+                    if self.kind != ELSE:
+                        return
+                    continue
+            elif self.kind == SEMI and depth == 0:
+                self.get_next_token()
+                return
+            self.get_next_token()
 
     def factor(self):
-        if self.current_token.type == 'LPAREN':
-            self.match('LPAREN')
-            value, type = self.expression()  # Assuming expression returns a value and its type
-            self.match('RPAREN')
-            return value, type
-        elif self.current_token.type == 'NUM':
-            value = self.current_token.value
+        # factor -> NUM | ID
+        # Parenthesised expressions and array indexes are opened and closed by expression() itself
+        if self.kind == NUM:
+            value = self.value()
+            line = self.line()
             # Determine if the value is integer or float based on its content
             type = 'int' if '.' not in value else 'float'
-            self.match('NUM')
-            return int(value) if type == 'int' else float(value), type
-        elif self.current_token.type == 'ID':
-            var_name, _ = self.var()  # var returns the variable name and array access if applicable
-            var_entry = self.symbol_table.lookup(var_name)
-            if var_entry is None:
-                raise SyntaxError(f"Undeclared variable '{var_name}'", None)
-            return var_entry.value, var_entry.type
+            self.match(NUM)
+            return Num(int(value) if type == 'int' else float(value), type, line)
+        elif self.kind == ID:
+            return self.var_ref()
         else:
-            raise SyntaxError('Expected "(", variable, or number', self.current_token)
-        
+            raise SyntaxError('"(", variable, or number', self.current_token)
+
+    # Operator precedences; open groups sit on the operator stack with precedence 0
+    PRECEDENCE = {RELOP: 1, ADDOP: 2, MULOP: 3}
+
     def expression(self):
-        # Assume the additive_expression method now also returns a type
-        left_value, left_type = self.additive_expression()
-        right_value, right_type = self.expression_prime(left_type, left_value)  # Pass the left operand's type for type checking
-        # Type checking and value computation will be done inside expression_prime
-        return left_value, left_type  # This assumes expression_prime may modify left_value based on the right side
-
-    def expression_prime(self, left_type, left_value):
-        # expression-prime -> relop additive-expression expression-prime | epsilon
-        if self.current_token and self.current_token.type == 'RELOP':
-            relop = self.current_token.value
-            self.match('RELOP')
-            right_value, right_type = self.additive_expression()
-            # Perform type checking and compute the result value
-            if left_type != right_type:
-                raise Exception(f"Type error: Cannot perform '{relop}' operation between types {left_type} and {right_type}.")
-            # Compute the result based on the relop and return it with the type
-            result_value = self.compute_relop_result(relop, left_type, left_value, right_value)
-            return result_value, left_type
-        else:
-            return None, left_type # epsilon case
+        # expression -> additive-expression expression-prime
+        # expression-prime -> relop additive-expression | epsilon
+        # additive-expression -> term { addop term }
+        # term -> factor { mulop factor }
+        # factor -> ( expression ) | var | NUM
+        #
+        # Parsed with explicit operand and operator stacks instead of one recursive call per rule, so
+        # deeply nested parentheses and indexes use heap memory rather than Python stack frames.
+        # Every '(' or 'var [' opens a group; like the grammar, a group allows at most one relop.
+        start = self.pos
+        operands = []
+        operators = []  # (precedence, op, line) for operators, (0, '(' or '[', Var or None) for groups
+        groups = []  # relop_seen of each enclosing group
+        relop_seen = False
+        precedence = self.PRECEDENCE
+        while True:
+            # An operand is expected
+            if self.kind == LPAREN:
+                self.match(LPAREN)
+                operators.append((0, '(', None))
+                groups.append(relop_seen)
+                relop_seen = False
+                continue
+            node = self.factor()
+            if node.__class__ is Var:
+                indexed = self.kind == LBRACKET
+                self.check_indexing(node, indexed)
+                if indexed:
+                    self.match(LBRACKET)
+                    operators.append((0, '[', node))
+                    groups.append(relop_seen)
+                    relop_seen = False
+                    continue
+            operands.append(node)
+
+            # An operator, or the end of a group, is expected
+            while True:
+                kind = self.kind
+                if kind == MULOP or kind == ADDOP or (kind == RELOP and not relop_seen):
+                    prec = precedence[kind]
+                    while operators and operators[-1][0] >= prec:
+                        _, op, line = operators.pop()
+                        right = operands.pop()
+                        operands[-1] = BinOp(op, operands[-1], right, line)
+                    operators.append((prec, self.value(), self.line()))
+                    if kind == RELOP:
+                        relop_seen = True
+                    self.get_next_token()
+                    break
+                # Reduce the innermost group, or the whole expression
+                while operators and operators[-1][0]:
+                    _, op, line = operators.pop()
+                    right = operands.pop()
+                    operands[-1] = BinOp(op, operands[-1], right, line)
+                if not groups:
+                    node = operands.pop()
+                    # Every level of the tree takes at least one token, so only long expressions are measured
+                    levels = self.pos - start
+                    if levels > 32:
+                        levels = height(node)
+                    if self.depth + levels > self.deepest:
+                        self.deepest = self.depth + levels
+                    return node
+                _, group, var = operators.pop()
+                relop_seen = groups.pop()
+                if group == '(':
+                    self.match(RPAREN)
+                else:
+                    self.match(RBRACKET)
+                    var.index = operands.pop()
+                    operands.append(var)
 
-    def relop(self):
-        # relop -> <= | < | > | >= | == | !=
-        if self.current_token.type == 'RELOP':
-            value = self.current_token.value
-            self.match('RELOP')
-            return value
-        else:
-            raise SyntaxError('Expected relational operator', self.current_token)
-
-    def additive_expression(self):
-        # Assume the term method now also returns a type
-        left_value, left_type = self.term()
-        right_value, right_type = self.additive_expression_prime(left_value, left_type)  # Pass the left operand's type for type checking
-        # Type checking and value computation will be done inside additive_expression_prime
-        return left_value, left_type
-
-    def additive_expression_prime(self, left_value, left_type):
-        # additive-expression-prime -> addop term additive-expression-prime | epsilon
-        if self.current_token and self.current_token.type == 'ADDOP':
-            addop = self.current_token.value
-            self.match('ADDOP')
-            right_value, right_type = self.term()
-            # Perform type checking and compute the result value
-            if left_type != right_type:
-                raise Exception(f"Type error: Cannot perform '{addop}' operation between types {left_type} and {right_type}.")
-            # Compute the result based on the addop and return it with the type
-            result_value = self.compute_addop_result(addop, left_type, left_value, right_value)
-            return result_value, left_type
-        else:
-            return None, left_type
-    
     def selection_statement_prime(self):
         # selection-statement-prime -> epsilon | else statement
-        if self.current_token and self.current_token.type == 'ELSE':
-            self.match('ELSE')
-            else_statement_value = self.statement()
-            return else_statement_value
+        if self.kind == ELSE:
+            self.match(ELSE)
+            return self.statement()
         else:
             return None  # epsilon case
 
     def iteration_statement(self):
-        # Iteration-statement -> while ( expression ) statement ;
-        self.match('WHILE')
-        self.match('LPAREN')
-        expression_value = self.expression()
-        self.match('RPAREN')
-        statement_value = self.statement()
-        return ('WHILE', expression_value, statement_value)
-
-    def add_variable_declaration(self, var_name, var_type, additional_info=None):
-        # This method should be called where variable declarations are parsed.
-        if self.symbol_table.lookup(var_name) is not None:
-            raise SyntaxError(f"Variable '{var_name}' already declared.", self.current_token)
-        self.symbol_table.add(var_name, var_type, additional_info)
+        # Iteration-statement -> while ( expression ) statement
+        line = self.line()
+        self.match(WHILE)
+        self.match(LPAREN)
+        cond = self.expression()
+        self.match(RPAREN)
+        body = self.statement()
+        return While(cond, body, line)
 
     def assignment_statement(self):
-        var_name, var_prime_value = self.var()
-        var_entry = self.symbol_table.lookup(var_name)
-        if var_entry is None:
-            raise SyntaxError(f"Undeclared variable '{var_name}'", self.current_token, custom_message=f"Undeclared variable '{var_name}'")
-        self.match('ASSIGN')
-        expression_value, expression_type = self.expression()
-        
-        # Convert token values to the proper type if necessary
-        if expression_type == 'int':
-            expression_value = int(expression_value)
-        elif expression_type == 'float':
-            expression_value = float(expression_value)
-        
-        # Check if the variable type matches the expression type
-        if var_entry.type != expression_type:
-            raise Exception(f"Type error: Cannot assign value of type {expression_type} to variable '{var_name}' of type {var_entry.type}.")
-
-        # Update the symbol table with the new value
-        self.symbol_table.assign(var_name, expression_value, expression_type)
-        self.match('SEMI')
-        
-        # Return the assignment result in a structured way
-        return {
-            'statement_type': 'assignment',
-            'variable': var_name,
-            'value': expression_value,
-            'value_type': expression_type
-        }
+        # assignment-statement -> var = expression ;
+        line = self.line()
+        target = self.var()
+        self.match(ASSIGN)
+        expr = self.expression()
+        self.match(SEMI)
+        return Assign(target, expr, line)
 
     def var(self):
-        if self.current_token.type == 'ID':
-            var_name = self.current_token.value
+        # var -> ID var-prime
+        var = self.var_ref()
+        self.check_indexing(var, self.kind == LBRACKET)
+        var.index = self.var_prime()
+        return var
+
+    def check_indexing(self, var, indexed):
+        # Arrays can only be used element by element, and only arrays can be indexed
+        is_array = self.symbol_table.lookup(var.name).additional_info is not None
+        if indexed and not is_array:
+            raise SyntaxError(f"'{var.name}' without an index", self.current_token, custom_message=f"Variable '{var.name}' is not an array")
+        if is_array and not indexed:
+            raise SyntaxError(f"an index for array '{var.name}'", self.current_token, custom_message=f"Array '{var.name}' must be indexed")
+
+    def var_ref(self):
+        # The ID part of var: a reference to a declared variable
+        if self.kind == ID:
+            var_name = self.value()
+            line = self.line()
             var_entry = self.symbol_table.lookup(var_name)
             if var_entry is None:
-                raise SyntaxError(f"Undeclared variable '{var_name}'", self.current_token, custom_message=f"Undeclared variable '{var_name}'")
-            self.match('ID')
-            var_prime_value = self.var_prime()
-            return var_name, var_entry.type
+                raise SyntaxError('a declared variable', self.current_token, custom_message=f"Undeclared variable '{var_name}'")
+            self.match(ID)
+            return Var(var_name, None, var_entry.type, var_entry.depth, var_entry.slot, line)
         else:
-            raise SyntaxError('Expected identifier', self.current_token)
+            raise SyntaxError('identifier', self.current_token)
 
     def var_prime(self):
-        if self.current_token and self.current_token.type == 'LBRACKET':
-            self.match('LBRACKET')
-            expression_value = self.expression()
-            self.match('RBRACKET')
-            return ('ARRAY_ACCESS', expression_value)
+        # var-prime -> [ expression ] | epsilon
+        if self.kind == LBRACKET:
+            self.match(LBRACKET)
+            index = self.expression()
+            self.match(RBRACKET)
+            return index
         else:
             return None  # epsilon case
 
     def param_prime(self):
         # param-prime -> epsilon | [ ]
-        if self.current_token and self.current_token.type == 'LBRACKET':
-            self.match('LBRACKET')
-            self.match('RBRACKET')
+        if self.kind == LBRACKET:
+            self.match(LBRACKET)
+            self.match(RBRACKET)
             return 'ARRAY'
         else:
             return None  # epsilon case
 
     def compound_stmt(self):
-        # compound-stmt -> { statement-list }
-        self.match('LBRACE')
-        statement_list_value = self.statement_list()
-        self.match('RBRACE')
-        return {'COMPOUND': statement_list_value}
+        # compound-stmt -> { local-declarations statement-list }
+        # local-declarations -> declaration local-declarations | epsilon
+        line = self.line()
+        self.match(LBRACE)
+        self.symbol_table.enter_scope()
+        depth = self.symbol_table.depth
+        declarations = self.declaration_list_prime([])
+        statements = self.statement_list()
+        self.symbol_table.exit_scope()
+        self.match(RBRACE)
+        return Compound(declarations, statements, depth, line)
 
     def statement_list(self):
         # statement-list -> statement statement-list | epsilon
         statements = []
-        while self.current_token and self.current_token.type not in ['RBRACE', 'EOF']:
-            statements.append(self.statement())
+        depth = self.depth
+        while self.kind != RBRACE and self.kind != EOF:
+            try:
+                statements.append(self.statement())
+            except SyntaxError as e:
+                self.depth = depth  # back out of the statements the error was raised in
+                self.recover(e)
         return statements
 
     def statement(self):
         # statement -> assignment-statement | compound-statement | selection-statement | iteration-statement
-        if self.current_token.type == 'ID':  # assuming an assignment-statement starts with an ID
+        if self.kind == ID:  # assuming an assignment-statement starts with an ID
             return self.assignment_statement()
-        elif self.current_token.type == 'LBRACE':  # start of compound-statement
+        # The other statements nest statements inside them, and are parsed recursively
+        self.depth += 1
+        if self.depth > self.deepest:
+            self.deepest = self.depth
+        if self.depth % ROOM_LEVELS:
+            node = self.nested_statement()
+        else:
+            with nesting_room(ROOM_LEVELS):
+                node = self.nested_statement()
+        self.depth -= 1
+        return node
+
+    def nested_statement(self):
+        if self.kind == LBRACE:  # start of compound-statement
             return self.compound_stmt()
-        elif self.current_token.type == 'IF':  # start of selection-statement
+        elif self.kind == IF:  # start of selection-statement
             return self.selection_statement()
-        elif self.current_token.type == 'WHILE':  # start of iteration-statement
+        elif self.kind == WHILE:  # start of iteration-statement
             return self.iteration_statement()
         else:
-            raise SyntaxError('Unrecognized statement', self.current_token, custom_message=f"Unrecognized statement '{self.current_token.value}'")
+            raise SyntaxError('a statement', self.current_token, custom_message=f"Unrecognized statement '{self.value()}'")
 
     def selection_statement(self):
         # selection-statement -> if (expression ) statement selection-statement-prime
-        self.match('IF')
-        self.match('LPAREN')
-        expression_value = self.expression()
-        self.match('RPAREN')
-        statement_value = self.statement()
-        selection_statement_prime_value = self.selection_statement_prime()
-        return {'IF': expression_value, 'THEN': statement_value, 'ELSE': selection_statement_prime_value}
+        line = self.line()
+        self.match(IF)
+        self.match(LPAREN)
+        cond = self.expression()
+        self.match(RPAREN)
+        then = self.statement()
+        orelse = self.selection_statement_prime()
+        return If(cond, then, orelse, line)
 
     def type_specifier(self):
         # type-specifier -> int | float
-        if self.current_token.type =="TYPE":
-            type_spec = self.current_token.value
-            self.match(self.current_token.type)
+        if self.kind == TYPE:
+            type_spec = self.value()
+            self.match(TYPE)
             return type_spec
         else:
-            raise SyntaxError('Expected type specifier', self.current_token)
+            raise SyntaxError('type specifier', self.current_token)
 
     def params(self):
         # params -> param-list | void
-        if self.current_token.value == 'void':
-            self.match('VOID')
+        if self.kind == TYPE and self.value() == 'void':
+            self.match(TYPE)
             return 'VOID'
         else:
             return self.param_list()
@@ -388,51 +1040,65 @@ class Parser:
     def param_list(self):
         # param-list -> param param-list-prime
         params = [self.param()]
-        params.extend(self.param_list_prime())
-        return params
+        return self.param_list_prime(params)
 
-    def param_list_prime(self):
+    def param_list_prime(self, params):
         # param-list-prime -> , param param-list-prime | epsilon
-        if self.current_token and self.current_token.type == 'COMMA':
-            self.match('COMMA')
-            return [self.param()] + self.param_list_prime()
-        else:
-            return []  # epsilon case
+        # Written as a loop, like declaration_list_prime
+        while self.kind == COMMA:
+            self.match(COMMA)
+            params.append(self.param())
+        return params
 
     def param(self):
         # param -> type-specifier ID param-prime
         type_spec = self.type_specifier()
-        if self.current_token.type == 'ID':
-            id_value = self.current_token.value
-            self.match('ID')
+        if self.kind == ID:
+            id_value = self.value()
+            self.match(ID)
             param_prime_value = self.param_prime()
             return {'type': type_spec, 'id': id_value, 'param_prime': param_prime_value}
         else:
-            raise SyntaxError('Expected identifier', self.current_token)
+            raise SyntaxError('identifier', self.current_token)
     
     def program(self):
         # program -> Program ID { declaration-list statement-list }
-        self.match('PROGRAM')
-        program_name = self.current_token.value
-        self.match('ID')
-        self.match('LBRACE')
-        declaration_list_value = self.declaration_list()
-        statement_list_value = self.statement_list()
-        self.match('RBRACE')
-        return {'PROGRAM': program_name, 'DECLARATIONS': declaration_list_value, 'STATEMENTS': statement_list_value}
+        # Errors inside the declaration and statement lists are recovered from, so the whole program
+        # is always parsed; the first error is then raised, and self.errors holds all of them.
+        try:
+            line = self.line()
+            self.match(PROGRAM)
+            program_name = self.value()
+            self.match(ID)
+            self.match(LBRACE)
+            declarations = self.declaration_list()
+            statements = self.statement_list()
+            self.match(RBRACE)
+        except SyntaxError as e:
+            self.error(e)
+        if self.first_error is not None:
+            raise self.first_error
+        # The program and an assignment around the deepest expression
+        return Program(program_name, declarations, statements, line, self.deepest + 2)
 
     def declaration_list(self):
         # declaration-list -> declaration declaration-list-prime
-        declarations = [self.declaration()]
-        declarations.extend(self.declaration_list_prime())
-        return declarations
+        declarations = []
+        try:
+            declarations.append(self.declaration())
+        except SyntaxError as e:
+            self.recover(e)
+        return self.declaration_list_prime(declarations)
 
-    def declaration_list_prime(self):
+    def declaration_list_prime(self, declarations):
         # declaration-list-prime -> declaration declaration-list-prime | epsilon
-        if self.current_token and self.current_token.type =="TYPE":  # Assuming types start declarations
-            return [self.declaration()] + self.declaration_list_prime()
-        else:
-            return []  # epsilon case
+        # The tail recursion runs as a loop appending to one list, so long lists take linear time and constant stack
+        while self.kind == TYPE:  # Assuming types start declarations
+            try:
+                declarations.append(self.declaration())
+            except SyntaxError as e:
+                self.recover(e)
+        return declarations
 
     def declaration(self):
         # declaration -> var-declaration
@@ -440,73 +1106,343 @@ class Parser:
 
     def var_declaration(self):
         # var-declaration -> type-specifier ID var-declaration-prime
+        line = self.line()
         type_spec = self.type_specifier()
-        var_name = self.current_token.value
-        self.match('ID')
-        self.symbol_table.declare(var_name, type_spec)
-        var_decl_prime_value = self.var_declaration_prime()
-        
-        # Check if var_decl_prime_value is a dictionary with an 'ARRAY_SIZE' key
-        array_size = None
-        if isinstance(var_decl_prime_value, dict):
-            array_size = var_decl_prime_value['ARRAY_SIZE']
-        
-        # Add the variable to the symbol table
-        # self.symbol_table.add(var_name, type_spec, additional_info=array_size)
-        
-        return {'TYPE': type_spec, 'ID': var_name, 'VAR_DECL_PRIME': var_decl_prime_value}
+        var_name = self.value()
+        token = self.current_token
+        self.match(ID)
+        entry = self.symbol_table.declare(var_name, type_spec, token=token)
+        array_size = self.var_declaration_prime()
+        entry.additional_info = array_size
+        return VarDecl(type_spec, var_name, array_size, entry.slot, line)
 
 
     def var_declaration_prime(self):
         # var-declaration-prime -> ; | [ NUM ] ;
-        if self.current_token.type == 'SEMI':
-            self.match('SEMI')
-            return 'SIMPLE'
-        elif self.current_token.type == 'LBRACKET':
-            self.match('LBRACKET')
-            num_value = self.current_token.value
-            self.match('NUM')
-            self.match('RBRACKET')
-            self.match('SEMI')
-            return {'ARRAY_SIZE': num_value}
+        if self.kind == SEMI:
+            self.match(SEMI)
+            return None
+        elif self.kind == LBRACKET:
+            self.match(LBRACKET)
+            num_value = self.value()
+            if self.kind == NUM and (not num_value.isdigit() or int(num_value) == 0):
+                raise SyntaxError('a positive array size', self.current_token, custom_message=f"Array size must be a positive integer, not {num_value}")
+            self.match(NUM)
+            self.match(RBRACKET)
+            self.match(SEMI)
+            return int(num_value)
         else:
-            raise SyntaxError('Expected ";" or "["', self.current_token)
-    
+            raise SyntaxError('";" or "["', self.current_token)
 
-    def compute_relop_result(self, relop, operand_type, left_value, right_value):
-        # Ensure that both operands are of the same type for simplicity
-        if operand_type != type(left_value).__name__ or operand_type != type(right_value).__name__:
-            raise Exception("Type error: Operand types do not match in relational operation.")
-        
-        # Evaluate the relational operation
-        if relop == '==':
-            return left_value == right_value
-        elif relop == '!=':
-            return left_value != right_value
-        elif relop == '<':
-            return left_value < right_value
-        elif relop == '<=':
-            return left_value <= right_value
-        elif relop == '>':
-            return left_value > right_value
-        elif relop == '>=':
-            return left_value >= right_value
-        else:
-            raise Exception(f"Unknown relational operator {relop}")
-
-    def compute_addop_result(self, addop, operand_type, left_value, right_value):
-        # Ensure that both operands are of the same type for simplicity
-        if operand_type != type(left_value).__name__ or operand_type != type(right_value).__name__:
-            raise Exception("Type error: Operand types do not match in addition operation.")
-        
-        # Evaluate the addition/subtraction operation
-        if addop == '+':
-            return left_value + right_value
-        elif addop == '-':
-            return left_value - right_value
+    def parse(self, backend='ast', optimize=False, limits=None, vectorize=False):
+        # This is the entry point of the parser
+        try:
+            program = self.program()
+            print("Parsing successful.")
+            execute(program, backend, optimize, limits, vectorize)
+            return True
+        except SyntaxError as e:
+            if self.first_error is None:
+                # Raised before the parser recorded anything, e.g. by the scanner
+                print(f"Syntax error: {e}")
+            for error in self.errors:
+                print(f"Syntax error: {error}")
+            return False
+
+
+RELOPS = ('==', '!=', '<', '<=', '>', '>=')
+
+class ExecutionLimitError(Exception):
+    """
+    Raised when a run exceeds its step budget or wall-clock deadline.
+    limit is 'steps' or 'time'; statement and line identify the loop that was running.
+    """
+    def __init__(self, limit, statement, line, steps, seconds):
+        self.limit = limit
+        self.statement = statement
+        self.line = line
+        self.steps = steps      # loop iterations executed when the run was stopped
+        self.seconds = seconds  # time the run had taken
+        at = f"{statement} statement at line {line}" if line is not None else f"{statement} statement"
+        if limit == 'steps':
+            message = f"Runtime error: Step limit exceeded after {steps} steps in {at}."
         else:
-            raise Exception(f"Unknown addition operator {addop}")
+            message = f"Runtime error: Time limit exceeded after {seconds:.3f} s ({steps} steps) in {at}."
+        super().__init__(message)
+
+
+class ExecutionLimits:
+    """
+    A step budget and a wall-clock deadline for one run. A step is one iteration of a while loop,
+    the only construct that can repeat, so a program without loops always finishes on its own.
+    Backends count down to the next check themselves, at the start of each iteration, and only call
+    check() every interval steps, which keeps the cost in the loop to a decrement and a test.
+    """
+    def __init__(self, max_steps=None, timeout=None, interval=1000):
+        # A countdown starting at 0 or below would never reach 0, and the limits would never be checked
+        if max_steps is not None and max_steps < 0:
+            raise ValueError(f"max_steps must be 0 or more, not {max_steps}")
+        if interval < 1:
+            raise ValueError(f"interval must be 1 or more, not {interval}")
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.interval = interval
+        self.steps = 0
+        self.countdown = 0  # steps between the last check and the next one
+        self.start_time = None
+        self.deadline = None
+
+    def start(self):
+        # Begin a run; returns the countdown to the first check
+        self.steps = 0
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time + self.timeout if self.timeout is not None else None
+        return self.next_check()
+
+    def next_check(self):
+        # Iterations until the next check; the check comes as the one past the step budget starts
+        countdown = self.interval
+        if self.max_steps is not None:
+            countdown = min(countdown, self.max_steps - self.steps + 1)
+        self.countdown = countdown
+        return countdown
+
+    def check(self, statement, line):
+        # Called when a countdown runs out as an iteration of the loop statement at line starts;
+        # steps counts that iteration, which only runs if this returns (the next countdown)
+        self.steps += self.countdown
+        now = time.monotonic()
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise ExecutionLimitError('steps', statement, line, self.steps - 1, now - self.start_time)
+        if self.deadline is not None and now > self.deadline:
+            raise ExecutionLimitError('time', statement, line, self.steps - 1, now - self.start_time)
+        return self.next_check()
+
+
+def finish(steps):
+    # Run a paused execution (a generator that yields at every limits check) to its end;
+    # returns the generator's return value
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+class TypeChecker:
+    """
+    Static type checking, run once over a parsed Program before it is executed. Every BinOp is
+    annotated with the type of its result, and the first type error is raised before anything
+    runs, so the evaluator never compares types while running.
+    """
+    def __init__(self):
+        self.methods = {}
+
+    def visit(self, node):
+        # Dispatch on the node class name, e.g. Assign -> visit_Assign
+        cls = node.__class__
+        method = self.methods.get(cls)
+        if method is None:
+            method = self.methods[cls] = getattr(self, 'visit_' + cls.__name__)
+        return method(node)
+
+    def check(self, program):
+        for statement in program.statements:
+            self.visit(statement)
+        program.checked = True
+        return program
+
+    # Statements
+
+    def visit_Assign(self, node):
+        target = node.target
+        if target.index is not None:
+            self.visit_index(target)
+        expression_type = self.visit(node.expr)
+        if target.type != expression_type:
+            raise Exception(f"Type error: Cannot assign value of type {expression_type} to variable '{target.name}' of type {target.type}.")
+
+    def visit_Compound(self, node):
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_If(self, node):
+        self.visit(node.cond)
+        self.visit(node.then)
+        if node.orelse is not None:
+            self.visit(node.orelse)
+
+    def visit_While(self, node):
+        self.visit(node.cond)
+        self.visit(node.body)
+
+    # Expressions: each returns its type
+
+    def visit_Num(self, node):
+        return node.type
+
+    def visit_Var(self, node):
+        if node.index is not None:
+            self.visit_index(node)
+        return node.type
+
+    def visit_index(self, node):
+        index_type = self.visit(node.index)
+        if index_type != 'int':
+            raise Exception(f"Type error: Array index must be int, not {index_type}.")
+
+    def visit_BinOp(self, node):
+        left_type = self.visit(node.left)
+        right_type = self.visit(node.right)
+        if left_type != right_type:
+            raise Exception(f"Type error: Cannot perform '{node.op}' operation between types {left_type} and {right_type}.")
+        # Relational expressions yield 1 or 0, as in C
+        node.type = 'int' if node.op in RELOPS else left_type
+        return node.type
+
+
+def check_types(program):
+    # Type-check a program unless that has been done already
+    if not program.checked:
+        with nesting_room(program_height(program)):
+            TypeChecker().check(program)
+    return program
+
+
+class Evaluator:
+    """
+    Walks the AST built by Parser.program(). A program is parsed once and can be run any number of times.
+    The program is type-checked before its first run, so expressions evaluate to plain values.
+    """
+    # Operators that need neither a type nor a check, applied directly to the operand values
+    OPERATIONS = {'+': operator.add, '-': operator.sub, '*': operator.mul}
+    COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+                   '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+    def __init__(self, vectorize=False):
+        self.symbol_table = None
+        self.frames = None
+        self.limits = None
+        self.countdown = None
+        self.methods = {}
+        self.vectorizer = None
+        if vectorize:
+            # Simple counted loops over arrays run as NumPy vector operations, when NumPy is installed
+            from vectorize import Vectorizer
+            self.vectorizer = Vectorizer()
+
+    def visit(self, node):
+        # Dispatch on the node class name, e.g. Assign -> visit_Assign
+        cls = node.__class__
+        method = self.methods.get(cls)
+        if method is None:
+            method = self.methods[cls] = getattr(self, 'visit_' + cls.__name__)
+        return method(node)
+
+    def run(self, program, limits=None):
+        # Every run starts from fresh frames, so the same Program can be executed repeatedly.
+        # frames[depth] holds the values of the innermost active scope at that depth.
+        # limits, an ExecutionLimits, bounds the number of loop iterations and the run time.
+        check_types(program)
+        self.limits = limits
+        if limits is not None:
+            self.countdown = limits.start()
+        global_frame = self.new_frame(program.declarations)
+        self.frames = [global_frame]
+        with nesting_room(program_height(program)):
+            for statement in program.statements:
+                self.visit(statement)
+        self.symbol_table = SymbolTable.from_frame(program.declarations, global_frame)
+        return self.symbol_table
+
+    def new_frame(self, declarations):
+        # Variables start out zeroed, as C-minus globals do
+        return [initial_value(declaration) for declaration in declarations]
+
+    # Statements
+
+    def visit_Assign(self, node):
+        target = node.target
+        frame = self.frames[target.depth]
+        if target.index is None:
+            frame[target.slot] = self.visit(node.expr)
+            return
+        buffer = frame[target.slot]
+        index = self.array_index(target, buffer)
+        expression_value = self.visit(node.expr)
+        try:
+            buffer[index] = expression_value
+        except OverflowError:
+            raise Exception(f"Runtime error: Value {expression_value} does not fit in an element of array '{target.name}'.")
+
+    def visit_Compound(self, node):
+        if node.declarations:
+            # Entering the block creates its scope afresh
+            frames = self.frames
+            while len(frames) <= node.depth:
+                frames.append(None)
+            frames[node.depth] = self.new_frame(node.declarations)
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_If(self, node):
+        if self.visit(node.cond):
+            self.visit(node.then)
+        elif node.orelse is not None:
+            self.visit(node.orelse)
+
+    def visit_While(self, node):
+        # The condition and body are already-built nodes, so each iteration is just another walk
+        if self.vectorizer is not None and self.vectorizer.run(node, self):
+            return
+        if self.limits is not None:
+            return self.limited_while(node)
+        while self.visit(node.cond):
+            self.visit(node.body)
+
+    def limited_while(self, node):
+        # Every iteration counts as a step, and every so many the limits are checked
+        limits = self.limits
+        while self.visit(node.cond):
+            self.countdown -= 1
+            if not self.countdown:
+                self.countdown = limits.check('while', node.line)
+            self.visit(node.body)
 
+    # Expressions: each returns its value; types were settled by TypeChecker
+
+    def visit_Num(self, node):
+        return node.value
+
+    def visit_Var(self, node):
+        value = self.frames[node.depth][node.slot]
+        if node.index is None:
+            return value
+        return value[self.array_index(node, value)]
+
+    def array_index(self, node, buffer):
+        # Evaluate and bounds-check the index of an array access
+        index = self.visit(node.index)
+        if not 0 <= index < len(buffer):
+            raise Exception(f"Runtime error: Index {index} out of bounds for array '{node.name}' of size {len(buffer)}.")
+        return index
+
+    def visit_BinOp(self, node):
+        op = node.op
+        left_value = self.visit(node.left)
+        right_value = self.visit(node.right)
+        operation = self.OPERATIONS.get(op)
+        if operation is not None:
+            return operation(left_value, right_value)
+        comparison = self.COMPARISONS.get(op)
+        if comparison is not None:
+            # Relational expressions yield 1 or 0, as in C
+            return 1 if comparison(left_value, right_value) else 0
+        result_value = self.compute_mulop_result(op, left_value, right_value)
+        if node.type == 'int':
+            # Integer division truncates, like the int() conversion on assignment always did
+            result_value = int(result_value)
+        return result_value
 
     def compute_mulop_result(self, operation, left_value, right_value):
         # Perform the multiplication or division based on the operation
@@ -520,20 +1456,67 @@ class Parser:
         else:
             raise Exception(f"Unknown multiplication operator {operation}")
 
-    def parse(self):
-        # This is the entry point of the parser
-        try:
-            self.program()
-            print("Parsing successful.")
-            # Print the symbol table
-            self.symbol_table.print_table()
-            return True
-        except SyntaxError as e:
-            print(f"Syntax error: {e}")
-            return False
+
+def execute(program, backend='ast', optimize=False, limits=None, vectorize=False):
+    # Optionally optimize, then run the program (within limits, an ExecutionLimits) and print the
+    # resulting symbol table. vectorize lets the AST evaluator run simple array loops with NumPy.
+    if optimize:
+        from optimizer import Optimizer
+        optimizer = Optimizer()
+        program = optimizer.optimize(program)
+        print(optimizer.report())
+    if backend == 'vm':
+        from vm import Compiler, VM
+        symbol_table = VM().run(Compiler().compile(program), limits)
+    elif backend == 'python':
+        from pycodegen import PythonCompiler
+        symbol_table = PythonCompiler().compile(program).run(limits=limits)
+    else:
+        symbol_table = Evaluator(vectorize).run(program, limits)
+    symbol_table.print_table()
+    return symbol_table
 
 
 if __name__ == "__main__":
+    import argparse
+    import sys
+
+    # Let sibling modules (vm, ...) import this script as `interpreter` without loading it twice
+    sys.modules.setdefault('interpreter', sys.modules[__name__])
+
+    arg_parser = argparse.ArgumentParser(description="Parse and run a program.")
+    arg_parser.add_argument('file', nargs='?', help="program source file (defaults to a built-in example)")
+    arg_parser.add_argument('--backend', choices=['ast', 'vm', 'python'], default='ast',
+                            help="run by walking the AST, by compiling to bytecode for the stack VM, "
+                                 "or by compiling to a Python function")
+    arg_parser.add_argument('--dis', action='store_true',
+                            help="print the bytecode listing (the generated source with --backend=python) instead of running")
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help="fold constants and remove dead branches and stores before running")
+    arg_parser.add_argument('--batch', nargs='+', metavar='PATH',
+                            help="check every program in these directories / glob patterns in parallel")
+    arg_parser.add_argument('--jobs', type=int, help="worker processes for --batch (default: CPU count)")
+    arg_parser.add_argument('--cache', nargs='?', const='', metavar='DIR',
+                            help="reuse parsed programs from an on-disk cache (default dir: ~/.cache/a3_interpreter)")
+    arg_parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                            help="write phase times, grammar rule and statement counts as JSON (default: stdout)")
+    arg_parser.add_argument('--vectorize', action='store_true',
+                            help="run simple element-wise array loops as NumPy vector operations (ast backend)")
+    arg_parser.add_argument('--max-steps', type=int, metavar='N',
+                            help="stop the program after N loop iterations")
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                            help="stop the program once it has run this long")
+    args = arg_parser.parse_args()
+
+    if args.max_steps is not None and args.max_steps < 0:
+        arg_parser.error("--max-steps must be 0 or more")
+    limits = None
+    if args.max_steps is not None or args.timeout is not None:
+        limits = ExecutionLimits(args.max_steps, args.timeout)
+
+    if args.batch:
+        from batch import run_batch
+        sys.exit(run_batch(args.batch, jobs=args.jobs))
 
     code = """
     Program X {
@@ -551,8 +1534,114 @@ if __name__ == "__main__":
     }
     }
     """
-    
-    tokens = list(lexer(code))
-    ##### PARSE #####
-    parser = Parser(tokens)
-    parser.parse()
\ No newline at end of file
+    if args.profile is not None:
+        # Instrumented run; the report is written even when parsing fails. When it goes to stdout,
+        # everything else goes to stderr, so stdout is just the JSON.
+        from profiler import Profiler
+        profiler = Profiler()
+        output = sys.stderr if args.profile == '-' else sys.stdout
+        status = 0
+        try:
+            symbol_table = profiler.run(None if args.file else code, args.file, args.backend, args.optimize, limits)
+            symbol_table.print_table(output)
+        except SyntaxError:
+            for error in profiler.errors:
+                print(f"Syntax error: {error}", file=output)
+            status = 1
+        except ExecutionLimitError as e:
+            print(e, file=output)
+            status = 1
+        if args.profile == '-':
+            print(profiler.to_json())
+        else:
+            with open(args.profile, 'w') as f:
+                f.write(profiler.to_json())
+        sys.exit(status)
+
+    # Pre-lexed input: a binary token file written by tokenfile.py, or a token dump from the A2 parser
+    pre_lexed = False
+    if args.file:
+        from tokenfile import is_token_file
+        pre_lexed = args.file.endswith('_lex.txt') or is_token_file(args.file)
+
+    if args.cache is not None and not args.dis and not pre_lexed:
+        # A cache hit skips lexing and parsing entirely
+        from cache import CompilationCache
+        if args.file:
+            with open(args.file) as f:
+                code = f.read()
+        cache = CompilationCache(args.cache or None)
+        try:
+            program = cache.load_program(code)
+        except SyntaxError as e:
+            for error in e.errors:
+                print(f"Syntax error: {error}")
+            sys.exit(1)
+        print("Loaded from cache." if cache.hits else "Parsing successful.")
+        try:
+            execute(program, backend=args.backend, optimize=args.optimize, limits=limits, vectorize=args.vectorize)
+        except ExecutionLimitError as e:
+            print(e)
+            sys.exit(1)
+        sys.exit(0)
+
+    program = None
+    try:
+        if pre_lexed:
+            from tokenfile import SyntaxOnlyParser, TokenFile, lex_text_stream
+            if args.file.endswith('_lex.txt'):
+                tokens, erased = lex_text_stream(args.file), True
+            else:
+                token_file = TokenFile(args.file)
+                tokens, erased, program = token_file.stream(), token_file.erased, token_file.program()
+            if erased:
+                # Identifiers and numbers were written as ID and NUM, so the program can be checked but not run
+                parser = SyntaxOnlyParser(tokens)
+                try:
+                    parser.program()
+                except SyntaxError:
+                    for error in parser.errors:
+                        print(f"Syntax error: {error}")
+                    sys.exit(1)
+                print("Parsing successful.")
+                print("Identifier names and number values are not in this file; checked for syntax only.")
+                sys.exit(0)
+        elif args.file:
+            # Memory-map the file and scan it as the parser goes
+            tokens = tokenize_file(args.file)
+        else:
+            tokens = tokenize(code)
+        ##### PARSE #####
+        parser = Parser(tokens)
+    except SyntaxError as e:
+        # A lexical error in the first tokens scanned, before the parser has anything to recover from
+        print(f"Syntax error: {e}")
+        sys.exit(1)
+    if args.dis:
+        if program is None:
+            try:
+                program = parser.program()
+            except SyntaxError:
+                for error in parser.errors:
+                    print(f"Syntax error: {error}")
+                sys.exit(1)
+        if args.optimize:
+            from optimizer import Optimizer
+            program = Optimizer().optimize(program)
+        if args.backend == 'python':
+            from pycodegen import PythonCompiler
+            print(PythonCompiler().compile(program).source, end='')
+        else:
+            from vm import Compiler, disassemble
+            print(disassemble(Compiler().compile(program)))
+    else:
+        try:
+            if program is not None:
+                # The token file holds the parsed program too
+                print("Loaded from token file.")
+                execute(program, backend=args.backend, optimize=args.optimize, limits=limits, vectorize=args.vectorize)
+            elif not parser.parse(backend=args.backend, optimize=args.optimize, limits=limits, vectorize=args.vectorize):
+                sys.exit(1)
+        except ExecutionLimitError as e:
+            print(e)
+            sys.exit(1)
@@ -0,0 +1,236 @@
+from interpreter import Assign, BinOp, Compound, Evaluator, If, Node, Num, Var, While, check_types, nesting_room, program_height
+
+# Optimization pass over a parsed Program. Rewrites the AST in place:
+# The program is type-checked first, so every operator already carries its result type.
+# - constant folding: operators whose operands are both literals become one literal, computed by
+#   Evaluator.visit_BinOp so the results are exactly what running the program would give.
+#   A division by a literal zero is left alone, so it still raises at run time if it is reached.
+# - dead-branch elimination: an if whose condition is a constant keeps only the branch that runs,
+#   and a while whose condition is constantly false is removed.
+# - dead-store elimination: an assignment is removed when nothing can read the value it stores,
+#   either because a later assignment in the same statement list overwrites it first, or because it
+#   stores into a block-local variable that is never read. Global variables are part of the final
+#   symbol table, so their last assignment is always kept.
+
+
+def count_nodes(node):
+    # Number of AST nodes in the subtree rooted at node, counted without recursing
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        count += 1
+        for name in node.__slots__:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(value)
+    return count
+
+
+def reads(node, keys):
+    # The (depth, slot) keys of every variable read in the subtree, added to keys
+    cls = node.__class__
+    if cls is Var:
+        keys.add((node.depth, node.slot))
+        if node.index is not None:
+            reads(node.index, keys)
+    elif cls is BinOp:
+        reads(node.left, keys)
+        reads(node.right, keys)
+    elif cls is Assign:
+        # Only the index of an assignment target is read, not the target itself
+        if node.target.index is not None:
+            reads(node.target.index, keys)
+        reads(node.expr, keys)
+    elif cls is Compound:
+        for statement in node.statements:
+            reads(statement, keys)
+    elif cls is If:
+        reads(node.cond, keys)
+        reads(node.then, keys)
+        if node.orelse is not None:
+            reads(node.orelse, keys)
+    elif cls is While:
+        reads(node.cond, keys)
+        reads(node.body, keys)
+    return keys
+
+
+def cannot_fail(expr):
+    # True if evaluating expr can never raise: no divisions and no array indexing
+    cls = expr.__class__
+    if cls is Num:
+        return True
+    if cls is Var:
+        return expr.index is None
+    return expr.op != '/' and cannot_fail(expr.left) and cannot_fail(expr.right)
+
+
+class Optimizer:
+    def __init__(self):
+        self.evaluator = Evaluator()
+        self.methods = {}
+        self.folded = 0
+        self.branches_removed = 0
+        self.stores_removed = 0
+        self.eliminated = 0  # AST nodes removed in total
+
+    def visit(self, node):
+        # Dispatch on the node class name, e.g. Assign -> visit_Assign
+        cls = node.__class__
+        method = self.methods.get(cls)
+        if method is None:
+            method = self.methods[cls] = getattr(self, 'visit_' + cls.__name__)
+        return method(node)
+
+    def optimize(self, program):
+        check_types(program)
+        with nesting_room(program_height(program)):
+            program.statements = self.visit_list(program.statements)
+        return program
+
+    def report(self):
+        return (f"Optimizer: eliminated {self.eliminated} nodes "
+                f"({self.folded} folded operations, {self.branches_removed} dead branches, "
+                f"{self.stores_removed} dead stores)")
+
+    def remove(self, node):
+        self.eliminated += count_nodes(node)
+
+    # Statements: each visit returns the replacement statement, or None to drop it
+
+    def visit_list(self, statements):
+        result = []
+        for statement in statements:
+            statement = self.visit(statement)
+            if statement is not None:
+                result.append(statement)
+        return self.remove_overwritten_stores(result)
+
+    def visit_Assign(self, node):
+        if node.target.index is not None:
+            node.target.index = self.fold(node.target.index)
+        node.expr = self.fold(node.expr)
+        return node
+
+    def visit_Compound(self, node):
+        node.statements = self.visit_list(node.statements)
+        if node.declarations:
+            self.remove_unread_locals(node)
+        return node
+
+    def visit_If(self, node):
+        node.cond = self.fold(node.cond)
+        if node.cond.__class__ is Num:
+            # Only one branch can ever run
+            self.branches_removed += 1
+            self.eliminated += 1 + count_nodes(node.cond)
+            if node.cond.value:
+                self.remove(node.orelse)
+                return self.visit(node.then)
+            self.remove(node.then)
+            return self.visit(node.orelse) if node.orelse is not None else None
+        node.then = self.visit(node.then) or Compound([], [], None, node.then.line)
+        if node.orelse is not None:
+            node.orelse = self.visit(node.orelse)
+        return node
+
+    def visit_While(self, node):
+        node.cond = self.fold(node.cond)
+        if node.cond.__class__ is Num and not node.cond.value:
+            # The body can never run
+            self.branches_removed += 1
+            self.remove(node)
+            return None
+        node.body = self.visit(node.body) or Compound([], [], None, node.body.line)
+        return node
+
+    # Dead stores
+
+    def remove_overwritten_stores(self, statements):
+        # Drop an assignment to a scalar when a later statement in the same list overwrites it and
+        # nothing in between (nor the overwriting expression) reads it
+        result = []
+        for i, statement in enumerate(statements):
+            if statement.__class__ is Assign and statement.target.index is None and cannot_fail(statement.expr):
+                key = (statement.target.depth, statement.target.slot)
+                if self.overwritten(key, statements, i + 1):
+                    self.stores_removed += 1
+                    self.remove(statement)
+                    continue
+            result.append(statement)
+        return result
+
+    def overwritten(self, key, statements, start):
+        # Nested statements only matter if they read the variable; whether they write it depends on control flow
+        for statement in statements[start:]:
+            if key in reads(statement, set()):
+                return False
+            if statement.__class__ is Assign:
+                target = statement.target
+                if target.index is None and (target.depth, target.slot) == key:
+                    return True
+        return False
+
+    def remove_unread_locals(self, block):
+        # Stores into the block's own variables that are never read anywhere in the block are dead
+        read_keys = set()
+        for statement in block.statements:
+            reads(statement, read_keys)
+        dead = {(block.depth, declaration.slot) for declaration in block.declarations} - read_keys
+        if dead:
+            block.statements = self.drop_stores(block.statements, dead)
+
+    def drop_stores(self, statements, dead):
+        result = []
+        for statement in statements:
+            cls = statement.__class__
+            if cls is Assign:
+                # Element stores are kept: their bounds check can still fail
+                target = statement.target
+                if (target.depth, target.slot) in dead and target.index is None and cannot_fail(statement.expr):
+                    self.stores_removed += 1
+                    self.remove(statement)
+                    continue
+            elif cls is Compound:
+                statement.statements = self.drop_stores(statement.statements, dead)
+            elif cls is If:
+                statement.then = self.drop_store(statement.then, dead)
+                if statement.orelse is not None:
+                    statement.orelse = self.drop_store(statement.orelse, dead)
+            elif cls is While:
+                statement.body = self.drop_store(statement.body, dead)
+            result.append(statement)
+        return result
+
+    def drop_store(self, statement, dead):
+        # A single branch or loop body: keep a placeholder block where a statement was removed
+        kept = self.drop_stores([statement], dead)
+        return kept[0] if kept else Compound([], [], None, statement.line)
+
+    # Expressions
+
+    def fold(self, expr):
+        cls = expr.__class__
+        if cls is Var:
+            if expr.index is not None:
+                expr.index = self.fold(expr.index)
+            return expr
+        if cls is not BinOp:
+            return expr
+        expr.left = left = self.fold(expr.left)
+        expr.right = right = self.fold(expr.right)
+        if left.__class__ is not Num or right.__class__ is not Num:
+            return expr
+        op = expr.op
+        if op == '/' and right.value == 0:
+            # Leave it to raise "Division by zero" at run time, if it is ever evaluated
+            return expr
+        value = self.evaluator.visit_BinOp(expr)
+        self.folded += 1
+        self.eliminated += 2
+        return Num(value, expr.type, expr.line)
@@ -0,0 +1,162 @@
+import json
+import time
+
+from interpreter import Evaluator, Parser, SyntaxError, tokenize, tokenize_file
+
+# Opt-in instrumentation for the lex / parse / evaluate pipeline.
+# Nothing here touches Parser or Evaluator themselves: a Profiler builds instrumented subclasses
+# whose grammar-rule and statement methods are wrapped with counters and timers, so a normal run
+# pays nothing for it. Results come out as one JSON document:
+#   phases      wall time of each phase, with token counts for lexing and parsing
+#   rules       calls and cumulative time per grammar rule; a rule's time includes the rules it
+#               calls, and recursive calls (statement inside statement) are counted only once
+#   statements  how many times each statement was executed, by source line
+
+# Parser methods that implement grammar rules
+RULES = [
+    'program', 'declaration_list', 'declaration_list_prime', 'declaration', 'var_declaration',
+    'var_declaration_prime', 'type_specifier', 'statement_list', 'statement', 'assignment_statement',
+    'compound_stmt', 'selection_statement', 'selection_statement_prime', 'iteration_statement',
+    'expression', 'factor', 'var', 'var_ref', 'var_prime', 'match',
+]
+
+# Evaluator methods that execute a statement
+STATEMENTS = ['visit_Assign', 'visit_Compound', 'visit_If', 'visit_While']
+
+
+class RuleStats:
+    __slots__ = ('calls', 'seconds', 'active')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.active = 0  # calls of the rule currently on the stack
+
+
+class Profiler:
+    def __init__(self):
+        self.phases = {}
+        self.rules = {}
+        self.statements = {}  # statement node -> times executed
+        self.errors = []
+        self.parser_class = None
+        self.evaluator_class = None
+
+    def phase(self, name, seconds, **counts):
+        self.phases[name] = dict(seconds=seconds, **counts)
+
+    # Instrumented classes
+
+    def timed(self, name, method):
+        stats = self.rules[name] = RuleStats()
+        clock = time.perf_counter
+
+        def rule(parser, *args):
+            # Most rules take no arguments, and calling them without * keeps deep recursion off the C stack
+            stats.calls += 1
+            stats.active += 1
+            if stats.active > 1:
+                try:
+                    return method(parser, *args) if args else method(parser)
+                finally:
+                    stats.active -= 1
+            start = clock()
+            try:
+                return method(parser, *args) if args else method(parser)
+            finally:
+                stats.seconds += clock() - start
+                stats.active -= 1
+        return rule
+
+    def counted(self, method):
+        counts = self.statements
+
+        def visit(evaluator, node):
+            counts[node] = counts.get(node, 0) + 1
+            return method(evaluator, node)
+        return visit
+
+    def parser(self, tokens):
+        # A Parser whose grammar rules update self.rules
+        if self.parser_class is None:
+            namespace = {name: self.timed(name, getattr(Parser, name)) for name in RULES}
+            self.parser_class = type('ProfilingParser', (Parser,), namespace)
+        return self.parser_class(tokens)
+
+    def evaluator(self):
+        # An Evaluator that counts each statement it executes in self.statements
+        if self.evaluator_class is None:
+            namespace = {name: self.counted(getattr(Evaluator, name)) for name in STATEMENTS}
+            self.evaluator_class = type('ProfilingEvaluator', (Evaluator,), namespace)
+        return self.evaluator_class()
+
+    # A whole run
+
+    def run(self, code=None, path=None, backend='ast', optimize=False, limits=None):
+        """
+        Lex, parse and run a program (the source text, or the file at path), timing each phase.
+        limits, an ExecutionLimits, bounds the run as it does for the backends.
+        Returns the final symbol table. Syntax errors are recorded in the report and raised.
+        Statement counts are only collected by the AST backend.
+        """
+        clock = time.perf_counter
+        start = clock()
+        try:
+            if path is not None:
+                tokens = tokenize_file(path)
+                len(tokens)  # scan the whole file now rather than while parsing
+            else:
+                tokens = tokenize(code)
+        except SyntaxError as e:
+            # A lexical error; there is nothing to parse
+            self.errors = [str(e)]
+            raise
+        self.phase('lex', clock() - start, tokens=len(tokens))
+
+        parser = self.parser(tokens)
+        start = clock()
+        try:
+            program = parser.program()
+        except SyntaxError:
+            self.errors = [str(error) for error in parser.errors]
+            raise
+        finally:
+            self.phase('parse', clock() - start, tokens=parser.pos)
+
+        if optimize:
+            from optimizer import Optimizer
+            start = clock()
+            program = Optimizer().optimize(program)
+            self.phase('optimize', clock() - start)
+
+        start = clock()
+        if backend == 'vm':
+            from vm import VM, Compiler
+            bytecode = Compiler().compile(program)
+            self.phase('compile', clock() - start)
+            start = clock()
+            symbol_table = VM().run(bytecode, limits)
+        elif backend == 'python':
+            from pycodegen import PythonCompiler
+            compiled = PythonCompiler().compile(program)
+            self.phase('compile', clock() - start)
+            start = clock()
+            symbol_table = compiled.run(limits=limits)
+        else:
+            symbol_table = self.evaluator().run(program, limits)
+        self.phase('evaluate', clock() - start)
+        return symbol_table
+
+    def report(self):
+        rules = {name: {'calls': stats.calls, 'seconds': stats.seconds}
+                 for name, stats in self.rules.items() if stats.calls}
+        statements = [{'line': node.line, 'statement': node.__class__.__name__, 'count': count}
+                      for node, count in self.statements.items()]
+        statements.sort(key=lambda entry: (entry['line'] or 0, entry['statement']))
+        report = {'phases': self.phases, 'rules': rules, 'statements': statements}
+        if self.errors:
+            report['errors'] = self.errors
+        return report
+
+    def to_json(self, indent=2):
+        return json.dumps(self.report(), indent=indent)
@@ -0,0 +1,341 @@
+import math
+import re
+from array import array
+
+from interpreter import (ARRAY_TYPECODES, RELOPS, BinOp, Num, SymbolTable, Var, check_types, finish, initial_value,
+                         nesting_room, new_array, program_height)
+
+# Python backend: PythonCompiler translates a parsed Program into the source of one Python function,
+# compiled once with compile(), so loops run as CPython bytecode with no dispatch per node.
+#
+# Every declaration, in any scope, becomes a local variable of its own, named v0, v1, ... in the order
+# of declaration, so the generated code never depends on what the program calls its variables; those
+# names only appear in messages and in the SymbolTable. The program's global variables are the
+# function's parameters and its return value, so one CompiledProgram can be run again and again with
+# other initial values. Arrays are the same typed buffers the other backends use.
+#
+# The generated code keeps the semantics of Evaluator exactly:
+# - relational operators yield 1 or 0, and integer division truncates like int(l / r)
+# - array indexes are bounds-checked, so negative indexes do not wrap around
+# - an element store evaluates its index, then its value, then stores, so errors come out in the
+#   same order; each of the three is a line of its own, which tells an OverflowError of the store
+#   apart from one raised by the expression
+# - a ZeroDivisionError can only come from '/', and becomes "Runtime error: Division by zero."
+# - each loop iteration starts by counting down to the next ExecutionLimits check; the countdown and the check
+#   are passed in by run(), and without limits the countdown starts at -1 and never reaches 0.
+#   The function is a generator that yields after every check, so runs can be interleaved.
+#
+# Deeply nested expressions are split up: every SPILL levels, a subexpression is computed into a temporary
+# by a line of its own, so CPython never sees more than SPILL levels of parentheses in one expression.
+# An operand that could fail is moved into a temporary too when the other operand needed such lines,
+# so the operands are still evaluated left to right.
+
+FUNCTION = 'program'
+# CPython compiles at most 20 statically nested blocks into one function, and each while loop is one,
+# and allows at most 100 levels of indentation, one for the function body and one for each if and while.
+MAX_LOOPS = 20
+MAX_INDENT = 99
+SPILL = 32
+SIMPLE = re.compile(r'\(?-?[\w.]+\)?')  # a local, a temporary or a literal: evaluating it cannot fail
+TOO_DEEP = "Error: Program is nested too deeply for the python backend."
+
+
+def index_error(index, name, size):
+    raise Exception(f"Runtime error: Index {index} out of bounds for array '{name}' of size {size}.")
+
+
+class CompiledProgram:
+    """
+    A Program compiled to a Python function. run() mirrors Evaluator.run(): it starts from zeroed
+    variables, or from the given initial values of global variables, and returns a SymbolTable
+    with the final values. It takes the same ExecutionLimits as the other backends.
+    """
+    def __init__(self, name, declarations, source, constants, stores):
+        self.name = name
+        self.declarations = declarations  # the program's global variables, in parameter order
+        self.source = source
+        self.stores = stores              # line of each element store -> (array name, value local)
+        self.code = compile(source, f"<program {name}>", 'exec')
+        namespace = dict(constants, index_error=index_error, new_array=new_array)
+        exec(self.code, namespace)
+        self.function = namespace[FUNCTION]
+
+    def run(self, values=None, limits=None):
+        return finish(self.execute(values, limits))
+
+    def execute(self, values=None, limits=None):
+        # Generator running the program: it pauses after every limits check, and returns the final SymbolTable
+        frame = [initial_value(declaration) for declaration in self.declarations]
+        if values:
+            self.set_values(frame, values)
+        if limits is not None:
+            frame += [limits.check, limits.start()]
+        else:
+            frame += [None, -1]
+        try:
+            frame = yield from self.function(*frame)
+        except ZeroDivisionError:
+            raise Exception("Runtime error: Division by zero.") from None
+        except OverflowError as e:
+            store = self.failed_store(e.__traceback__)
+            if store is None:
+                raise
+            name, value = store
+            raise Exception(f"Runtime error: Value {value} does not fit in an element of array '{name}'.") from None
+        return SymbolTable.from_frame(self.declarations, frame)
+
+    def set_values(self, frame, values):
+        # Initial values by variable name; arrays are copied into fresh typed buffers
+        declarations = {declaration.name: declaration for declaration in self.declarations}
+        for name, value in values.items():
+            declaration = declarations.get(name)
+            if declaration is None:
+                raise Exception(f"Error: Variable '{name}' not declared.")
+            if declaration.size is None:
+                value_type = type(value).__name__
+                if value_type != declaration.type:
+                    raise Exception(f"Type error: Cannot assign value of type {value_type} to variable '{name}' of type {declaration.type}.")
+            else:
+                try:
+                    value = array(ARRAY_TYPECODES[declaration.type], value)
+                except (TypeError, OverflowError):
+                    raise Exception(f"Type error: Cannot assign these values to array '{name}' of type {declaration.type}.") from None
+                if len(value) != declaration.size:
+                    raise Exception(f"Error: Array '{name}' has {declaration.size} elements, not {len(value)}.")
+            frame[declaration.slot] = value
+
+    def failed_store(self, traceback):
+        # The array name and value if the innermost frame of the generated code failed at an element store
+        line = None
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == self.code.co_filename:
+                line = traceback.tb_lineno
+                frame_locals = traceback.tb_frame.f_locals
+            traceback = traceback.tb_next
+        store = self.stores.get(line)
+        if store is None:
+            return None
+        name, local = store
+        return name, frame_locals[local]
+
+
+class PythonCompiler:
+    """
+    Translates a Program built by Parser.program() into a CompiledProgram.
+    The program is type-checked first, so each operator's result type is on the AST.
+    """
+    def __init__(self):
+        self.methods = {}
+
+    def visit(self, node):
+        # Dispatch on the node class name, e.g. Assign -> visit_Assign
+        cls = node.__class__
+        method = self.methods.get(cls)
+        if method is None:
+            method = self.methods[cls] = getattr(self, 'visit_' + cls.__name__)
+        return method(node)
+
+    def compile(self, program):
+        check_types(program)
+        with nesting_room(program_height(program)):
+            return self.translate(program)
+
+    def translate(self, program):
+        self.lines = []
+        self.indent = '    '
+        self.locals = 0
+        self.loops = 0
+        self.temporaries = 0
+        self.level = 0  # levels of operators and indexes around the expression being translated
+        self.constants = {}
+        self.stores = {}
+        # scopes[depth] maps the active scope's frame slots at that depth to (local name, declaration)
+        self.scopes = [self.declare(program.declarations)]
+        variables = ', '.join(name for name, _ in self.scopes[0])
+        parameters = variables + ', ' if variables else ''
+        self.lines.append(f"def {FUNCTION}({parameters}check_limits, countdown):")
+        for statement in program.statements:
+            self.visit(statement)
+        self.emit(f"return [{variables}]")
+        self.emit("yield  # never reached; makes the function a generator even without loops")
+        source = '\n'.join(self.lines) + '\n'
+        try:
+            return CompiledProgram(program.name, program.declarations, source, self.constants, self.stores)
+        except (RecursionError, MemoryError):
+            # CPython's compiler recurses over the generated code, and can run out of stack before the parser did
+            raise Exception(TOO_DEEP) from None
+
+    def emit(self, line):
+        self.lines.append(self.indent + line)
+        return len(self.lines)
+
+    def declare(self, declarations):
+        # Give each declaration a fresh local variable
+        names = []
+        for declaration in declarations:
+            names.append((f"v{self.locals}", declaration))
+            self.locals += 1
+        return names
+
+    def local(self, var):
+        return self.scopes[var.depth][var.slot]
+
+    def temporary(self):
+        self.temporaries += 1
+        return f"_t{self.temporaries}"
+
+    def block(self, node):
+        # The statements of an if branch or loop body, one level further in
+        outer = self.indent
+        if len(outer) // 4 == MAX_INDENT:
+            raise Exception(TOO_DEEP)
+        self.indent += '    '
+        start = len(self.lines)
+        self.visit(node)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent = outer
+
+    # Statements
+
+    def visit_Assign(self, node):
+        target = node.target
+        name, _ = self.local(target)
+        if target.index is None:
+            self.emit(f"{name} = {self.visit(node.expr)}")
+            return
+        index = self.checked_index(target)
+        if not index.isdigit():
+            temporary = self.temporary()
+            self.emit(f"{temporary} = {index}")
+            index = temporary
+        value = self.temporary()
+        self.emit(f"{value} = {self.visit(node.expr)}")
+        line = self.emit(f"{name}[{index}] = {value}")
+        self.stores[line] = (target.name, value)
+
+    def visit_Compound(self, node):
+        if node.declarations:
+            scopes = self.scopes
+            while len(scopes) <= node.depth:
+                scopes.append(None)
+            names = scopes[node.depth] = self.declare(node.declarations)
+            # Entering the block zeroes its variables, as Evaluator's fresh frame does
+            for name, declaration in names:
+                if declaration.size is not None:
+                    self.emit(f"{name} = new_array({declaration.type!r}, {declaration.size})")
+                else:
+                    self.emit(f"{name} = {initial_value(declaration)!r}")
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_If(self, node):
+        self.emit(f"if {self.condition(node.cond)}:")
+        self.block(node.then)
+        if node.orelse is not None:
+            self.emit("else:")
+            self.block(node.orelse)
+
+    def visit_While(self, node):
+        if self.loops == MAX_LOOPS:
+            raise Exception(TOO_DEEP)
+        self.loops += 1
+        start = len(self.lines)
+        cond = self.condition(node.cond)
+        if len(self.lines) == start:
+            self.emit(f"while {cond}:")
+            self.indent += '    '
+        else:
+            # The condition needs lines of its own, which run again before every test
+            spilled = self.lines[start:]
+            del self.lines[start:]
+            self.emit("while True:")
+            self.lines.extend('    ' + line for line in spilled)
+            self.indent += '    '
+            self.emit(f"if not ({cond}):")
+            self.emit("    break")
+        # Count the iteration before running it
+        self.emit("countdown -= 1")
+        self.emit("if not countdown:")
+        self.emit(f"    countdown = check_limits('while', {node.line!r})")
+        self.emit("    yield")
+        self.indent = self.indent[:-4]
+        self.block(node.body)
+        self.loops -= 1
+
+    # Expressions: each returns the Python expression computing its value
+
+    def condition(self, cond):
+        # A comparison used as a condition needs no conversion to 1 or 0
+        if isinstance(cond, BinOp) and cond.op in RELOPS:
+            self.level += 1
+            left, right = self.operands(cond)
+            self.level -= 1
+            return f"{left} {cond.op} {right}"
+        return self.visit(cond)
+
+    def operands(self, node):
+        # The left and right operands of a BinOp, evaluated in that order
+        left = self.visit(node.left)
+        start = len(self.lines)
+        right = self.visit(node.right)
+        if len(self.lines) > start and not SIMPLE.fullmatch(left):
+            temporary = self.temporary()
+            self.lines.insert(start, f"{self.indent}{temporary} = {left}")
+            left = temporary
+        return left, right
+
+    def spill(self, expr):
+        # Every SPILL levels, compute the expression on a line of its own
+        if self.level % SPILL or not self.level:
+            return expr
+        temporary = self.temporary()
+        self.emit(f"{temporary} = {expr}")
+        return temporary
+
+    def visit_Num(self, node):
+        value = node.value
+        if isinstance(value, float) and not math.isfinite(value):
+            # Folded constants can overflow to inf, which has no literal
+            name = f"_c{len(self.constants)}"
+            self.constants[name] = value
+            return name
+        if value < 0:
+            return f"({value!r})"
+        return repr(value)
+
+    def visit_Var(self, node):
+        name, _ = self.local(node)
+        if node.index is None:
+            return name
+        return self.spill(f"{name}[{self.checked_index(node)}]")
+
+    def checked_index(self, node):
+        # The index of an array access, raising if it is out of bounds
+        _, declaration = self.local(node)
+        size = declaration.size
+        index = node.index
+        if isinstance(index, Num):
+            if 0 <= index.value < size:
+                return repr(index.value)
+            return f"index_error({index.value!r}, {node.name!r}, {size})"
+        if isinstance(index, Var) and index.index is None:
+            value = self.visit(index)
+            return f"{value} if 0 <= {value} < {size} else index_error({value}, {node.name!r}, {size})"
+        self.level += 1
+        value = self.visit(index)
+        self.level -= 1
+        temporary = self.temporary()
+        return (f"{temporary} if 0 <= ({temporary} := {value}) < {size} "
+                f"else index_error({temporary}, {node.name!r}, {size})")
+
+    def visit_BinOp(self, node):
+        op = node.op
+        self.level += 1
+        left, right = self.operands(node)
+        self.level -= 1
+        if op in RELOPS:
+            return self.spill(f"(1 if {left} {op} {right} else 0)")
+        if op == '/' and node.type == 'int':
+            return self.spill(f"int({left} / {right})")
+        return self.spill(f"({left} {op} {right})")
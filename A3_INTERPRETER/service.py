@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from interpreter import ExecutionLimitError, ExecutionLimits, Parser, SyntaxError, tokenize
+
+# Asynchronous execution: many programs share one asyncio event loop.
+# run_program() compiles a program for the VM (or the Python backend) and runs it in slices,
+# giving the event loop a turn every `interval` loop iterations, so one long-running program
+# cannot hold up the others. Lexing, parsing and compiling are still done in one go; they take
+# time proportional to the program's size, not to how long it runs.
+#
+# The demo server speaks JSON lines over TCP or a Unix socket: each request line is
+# {"source": ..., "backend": ...} and gets one response line, {"ok": true, "variables": {...}} or
+# {"ok": false, "error": ...}. With --stdin it answers requests read from standard input instead.
+#   python service.py serve --port 8765
+#   python service.py serve --socket /tmp/a3.sock
+#   python service.py client program.txt --port 8765
+
+BACKENDS = ('vm', 'python')
+
+
+async def run_program(source, backend='vm', optimize=False, max_steps=None, timeout=None, interval=1000):
+    """
+    Parse and run a program without blocking the event loop; returns the final SymbolTable.
+    The run yields to the event loop every `interval` loop iterations. max_steps and timeout
+    bound it as ExecutionLimits does; the timeout is wall-clock time, including time spent
+    waiting while other programs run.
+    """
+    if backend not in BACKENDS:
+        # The AST evaluator recurses through the program and cannot pause in the middle
+        raise ValueError(f"backend must be one of {', '.join(BACKENDS)}, not {backend!r}")
+    program = Parser(tokenize(source)).program()
+    if optimize:
+        from optimizer import Optimizer
+        program = Optimizer().optimize(program)
+    limits = ExecutionLimits(max_steps, timeout, interval)
+    if backend == 'vm':
+        from vm import VM, Compiler
+        steps = VM().execute(Compiler().compile(program), limits)
+    else:
+        from pycodegen import PythonCompiler
+        steps = PythonCompiler().compile(program).execute(limits=limits)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+        await asyncio.sleep(0)
+
+
+def variables(symbol_table):
+    # The final values as JSON-friendly data; arrays become lists
+    return {name: list(entry.value) if entry.additional_info is not None else entry.value
+            for name, entry in symbol_table.symbols.items()}
+
+
+async def handle_request(request, **options):
+    # One request line in, one response object out
+    try:
+        request = json.loads(request)
+        symbol_table = await run_program(request['source'], request.get('backend', 'vm'),
+                                         request.get('optimize', False), **options)
+    except SyntaxError as e:
+        return {'ok': False, 'error': f"Syntax error: {e}"}
+    except ExecutionLimitError as e:
+        return {'ok': False, 'error': str(e), 'limit': e.limit, 'line': e.line, 'steps': e.steps}
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'variables': variables(symbol_table)}
+
+
+def warm_up():
+    # Import the backends and compile the scanner now, so the first request is as fast as the rest
+    import optimizer, pycodegen, vm  # noqa: F401
+    from interpreter import token_patterns
+    token_patterns()
+
+
+async def serve(host='127.0.0.1', port=8765, path=None, **options):
+    """
+    Serve programs over TCP, or over the Unix socket at path if one is given, until cancelled.
+    options (max_steps, timeout, interval) apply to every run.
+    """
+    async def connection(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await handle_request(line, **options)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    # Program sources are sent as single JSON lines, so allow long ones
+    if path is not None:
+        server = await asyncio.start_unix_server(connection, path, limit=2 ** 24)
+    else:
+        server = await asyncio.start_server(connection, host, port, limit=2 ** 24)
+    async with server:
+        await server.serve_forever()
+
+
+def serve_lines(lines, output, **options):
+    """
+    Answer one request per line of lines (e.g. sys.stdin) on output, in order, until lines run out.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        for line in lines:
+            if line.strip():
+                response = loop.run_until_complete(handle_request(line, **options))
+                output.write(json.dumps(response) + '\n')
+                output.flush()
+    finally:
+        loop.close()
+
+
+class Client:
+    """
+    Stand-in client for the demo server: one connection, one request at a time.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 24)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+        return cls(reader, writer)
+
+    async def run(self, source, backend='vm', optimize=False):
+        request = {'source': source, 'backend': backend, 'optimize': optimize}
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run_client(path, host, port, backend, socket_path=None):
+    with open(path) as f:
+        source = f.read()
+    client = await Client.connect(host, port, socket_path)
+    try:
+        print(json.dumps(await client.run(source, backend), indent=2))
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run programs on a shared asyncio event loop.")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="serve programs over TCP, a Unix socket or stdin")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--socket', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    serve_parser.add_argument('--stdin', action='store_true', help="answer requests from stdin on stdout")
+    serve_parser.add_argument('--max-steps', type=int, help="loop iterations allowed per program")
+    serve_parser.add_argument('--timeout', type=float, help="seconds allowed per program")
+    serve_parser.add_argument('--interval', type=int, default=1000, help="loop iterations between turns of the event loop")
+    client_parser = commands.add_parser('client', help="send a program file to a running server")
+    client_parser.add_argument('file')
+    client_parser.add_argument('--host', default='127.0.0.1')
+    client_parser.add_argument('--port', type=int, default=8765)
+    client_parser.add_argument('--socket', metavar='PATH', help="connect to a Unix socket instead of TCP")
+    client_parser.add_argument('--backend', choices=BACKENDS, default='vm')
+    args = arg_parser.parse_args()
+
+    if args.command == 'serve':
+        if args.max_steps is not None and args.max_steps < 0:
+            arg_parser.error("--max-steps must be 0 or more")
+        if args.interval < 1:
+            arg_parser.error("--interval must be 1 or more")
+        options = {'max_steps': args.max_steps, 'timeout': args.timeout, 'interval': args.interval}
+        warm_up()
+        try:
+            if args.stdin:
+                serve_lines(sys.stdin, sys.stdout, **options)
+            else:
+                print(f"Serving on {args.socket or f'{args.host}:{args.port}'}", flush=True)
+                asyncio.run(serve(args.host, args.port, args.socket, **options))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(run_client(args.file, args.host, args.port, args.backend, args.socket))
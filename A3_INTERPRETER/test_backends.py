@@ -0,0 +1,139 @@
+import os
+
+import pytest
+
+from cache import CompilationCache
+from generate import generate_program
+from interpreter import Evaluator, Parser, tokenize
+from optimizer import Optimizer
+from pycodegen import PythonCompiler
+from tokenfile import decode_program, encode_program
+from vm import VM, Compiler
+
+# Differential tests: every backend, with and without the optimizer, must end a program with the same
+# symbol table, or fail with the same error message.
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'A2_PARSER')
+
+BACKENDS = {
+    'ast': lambda program, limits: Evaluator().run(program, limits),
+    'vectorize': lambda program, limits: Evaluator(vectorize=True).run(program, limits),
+    'vm': lambda program, limits: VM().run(Compiler().compile(program), limits),
+    'python': lambda program, limits: PythonCompiler().compile(program).run(limits=limits),
+}
+
+PROGRAMS = {
+    'example': """
+    Program X {
+    int a;
+    int b;
+    int c;
+    a = 10;
+    b = 20;
+    c = a+b;
+    if (a >= b) {
+        c = a;
+    }
+    }
+    """,
+    'scopes': """
+    Program Scopes {
+    int a; int b; float f;
+    a = 1;
+    { int a; a = 5; b = a * 2; { float a; a = 1.5; f = a + 0.25; } }
+    if (b == 10) { int t; t = b - a; a = t; } else a = 0;
+    }
+    """,
+    'loops': """
+    Program Loops {
+    int i; int j; int n; int s; int a[10]; float b[10];
+    n = 10;
+    while (i < n) {
+        a[i] = i * i - 3 * i;
+        b[i] = 0.5 * 3.0 - 1.0;
+        j = 0;
+        while (j < i) { s = s + a[j] / 2; j = j + 1; }
+        i = i + 1;
+    }
+    }
+    """,
+    'vector': """
+    Program Vector {
+    int i; int n; int a[50]; int b[50]; float c[50]; float d[50];
+    n = 50;
+    while (i < n) { b[i] = i * 3 - 70; c[i] = 0.5 + i; i = i + 1; }
+    i = 0;
+    while (i < n) { a[i] = b[i] * 2 + b[i]; d[i] = c[i] / 4.0 - c[i]; i = i + 1; }
+    }
+    """,
+    'arithmetic': """
+    Program Arithmetic {
+    int q; int r; int c; float x; float y;
+    q = (0 - 7) / 2;
+    r = 7 / (0 - 2);
+    c = (1 < 2) + (2 <= 2) + (3 > 4) + (5 >= 6) + (1 == 1) + (1 != 1);
+    x = 1.0 / 3.0;
+    y = x * 3.0 - 1.0 / (x + 1.0);
+    }
+    """,
+}
+
+
+def values(symbol_table):
+    return {name: (entry.type, list(entry.value) if hasattr(entry.value, 'typecode') else entry.value)
+            for name, entry in symbol_table.symbols.items()}
+
+
+def outcome(source, backend='ast', optimize=False, limits=None):
+    # The final values of the program's variables, or the message of the error it failed with
+    try:
+        program = Parser(tokenize(source)).program()
+        if optimize:
+            program = Optimizer().optimize(program)
+        return values(BACKENDS[backend](program, limits))
+    except Exception as e:
+        return str(e)
+
+
+def sources():
+    for name, source in PROGRAMS.items():
+        yield name, source
+    for name in sorted(os.listdir(SAMPLES)):
+        if name.startswith('sample') and name.endswith('.txt') and not name.endswith('_lex.txt'):
+            with open(os.path.join(SAMPLES, name)) as f:
+                yield name, f.read()
+    for seed in range(20):
+        yield f"generated-{seed}", generate_program(declarations=12, statements=40, depth=3, nesting=2,
+                                                     arrays=4, array_size=20, iterations=20, seed=seed)
+
+
+SOURCES = dict(sources())
+
+
+@pytest.mark.parametrize('name', SOURCES)
+def test_backends_agree(name):
+    source = SOURCES[name]
+    expected = outcome(source)
+    for backend in BACKENDS:
+        for optimize in (False, True):
+            assert outcome(source, backend, optimize) == expected, (backend, optimize)
+
+
+def test_type_error_sample_fails_everywhere():
+    # sample1_no_errors.txt parses, but assigns an int to a float variable
+    for backend in BACKENDS:
+        assert outcome(SOURCES['sample1_no_errors.txt'], backend) == (
+            "Type error: Cannot assign value of type int to variable 'c' of type float.")
+
+
+@pytest.mark.parametrize('name', ['scopes', 'loops', 'arithmetic', 'generated-0'])
+def test_stored_programs_run_the_same(name, tmp_path):
+    # Programs read back from a token file's AST chunk or from the compilation cache
+    source = SOURCES[name]
+    expected = outcome(source)
+    program = decode_program(memoryview(encode_program(Parser(tokenize(source)).program())), 0)
+    assert values(Evaluator().run(program)) == expected
+    for cache in (CompilationCache(str(tmp_path)), CompilationCache(str(tmp_path))):
+        assert values(Evaluator().run(cache.load_program(source))) == expected
+        assert values(VM().run(cache.load_bytecode(source, optimize=True))) == expected
+    assert cache.hits == 2
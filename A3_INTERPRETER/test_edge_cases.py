@@ -0,0 +1,169 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cache import CompilationCache
+from interpreter import ExecutionLimitError, ExecutionLimits, Parser, SyntaxError, tokenize
+from pycodegen import TOO_DEEP
+from test_backends import BACKENDS, SAMPLES, outcome
+
+# Runtime errors, execution limits and deeply nested programs, on every backend.
+
+
+def program(body, declarations="int a[3]; int x; int z; float f;"):
+    return f"Program Edge {{ {declarations} {body} }}"
+
+
+def assert_fails_everywhere(source, message, **options):
+    for backend in BACKENDS:
+        assert outcome(source, backend, **options) == message, backend
+
+
+@pytest.mark.parametrize('body, index', [
+    ("x = a[3];", 3),
+    ("x = a[0 - 1];", -1),
+    ("a[5] = 1;", 5),
+    ("a[0 - 2] = 1;", -2),
+    ("x = a[a[0] + 7];", 7),
+    # The index of a store is checked before its value is computed
+    ("a[5] = 1 / z;", 5),
+    ("a[z - 1] = a[9];", -1),
+])
+def test_index_out_of_bounds(body, index):
+    message = f"Runtime error: Index {index} out of bounds for array 'a' of size 3."
+    assert_fails_everywhere(program(body), message)
+    assert_fails_everywhere(program(body), message, optimize=True)
+
+
+@pytest.mark.parametrize('body', [
+    "x = 1 / z;",
+    "f = 1.0 / 0.0;",
+    "f = 2.0; f = f / (f - 2.0);",
+    "x = a[1 / z];",
+    "while (x < 3) { x = x + 1; } x = x / (x - 3);",
+])
+def test_division_by_zero(body):
+    assert_fails_everywhere(program(body), "Runtime error: Division by zero.")
+    assert_fails_everywhere(program(body), "Runtime error: Division by zero.", optimize=True)
+
+
+def test_integer_division_truncates_toward_zero():
+    source = program("x = (0 - 7) / 2; a[0] = 7 / (0 - 2); a[1] = (0 - 8) / (0 - 3);")
+    for backend in BACKENDS:
+        assert outcome(source, backend)['x'] == ('int', -3)
+        assert outcome(source, backend)['a'] == ('int', [-3, 2, 0])
+
+
+def test_array_element_overflow():
+    source = program("x = 4611686018427387904; a[0] = x * 4;")
+    assert_fails_everywhere(source, "Runtime error: Value 18446744073709551616 does not fit in an element of array 'a'.")
+
+
+INFINITE = "Program Forever { int i; while (i < 1) { i = 0; } }"
+COUNTED = "Program Counted { int i; while (i < 5) { i = i + 1; } }"
+
+
+@pytest.mark.parametrize('max_steps', [0, 1, 5, 1000, 2500])
+def test_step_limit_stops_after_exactly_max_steps(max_steps):
+    message = f"Runtime error: Step limit exceeded after {max_steps} steps in while statement at line 1."
+    assert_fails_everywhere(INFINITE, message, limits=ExecutionLimits(max_steps=max_steps))
+
+
+def test_step_limit_allows_exactly_max_steps():
+    for backend in BACKENDS:
+        assert outcome(COUNTED, backend, limits=ExecutionLimits(max_steps=5))['i'] == ('int', 5)
+    assert_fails_everywhere(COUNTED, "Runtime error: Step limit exceeded after 4 steps in while statement at line 1.",
+                            limits=ExecutionLimits(max_steps=4))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_time_limit(backend):
+    limits = ExecutionLimits(timeout=0.05, interval=100)
+    with pytest.raises(ExecutionLimitError) as info:
+        BACKENDS[backend](Parser(tokenize(INFINITE)).program(), limits)
+    assert info.value.limit == 'time' and info.value.line == 1 and info.value.steps > 0
+
+
+@pytest.mark.parametrize('options', [dict(max_steps=-1), dict(interval=0), dict(interval=-5)])
+def test_invalid_limits(options):
+    with pytest.raises(ValueError):
+        ExecutionLimits(**options)
+
+
+def test_syntax_errors_are_all_recorded():
+    source = "Program Errors {\nint a;\nint a;\na = 1 +;\nb = 2;\n}\n"
+    parser = Parser(tokenize(source))
+    with pytest.raises(SyntaxError):
+        parser.program()
+    assert [(error.line, error.message) for error in parser.errors] == [
+        (3, "Variable 'a' already declared"),
+        (4, 'Expected "(", variable, or number but found \'SEMI\' at line 4, char 7'),
+        (5, "Undeclared variable 'b'"),
+    ]
+
+
+@pytest.mark.parametrize('arguments, status', [
+    ([], 0),
+    ([os.path.join(SAMPLES, 'sample2_error.txt')], 1),
+    ([os.path.join(SAMPLES, 'sample3_error.txt'), '--backend', 'vm'], 1),
+])
+def test_exit_status(arguments, status):
+    interpreter = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interpreter.py')
+    result = subprocess.run([sys.executable, interpreter] + arguments, capture_output=True, text=True)
+    assert result.returncode == status, result.stdout
+
+
+def test_unwritable_cache(tmp_path, capsys):
+    # A cache directory that cannot be created: programs still load, just without being cached
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = CompilationCache(str(blocker / 'cache'))
+    for value in (1, 2):
+        program = cache.load_program(f"Program Cached {{ int x; x = {value}; }}")
+        assert program.name == 'Cached'
+    assert cache.misses == 2
+    assert capsys.readouterr().err.count("Warning: not caching") == 1
+
+
+# Deep nesting: far past Python's default recursion limit, and past CPython's own limits on
+# parentheses in one expression
+
+DEPTH = 5000
+
+
+def test_deep_expressions():
+    sum_source = program("x = x" + " + 1" * DEPTH + ";")
+    nested_source = program("x = " + "(1 + " * DEPTH + "1" + ")" * DEPTH + ";")
+    index_source = program("a[1] = 1; x = " + "a[" * DEPTH + "1" + "]" * DEPTH + ";")
+    for backend in BACKENDS:
+        for optimize in (False, True):
+            assert outcome(sum_source, backend, optimize)['x'] == ('int', DEPTH)
+            assert outcome(nested_source, backend, optimize)['x'] == ('int', DEPTH + 1)
+            assert outcome(index_source, backend, optimize)['x'] == ('int', 1)
+
+
+def test_deep_expression_keeps_evaluation_order():
+    # The python backend splits deep expressions up; the left operand must still fail first
+    deep = "(" * 200 + "1 / z" + " + 1)" * 200
+    assert_fails_everywhere(program(f"x = a[5] + {deep};"), "Runtime error: Index 5 out of bounds for array 'a' of size 3.")
+    assert_fails_everywhere(program(f"x = {deep} + a[5];"), "Runtime error: Division by zero.")
+
+
+def test_deep_blocks():
+    source = program("{ " * 2000 + "x = x + 1;" + " }" * 2000)
+    for backend in BACKENDS:
+        assert outcome(source, backend)['x'] == ('int', 1)
+
+
+def test_deep_ifs():
+    # Each if is a level of indentation in the python backend's source, and CPython allows 100
+    for depth, python_result in ((90, ('int', 1)), (1000, TOO_DEEP)):
+        source = program("if (x < 1) " * depth + "x = 1;")
+        for backend in BACKENDS:
+            result = outcome(source, backend)
+            if backend == 'python':
+                assert (result if isinstance(result, str) else result['x']) == python_result
+            else:
+                assert result['x'] == ('int', 1)
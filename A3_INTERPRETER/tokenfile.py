@@ -0,0 +1,664 @@
+import struct
+import sys
+from array import array
+
+from interpreter import (EOF, ID, KEYWORDS, LBRACKET, NUM, OPERATORS, RBRACKET, SEMI, TOKEN_KINDS, Assign,
+                         BinOp, Compound, If, LexicalError, Num, Parser, Program, Token, TokenStream, Var,
+                         VarDecl, While, map_file, scan_buffer, tokenize)
+
+# Binary token and AST files, so lexed and parsed programs can move between stages without being
+# scanned or parsed again.
+#
+# A file is a header followed by chunks; all numbers are little-endian:
+#   header   b'A3TK', u16 format version, u16 flags
+#   chunk    u8 tag, 3 bytes padding, u32 count, u64 size of the rest of the chunk
+# A token chunk (tag 'T') holds count tokens as columns, each padded to 8 bytes:
+#   text     the tokens' text, UTF-8
+#   kinds    u8 per token (indexes into TOKEN_KINDS)
+#   starts   i64 per token, file offset of the token's text
+#   ends     i64 per token, file offset just past it
+#   lines    i32 per token
+#   cols     i32 per token
+# so a reader can memory-map the file and use the columns in place, as memoryviews over the mapping.
+# The last token of the file is always EOF. An AST chunk (tag 'A') holds one Program, encoded node by
+# node in postorder (see encode_program), so it is read back with a stack instead of recursion.
+#
+# Token files can also be converted from and to the A2 parser's text dumps (*_lex.txt), which have one
+# "value line" row per token. Those dumps write every identifier as ID and every number as NUM, so
+# a file imported from one has the ERASED flag set and can only be checked for syntax, with
+# SyntaxOnlyParser.
+
+MAGIC = b'A3TK'
+VERSION = 1
+ERASED = 1  # flag: identifier names and number values are not in the file
+
+HEADER = struct.Struct('<4sHH')
+CHUNK = struct.Struct('<B3xIQ')
+TOKENS_TAG = ord('T')
+AST_TAG = ord('A')
+
+# A single-chunk file is read without copying anything; larger inputs are written in chunks of this many tokens
+CHUNK_TOKENS = 1 << 20
+
+
+def is_token_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def padding(size):
+    return -size % 8
+
+
+def little_endian(values):
+    # The bytes of an array in file byte order
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def token_kind(value, line):
+    # The kind of a token from an A2 dump, where identifiers and numbers appear as ID and NUM
+    if value == 'ID':
+        return ID
+    if value == 'NUM':
+        return NUM
+    kind = KEYWORDS.get(value, OPERATORS.get(value))
+    if kind is None:
+        token = Token('MISMATCH', value, line, 0)
+        raise LexicalError('a token', token, custom_message=f"Unknown token {value!r} at line {line}")
+    return kind
+
+
+class TokenFileWriter:
+    """
+    Writes a token file. Tokens can be added one at a time with write(), which buffers up to a chunk,
+    or a whole TokenStream or source file at once; an AST can be added with write_program().
+    close() ends the token data with EOF if it does not already end with it.
+    """
+    def __init__(self, path, erased=False, chunk_tokens=CHUNK_TOKENS):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, ERASED if erased else 0))
+        self.chunk_tokens = chunk_tokens
+        self.values = []
+        self.columns = [array('B'), array('i'), array('i')]  # kinds, lines, cols of buffered tokens
+        self.last_kind = None
+        self.last_line = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, kind, value, line, col):
+        self.values.append(value)
+        kinds, lines, cols = self.columns
+        kinds.append(kind)
+        lines.append(line)
+        cols.append(col)
+        if len(kinds) >= self.chunk_tokens:
+            self.flush()
+
+    def flush(self):
+        # Write the buffered tokens as a chunk
+        kinds, lines, cols = self.columns
+        if not kinds:
+            return
+        starts = array('q')
+        ends = array('q')
+        offset = self.file.tell() + CHUNK.size
+        encoded = []
+        for value in self.values:
+            data = value.encode()
+            encoded.append(data)
+            starts.append(offset)
+            offset += len(data)
+            ends.append(offset)
+        self.write_chunk(b''.join(encoded), kinds, starts, ends, lines, cols)
+        self.values = []
+        self.columns = [array('B'), array('i'), array('i')]
+
+    def write_chunk(self, text, kinds, starts, ends, lines, cols):
+        # starts and ends are file offsets, so the text has to come right after the chunk header
+        parts = [text, b'\0' * padding(len(text)), kinds.tobytes(), b'\0' * padding(len(kinds)),
+                 little_endian(starts), little_endian(ends), little_endian(lines), little_endian(cols)]
+        if len(cols) % 2:
+            parts.append(b'\0' * 4)
+        size = sum(len(part) for part in parts)
+        self.file.write(CHUNK.pack(TOKENS_TAG, len(kinds), size))
+        self.file.writelines(parts)
+        self.last_kind = kinds[-1]
+        self.last_line = lines[-1]
+
+    def write_stream(self, stream):
+        # A whole TokenStream as one chunk; its source, not token by token, becomes the chunk's text
+        self.flush()
+        len(stream)  # scan a MappedTokenStream to the end
+        source = stream.source
+        if isinstance(source, str):
+            if not source.isascii():
+                # Character offsets are not byte offsets; write token by token instead
+                for i in range(len(stream.kinds)):
+                    self.write(stream.kinds[i], stream.value(i), stream.lines[i], stream.cols[i])
+                self.flush()
+                return
+            source = source.encode()
+        self.write_region(source, 0, stream.kinds, stream.starts, stream.ends, stream.lines, stream.cols)
+
+    def write_region(self, buffer, origin, kinds, starts, ends, lines, cols):
+        # Tokens whose offsets point into buffer[origin:]; the region up to the last token becomes the text
+        text = buffer[origin:ends[-1]] if len(ends) else b''
+        base = self.file.tell() + CHUNK.size - origin
+        self.write_chunk(bytes(text), array('B', kinds), array('q', map(base.__add__, starts)),
+                         array('q', map(base.__add__, ends)), array('i', lines), array('i', cols))
+
+    def write_source_file(self, path, chunk_size=1 << 20):
+        """
+        Lex a source file straight into the token file, a chunk of the source at a time, so memory use
+        stays flat however large the file is.
+        """
+        self.flush()
+        buffer = map_file(path)
+        try:
+            batches = (batch for batch in scan_buffer(buffer, chunk_size) if batch)
+            previous = next(batches)
+            for batch in batches:
+                if batch[0][0] == EOF:
+                    # Keep EOF in the last chunk, so a file that fits in one chunk is written as one
+                    previous = previous + batch
+                else:
+                    self.write_batch(buffer, previous)
+                    previous = batch
+            self.write_batch(buffer, previous)
+        finally:
+            if hasattr(buffer, 'close'):
+                buffer.close()
+
+    def write_batch(self, buffer, batch):
+        # A batch of (kind, start, end, line, col) tuples from scan_buffer
+        kinds, starts, ends, lines, cols = zip(*batch)
+        self.write_region(buffer, starts[0], kinds, starts, ends, lines, cols)
+
+    def write_program(self, program):
+        self.flush()
+        data = encode_program(program)
+        size = len(data) + padding(len(data))
+        self.file.write(CHUNK.pack(AST_TAG, 1, size))
+        self.file.write(data + b'\0' * padding(len(data)))
+
+    def close(self):
+        if self.file.closed:
+            return
+        kinds, lines, _ = self.columns
+        last_kind, last_line = (kinds[-1], lines[-1]) if kinds else (self.last_kind, self.last_line)
+        if last_kind != EOF:
+            # Buffered with the last tokens, so EOF does not get a chunk of its own
+            self.write(EOF, '', last_line, 0)
+        self.flush()
+        self.file.close()
+
+
+class TokenChunk:
+    __slots__ = ('kinds', 'starts', 'ends', 'lines', 'cols')
+
+    def __init__(self, kinds, starts, ends, lines, cols):
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.lines = lines
+        self.cols = cols
+
+
+class TokenFile:
+    """
+    A memory-mapped token file. The token columns of each chunk are memoryviews into the mapping,
+    so opening a file reads nothing but the chunk headers.
+    """
+    def __init__(self, path):
+        self.buffer = map_file(path)
+        view = memoryview(self.buffer)
+        if len(view) < HEADER.size:
+            raise ValueError(f"{path} is not a token file")
+        magic, version, flags = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a token file")
+        if version != VERSION:
+            raise ValueError(f"{path} has token file version {version}, expected {VERSION}")
+        self.erased = bool(flags & ERASED)
+        self.chunks = []
+        self.program_offsets = []
+        offset = HEADER.size
+        while offset < len(view):
+            tag, count, size = CHUNK.unpack_from(view, offset)
+            offset += CHUNK.size
+            if tag == TOKENS_TAG:
+                self.chunks.append(self.token_chunk(view, offset, count, size))
+            elif tag == AST_TAG:
+                self.program_offsets.append(offset)
+            offset += size
+        self.view = view
+
+    @staticmethod
+    def token_chunk(view, offset, count, size):
+        # Columns follow the text, each padded to 8 bytes
+        columns_size = count + padding(count) + 24 * count + 4 * (count % 2)
+        position = offset + size - columns_size
+        kinds = view[position:position + count]
+        position += count + padding(count)
+        columns = []
+        for format, item_size in (('q', 8), ('q', 8), ('i', 4), ('i', 4)):
+            column = view[position:position + item_size * count].cast(format)
+            if sys.byteorder != 'little':
+                column = array(format, column)
+                column.byteswap()
+            columns.append(column)
+            position += item_size * count
+        return TokenChunk(kinds, *columns)
+
+    def __len__(self):
+        # Number of tokens, not counting EOF
+        return sum(len(chunk.kinds) for chunk in self.chunks) - 1
+
+    def stream(self):
+        # A TokenStream for Parser over the file's tokens
+        return TokenFileStream(self)
+
+    def tokens(self):
+        for chunk in self.chunks:
+            for i in range(len(chunk.kinds)):
+                kind = chunk.kinds[i]
+                if kind != EOF:
+                    value = bytes(self.buffer[chunk.starts[i]:chunk.ends[i]]).decode()
+                    yield Token(TOKEN_KINDS[kind], value, chunk.lines[i], chunk.cols[i])
+
+    def program(self):
+        # The file's AST, or None if it has none
+        if not self.program_offsets:
+            return None
+        return decode_program(self.view, self.program_offsets[0])
+
+    def close(self):
+        # Streams over the file cannot be used once it is closed
+        for chunk in self.chunks:
+            for column in (chunk.kinds, chunk.starts, chunk.ends, chunk.lines, chunk.cols):
+                if isinstance(column, memoryview):
+                    column.release()
+        self.chunks = []
+        self.view.release()
+        if hasattr(self.buffer, 'close'):
+            self.buffer.close()
+
+
+class TokenFileStream(TokenStream):
+    """
+    The tokens of a TokenFile as a TokenStream. A file of one chunk is used in place; with several,
+    chunks are appended to the stream as the parser reaches them, one bulk copy per column.
+    """
+    __slots__ = ('pending',)
+
+    def __init__(self, token_file):
+        super().__init__(token_file.buffer)
+        chunks = token_file.chunks
+        if len(chunks) == 1:
+            chunk = chunks[0]
+            self.kinds, self.starts, self.ends, self.lines, self.cols = (
+                chunk.kinds, chunk.starts, chunk.ends, chunk.lines, chunk.cols)
+            self.pending = iter(())
+        else:
+            self.pending = iter(chunks)
+            self.fill()
+
+    def __len__(self):
+        while self.fill():
+            pass
+        return len(self.kinds) - 1
+
+    def value(self, i):
+        return self.source[self.starts[i]:self.ends[i]].decode()
+
+    def fill(self):
+        # Append the next chunk; returns False once every chunk is in
+        for chunk in self.pending:
+            self.kinds.frombytes(chunk.kinds)
+            for column, values in ((self.starts, chunk.starts), (self.ends, chunk.ends),
+                                   (self.lines, chunk.lines), (self.cols, chunk.cols)):
+                column.frombytes(values.cast('B') if isinstance(values, memoryview) else values.tobytes())
+            return True
+        return False
+
+
+class SyntaxOnlyParser(Parser):
+    """
+    A Parser that checks the grammar only: names are neither declared nor resolved and number values
+    are kept as text, so it accepts tokens whose identifiers and numbers have been erased, as in A2 dumps.
+    The tree it builds cannot be run.
+    """
+    def var_declaration(self):
+        line = self.line()
+        type_spec = self.type_specifier()
+        var_name = self.value()
+        self.match(ID)
+        return VarDecl(type_spec, var_name, self.var_declaration_prime(), None, line)
+
+    def var_declaration_prime(self):
+        # var-declaration-prime -> ; | [ NUM ] ;
+        if self.kind == LBRACKET:
+            self.match(LBRACKET)
+            size = self.value()
+            self.match(NUM)
+            self.match(RBRACKET)
+            self.match(SEMI)
+            return size
+        return super().var_declaration_prime()
+
+    def factor(self):
+        if self.kind == NUM:
+            node = Num(self.value(), None, self.line())
+            self.match(NUM)
+            return node
+        return super().factor()
+
+    def var_ref(self):
+        if self.kind == ID:
+            node = Var(self.value(), line=self.line())
+            self.match(ID)
+            return node
+        return super().var_ref()
+
+    def check_indexing(self, var, indexed):
+        pass
+
+
+# A2 text dumps
+
+def import_lex_text(path, output):
+    """
+    Convert an A2 *_lex.txt dump into a token file. Returns the number of tokens.
+    """
+    count = 0
+    with open(path) as f, TokenFileWriter(output, erased=True) as writer:
+        for number, row in enumerate(f, 1):
+            fields = row.split()
+            if not fields:
+                continue
+            if len(fields) != 2 or not fields[1].isdigit():
+                token = Token('MISMATCH', row.strip(), number, 0)
+                raise LexicalError('"value line"', token, custom_message=f"Malformed row {number} in {path}: {row.strip()!r}")
+            value, line = fields[0], int(fields[1])
+            writer.write(token_kind(value, line), value, line, 0)
+            count += 1
+    return count
+
+
+def lex_text_stream(path):
+    # An A2 dump read straight into a TokenStream, without writing a token file
+    stream = TokenStream(None)
+    values = []
+    offset = 0
+    line = 1
+    with open(path) as f:
+        for row in f:
+            fields = row.split()
+            if len(fields) != 2:
+                continue
+            value, line = fields[0], int(fields[1])
+            stream.append(token_kind(value, line), offset, offset + len(value), line, 0)
+            values.append(value)
+            offset += len(value) + 1
+    stream.source = ' '.join(values) + ' '
+    stream.append(EOF, offset, offset, line, 0)
+    return stream
+
+
+def export_lex_text(token_file, output):
+    # Write a token file in the A2 parser's text format: identifiers and numbers as ID and NUM
+    with open(output, 'w') as f:
+        for token in token_file.tokens():
+            value = token.type if token.type in ('ID', 'NUM') else token.value
+            f.write(f"{value} {token.line_no}\n")
+
+
+# ASTs, in postorder: every node is written after its children, so decoding pushes each node onto a
+# stack and a parent pops its children off it
+
+NODE_TAGS = [Program, VarDecl, Assign, Compound, If, While, BinOp, Num, Var]
+(PROGRAM_NODE, VARDECL_NODE, ASSIGN_NODE, COMPOUND_NODE, IF_NODE, WHILE_NODE, BINOP_NODE,
+ NUM_NODE, VAR_NODE) = range(len(NODE_TAGS))
+TAGS = {cls: tag for tag, cls in enumerate(NODE_TAGS)}
+
+TYPES = [None, 'int', 'float', 'void']
+TYPE_CODES = {var_type: code for code, var_type in enumerate(TYPES)}
+OPS = ['+', '-', '*', '/', '<', '<=', '>', '>=', '==', '!=']
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+# Num values: an int that fits in 64 bits, a float, a larger int as bytes, or text (syntax-only trees)
+INT_VALUE, FLOAT_VALUE, BIG_INT_VALUE, TEXT_VALUE = range(4)
+
+NODE = struct.Struct('<Bi')      # tag, line (-1 for None)
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+U32 = struct.Struct('<I')
+I64 = struct.Struct('<q')
+SMALL = struct.Struct('<BB')     # two small codes, e.g. an operator and a type
+
+
+def encode_string(parts, value):
+    data = value.encode()
+    parts.append(U32.pack(len(data)))
+    parts.append(data)
+
+
+def encode_optional(value):
+    return -1 if value is None else value
+
+
+def encode_program(program):
+    parts = []
+    # (node, expanded): a node is written once its children have been
+    stack = [(program, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children(node)))
+            continue
+        cls = node.__class__
+        parts.append(NODE.pack(TAGS[cls], encode_optional(node.line)))
+        if cls is BinOp:
+            parts.append(SMALL.pack(OP_CODES[node.op], TYPE_CODES[node.type]))
+        elif cls is Num:
+            value = node.value
+            if isinstance(value, str):
+                parts.append(SMALL.pack(TEXT_VALUE, TYPE_CODES[node.type]))
+                encode_string(parts, value)
+            elif isinstance(value, float):
+                parts.append(SMALL.pack(FLOAT_VALUE, TYPE_CODES[node.type]))
+                parts.append(FLOAT.pack(value))
+            elif -2 ** 63 <= value < 2 ** 63:
+                parts.append(SMALL.pack(INT_VALUE, TYPE_CODES[node.type]))
+                parts.append(INT.pack(value))
+            else:
+                parts.append(SMALL.pack(BIG_INT_VALUE, TYPE_CODES[node.type]))
+                data = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+                parts.append(U32.pack(len(data)))
+                parts.append(data)
+        elif cls is Var:
+            parts.append(SMALL.pack(node.index is not None, TYPE_CODES[node.type]))
+            parts.append(I64.pack(encode_optional(node.depth)))
+            parts.append(I64.pack(encode_optional(node.slot)))
+            encode_string(parts, node.name)
+        elif cls is VarDecl:
+            parts.append(SMALL.pack(TYPE_CODES[node.type], isinstance(node.size, str)))
+            parts.append(I64.pack(encode_optional(node.slot)))
+            if isinstance(node.size, str):
+                encode_string(parts, node.size)
+            else:
+                parts.append(I64.pack(encode_optional(node.size)))
+            encode_string(parts, node.name)
+        elif cls is Compound:
+            parts.append(U32.pack(len(node.declarations)))
+            parts.append(U32.pack(len(node.statements)))
+            parts.append(I64.pack(encode_optional(node.depth)))
+        elif cls is If:
+            parts.append(SMALL.pack(node.orelse is not None, 0))
+        elif cls is Program:
+            parts.append(U32.pack(len(node.declarations)))
+            parts.append(U32.pack(len(node.statements)))
+            parts.append(SMALL.pack(node.checked, 0))
+            encode_string(parts, node.name)
+    return b''.join(parts)
+
+
+def children(node):
+    cls = node.__class__
+    if cls is BinOp:
+        return [node.left, node.right]
+    if cls is Var:
+        return [node.index] if node.index is not None else []
+    if cls is Assign:
+        return [node.target, node.expr]
+    if cls is Compound or cls is Program:
+        return node.declarations + node.statements
+    if cls is If:
+        return [node.cond, node.then] + ([node.orelse] if node.orelse is not None else [])
+    if cls is While:
+        return [node.cond, node.body]
+    return []
+
+
+def decode_string(view, offset):
+    (size,) = U32.unpack_from(view, offset)
+    offset += U32.size
+    return str(view[offset:offset + size], 'utf-8'), offset + size
+
+
+def decode_optional(value):
+    return None if value == -1 else value
+
+
+def decode_program(view, offset):
+    stack = []
+    while True:
+        tag, line = NODE.unpack_from(view, offset)
+        offset += NODE.size
+        line = decode_optional(line)
+        if tag == BINOP_NODE:
+            op, type_code = SMALL.unpack_from(view, offset)
+            offset += SMALL.size
+            right = stack.pop()
+            stack[-1] = BinOp(OPS[op], stack[-1], right, line, TYPES[type_code])
+        elif tag == VAR_NODE:
+            indexed, type_code = SMALL.unpack_from(view, offset)
+            (depth,) = I64.unpack_from(view, offset + SMALL.size)
+            (slot,) = I64.unpack_from(view, offset + SMALL.size + I64.size)
+            name, offset = decode_string(view, offset + SMALL.size + 2 * I64.size)
+            index = stack.pop() if indexed else None
+            stack.append(Var(name, index, TYPES[type_code], decode_optional(depth), decode_optional(slot), line))
+        elif tag == NUM_NODE:
+            value_kind, type_code = SMALL.unpack_from(view, offset)
+            offset += SMALL.size
+            if value_kind == INT_VALUE:
+                (value,) = INT.unpack_from(view, offset)
+                offset += INT.size
+            elif value_kind == FLOAT_VALUE:
+                (value,) = FLOAT.unpack_from(view, offset)
+                offset += FLOAT.size
+            elif value_kind == BIG_INT_VALUE:
+                (size,) = U32.unpack_from(view, offset)
+                offset += U32.size
+                value = int.from_bytes(view[offset:offset + size], 'little', signed=True)
+                offset += size
+            else:
+                value, offset = decode_string(view, offset)
+            stack.append(Num(value, TYPES[type_code], line))
+        elif tag == ASSIGN_NODE:
+            expr = stack.pop()
+            stack[-1] = Assign(stack[-1], expr, line)
+        elif tag == VARDECL_NODE:
+            type_code, text_size = SMALL.unpack_from(view, offset)
+            (slot,) = I64.unpack_from(view, offset + SMALL.size)
+            offset += SMALL.size + I64.size
+            if text_size:
+                size, offset = decode_string(view, offset)
+            else:
+                (size,) = I64.unpack_from(view, offset)
+                size = decode_optional(size)
+                offset += I64.size
+            name, offset = decode_string(view, offset)
+            stack.append(VarDecl(TYPES[type_code], name, size, decode_optional(slot), line))
+        elif tag == COMPOUND_NODE:
+            (declarations,) = U32.unpack_from(view, offset)
+            (statements,) = U32.unpack_from(view, offset + U32.size)
+            (depth,) = I64.unpack_from(view, offset + 2 * U32.size)
+            offset += 2 * U32.size + I64.size
+            declarations, statements = pop_lists(stack, declarations, statements)
+            stack.append(Compound(declarations, statements, decode_optional(depth), line))
+        elif tag == IF_NODE:
+            has_else, _ = SMALL.unpack_from(view, offset)
+            offset += SMALL.size
+            orelse = stack.pop() if has_else else None
+            then = stack.pop()
+            stack[-1] = If(stack[-1], then, orelse, line)
+        elif tag == WHILE_NODE:
+            body = stack.pop()
+            stack[-1] = While(stack[-1], body, line)
+        elif tag == PROGRAM_NODE:
+            (declarations,) = U32.unpack_from(view, offset)
+            (statements,) = U32.unpack_from(view, offset + U32.size)
+            checked, _ = SMALL.unpack_from(view, offset + 2 * U32.size)
+            name, offset = decode_string(view, offset + 2 * U32.size + SMALL.size)
+            declarations, statements = pop_lists(stack, declarations, statements)
+            program = Program(name, declarations, statements, line)
+            program.checked = bool(checked)
+            return program
+        else:
+            raise ValueError(f"Unknown AST node tag {tag} at offset {offset - NODE.size}")
+
+
+def pop_lists(stack, first, second):
+    # The last first + second nodes on the stack, as two lists
+    start = len(stack) - first - second
+    nodes = stack[start:]
+    del stack[start:]
+    return nodes[:first], nodes[first:]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Write, convert and inspect binary token files.")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    write_parser = commands.add_parser('write', help="lex a source file into a token file")
+    write_parser.add_argument('source')
+    write_parser.add_argument('output')
+    write_parser.add_argument('--ast', action='store_true', help="parse it too and store the AST")
+    import_parser = commands.add_parser('import', help="convert an A2 *_lex.txt dump into a token file")
+    import_parser.add_argument('lex_file')
+    import_parser.add_argument('output')
+    export_parser = commands.add_parser('export', help="write a token file as an A2 *_lex.txt dump")
+    export_parser.add_argument('token_file')
+    export_parser.add_argument('output')
+    info_parser = commands.add_parser('info', help="describe a token file")
+    info_parser.add_argument('token_file')
+    args = arg_parser.parse_args()
+
+    if args.command == 'write':
+        with TokenFileWriter(args.output) as writer:
+            if args.ast:
+                with open(args.source) as f:
+                    tokens = tokenize(f.read())
+                writer.write_stream(tokens)
+                writer.write_program(Parser(tokens).program())
+            else:
+                writer.write_source_file(args.source)
+    elif args.command == 'import':
+        print(f"{import_lex_text(args.lex_file, args.output)} tokens")
+    elif args.command == 'export':
+        export_lex_text(TokenFile(args.token_file), args.output)
+    else:
+        token_file = TokenFile(args.token_file)
+        print(f"{len(token_file)} tokens in {len(token_file.chunks)} chunks"
+              f"{', identifiers and numbers erased' if token_file.erased else ''}"
+              f"{', with an AST' if token_file.program_offsets else ''}")
@@ -0,0 +1,261 @@
+from interpreter import RELOPS, Assign, BinOp, Compound, Num, Var
+
+try:
+    import numpy
+except ImportError:  # vectorization is optional; without NumPy every loop runs element by element
+    numpy = None
+
+# Vectorized execution of simple array loops for Evaluator(vectorize=True).
+#
+# A loop is vectorized when it has the canonical counted form
+#     while ( i < n ) { a[i] = <expr>; ... b[i] = <expr>; i = i + 1; }
+# (or i <= n): i is an int scalar, n a literal or a scalar variable, the body is a block without
+# declarations whose statements all store into an array element indexed by i, except the final
+# increment, and the expressions read only literals, scalar variables, i itself and array elements
+# indexed by i. Iteration k then touches element k of each array and nothing else, so there are no
+# loop-carried dependencies, and running each statement over the whole index range in turn gives
+# the same result as running the loop. Every other loop runs element by element as before.
+#
+# The vector code keeps the interpreter's semantics exactly: int values are Python ints that never
+# overflow, so every int operation's range is computed from its operands' bounds first, and integer
+# division, which is int(l / r), is only vectorized while both operands are exactly representable
+# as doubles. Whenever exact agreement cannot be guaranteed (a result that might not fit in 64 bits,
+# a zero divisor, an index out of bounds, a step budget about to run out) the arrays written so far
+# are restored and the loop is run element by element instead, which also raises any error at the
+# same iteration as it would have without vectorization.
+
+# Loops shorter than this are not worth the NumPy overhead
+MIN_LENGTH = 32
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# Ints of at most this magnitude convert to doubles exactly
+EXACT_DOUBLE = 2 ** 53
+
+DTYPES = {'int': 'int64', 'float': 'float64'}
+
+
+class Fallback(Exception):
+    # Raised when a loop has to run element by element after all
+    pass
+
+
+class LoopPlan:
+    __slots__ = ('counter', 'bound', 'inclusive', 'stores', 'arrays', 'written')
+
+    def __init__(self, counter, bound, inclusive, stores, arrays, written):
+        self.counter = counter      # the counter Var
+        self.bound = bound          # Num or scalar Var the counter is compared with
+        self.inclusive = inclusive  # True for i <= n
+        self.stores = stores        # the element assignments, in order
+        self.arrays = arrays        # (depth, slot) -> a Var naming each array the loop uses
+        self.written = written      # keys of the arrays the loop stores into
+
+
+def key(var):
+    return var.depth, var.slot
+
+
+class Vectorizer:
+    def __init__(self):
+        self.plans = {}  # While node -> LoopPlan, or None if the loop is not vectorizable
+
+    # Recognizing loops
+
+    def plan(self, node):
+        try:
+            return self.plans[node]
+        except KeyError:
+            plan = self.plans[node] = self.analyze(node) if numpy is not None else None
+            return plan
+
+    def analyze(self, node):
+        cond = node.cond
+        if cond.__class__ is not BinOp or cond.op not in ('<', '<='):
+            return None
+        counter, bound = cond.left, cond.right
+        if not self.is_scalar(counter) or counter.type != 'int':
+            return None
+        if bound.__class__ is not Num and not self.is_scalar(bound):
+            return None
+        body = node.body
+        if body.__class__ is not Compound or body.declarations or len(body.statements) < 2:
+            return None
+        *stores, increment = body.statements
+        if not self.is_increment(increment, counter):
+            return None
+        arrays = {}
+        written = set()
+        for store in stores:
+            if store.__class__ is not Assign or not self.is_element(store.target, counter):
+                return None
+            if not self.is_vectorizable(store.expr, counter, arrays):
+                return None
+            arrays[key(store.target)] = store.target
+            written.add(key(store.target))
+        # The bound and the other scalars are loop invariant: only arrays and the counter are assigned
+        if bound.__class__ is Var and key(bound) == key(counter):
+            return None
+        return LoopPlan(counter, bound, cond.op == '<=', stores, arrays, written)
+
+    def is_scalar(self, expr):
+        return expr.__class__ is Var and expr.index is None
+
+    def is_element(self, var, counter):
+        # An array element indexed by exactly the counter
+        return var.index is not None and self.is_scalar(var.index) and key(var.index) == key(counter)
+
+    def is_increment(self, statement, counter):
+        # counter = counter + 1, or counter = 1 + counter
+        if statement.__class__ is not Assign or not self.is_scalar(statement.target) or key(statement.target) != key(counter):
+            return False
+        expr = statement.expr
+        if expr.__class__ is not BinOp or expr.op != '+':
+            return False
+        for operand, other in ((expr.left, expr.right), (expr.right, expr.left)):
+            if self.is_scalar(operand) and key(operand) == key(counter) and other.__class__ is Num and other.value == 1:
+                return True
+        return False
+
+    def is_vectorizable(self, expr, counter, arrays):
+        cls = expr.__class__
+        if cls is Num:
+            return True
+        if cls is Var:
+            if expr.index is None:
+                return True
+            if not self.is_element(expr, counter):
+                return False
+            arrays[key(expr)] = expr
+            return True
+        return self.is_vectorizable(expr.left, counter, arrays) and self.is_vectorizable(expr.right, counter, arrays)
+
+    # Running loops
+
+    def run(self, node, evaluator):
+        """
+        Run the While node vectorized if it is a canonical loop and exact agreement with running it
+        element by element is certain; returns False, having changed nothing, otherwise.
+        """
+        plan = self.plan(node)
+        if plan is None:
+            return False
+        frames = evaluator.frames
+        counter_frame = frames[plan.counter.depth]
+        start = counter_frame[plan.counter.slot]
+        bound = plan.bound.value if plan.bound.__class__ is Num else frames[plan.bound.depth][plan.bound.slot]
+        stop = bound + 1 if plan.inclusive else bound
+        length = stop - start
+        if length < MIN_LENGTH:
+            return False
+        limits = evaluator.limits
+        if limits is not None and limits.max_steps is not None:
+            taken = limits.steps + limits.countdown - evaluator.countdown
+            if taken + length > limits.max_steps:
+                # Let the element-by-element loop stop at exactly the right iteration
+                return False
+
+        views = {}
+        for array_key, var in plan.arrays.items():
+            buffer = frames[array_key[0]][array_key[1]]
+            if start < 0 or stop > len(buffer):
+                # The loop raises an index error at some iteration
+                return False
+            views[array_key] = numpy.frombuffer(buffer, dtype=DTYPES[var.type])[start:stop]
+        saved = {array_key: views[array_key].copy() for array_key in plan.written}
+
+        self.counter = key(plan.counter)
+        self.start, self.stop = start, stop
+        self.frames = frames
+        self.views = views
+        self.evaluator = evaluator
+        try:
+            with numpy.errstate(all='ignore'):
+                for store in plan.stores:
+                    views[key(store.target)][:] = self.visit(store.expr)
+        except Exception:
+            # Fallback, or an error the element-by-element loop will raise at the right iteration
+            for array_key, values in saved.items():
+                views[array_key][:] = values
+            return False
+        finally:
+            self.frames = self.views = self.evaluator = None
+
+        counter_frame[plan.counter.slot] = stop
+        if limits is not None:
+            # Each iteration is a step, as in Evaluator.limited_while
+            while length >= evaluator.countdown:
+                length -= evaluator.countdown
+                evaluator.countdown = limits.check('while', node.line)
+            evaluator.countdown -= length
+        return True
+
+    # Expressions: each returns a NumPy vector over the index range, or a Python value if it is the
+    # same in every iteration
+
+    def visit(self, expr):
+        cls = expr.__class__
+        if cls is Num:
+            return expr.value
+        if cls is Var:
+            if expr.index is not None:
+                return self.views[key(expr)]
+            if key(expr) == self.counter:
+                return numpy.arange(self.start, self.stop, dtype='int64')
+            return self.frames[expr.depth][expr.slot]
+        left = self.visit(expr.left)
+        right = self.visit(expr.right)
+        if not isinstance(left, numpy.ndarray) and not isinstance(right, numpy.ndarray):
+            # Loop invariant: computed once, exactly as the interpreter computes it
+            return self.evaluator.visit_BinOp(expr)
+        op = expr.op
+        if op in RELOPS:
+            if expr.left.type == 'int':
+                check_int64(*bounds(left))
+                check_int64(*bounds(right))
+            # Relational expressions yield 1 or 0
+            return self.evaluator.COMPARISONS[op](left, right).astype('int64')
+        if expr.type == 'int':
+            return self.int_operation(op, left, right)
+        if op == '/':
+            if is_zero(right):
+                raise Fallback()
+            return left / right
+        return self.evaluator.OPERATIONS[op](left, right)
+
+    def int_operation(self, op, left, right):
+        # Python ints never overflow, so an operation is only done in 64 bits if its result must fit
+        left_low, left_high = bounds(left)
+        right_low, right_high = bounds(right)
+        if op == '+':
+            check_int64(left_low + right_low, left_high + right_high)
+        elif op == '-':
+            check_int64(left_low - right_high, left_high - right_low)
+        elif op == '*':
+            products = (left_low * right_low, left_low * right_high, left_high * right_low, left_high * right_high)
+            check_int64(min(products), max(products))
+        else:
+            # int(l / r) divides doubles, which is exact as long as both operands are exact doubles
+            if max(-left_low, left_high, -right_low, right_high) > EXACT_DOUBLE or is_zero(right):
+                raise Fallback()
+            return numpy.trunc(numpy.true_divide(left, right)).astype('int64')
+        return self.evaluator.OPERATIONS[op](left, right)
+
+
+def bounds(value):
+    # The smallest and largest element, as Python ints
+    if isinstance(value, numpy.ndarray):
+        return int(value.min()), int(value.max())
+    return value, value
+
+
+def check_int64(low, high):
+    if low < INT64_MIN or high > INT64_MAX:
+        raise Fallback()
+
+
+def is_zero(value):
+    # True if a divisor is zero in any iteration
+    if isinstance(value, numpy.ndarray):
+        return bool((value == 0).any())
+    return value == 0
@@ -0,0 +1,351 @@
+from interpreter import INITIAL_VALUES, SymbolTable, check_types, finish, nesting_room, new_array, program_height
+from optimizer import cannot_fail
+
+# Bytecode backend: Compiler lowers a parsed Program to a flat instruction array, VM runs it.
+#
+# Every instruction is two ints, an opcode and its argument (0 when unused), so the
+# dispatch loop can always read code[pc] and code[pc + 1] and advance pc by 2.
+# Variables live in numbered slots and literals in a constant pool, so nothing is
+# looked up by name at run time. Every declaration, in any scope, gets a slot of its
+# own; the program's global variables come first.
+
+OPNAMES = [
+    'LOAD_VAR',       # push slots[arg]
+    'LOAD_CONST',     # push consts[arg]
+    'STORE_VAR',      # slots[arg] = pop()
+    'LOAD_INDEX',     # index = pop(); push slots[arg][index]
+    'CHECK_INDEX',    # raise unless the index on top of the stack is within slots[arg]
+    'STORE_INDEX',    # value = pop(); index = pop(); slots[arg][index] = value
+    'NEW_ARRAY',      # slots[arg] = a fresh zero-filled array
+    'ADD',
+    'SUB',
+    'MUL',
+    'DIV',            # float division
+    'IDIV',           # int division, truncating toward zero
+    'LT',
+    'LE',
+    'GT',
+    'GE',
+    'EQ',
+    'NE',
+    'JUMP',           # pc = arg
+    'LOOP',           # a while loop's test: pc = arg if not pop(), else count a step
+    'JUMP_IF_FALSE',  # pc = arg if not pop()
+    'HALT',
+]
+
+(LOAD_VAR, LOAD_CONST, STORE_VAR, LOAD_INDEX, CHECK_INDEX, STORE_INDEX, NEW_ARRAY, ADD, SUB, MUL, DIV, IDIV,
+ LT, LE, GT, GE, EQ, NE, JUMP, LOOP, JUMP_IF_FALSE, HALT) = range(len(OPNAMES))
+
+BINARY_OPCODES = {
+    '+': ADD, '-': SUB, '*': MUL,
+    '<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE,
+}
+
+
+class Bytecode:
+    __slots__ = ('name', 'code', 'consts', 'names', 'types', 'sizes', 'nglobals', 'lines')
+
+    def __init__(self, name, code, consts, names, types, sizes, nglobals, lines):
+        self.name = name
+        self.code = code          # flat list of ints: opcode, argument, opcode, argument, ...
+        self.consts = consts      # constant pool
+        self.names = names        # slot number -> variable name
+        self.types = types        # slot number -> declared type
+        self.sizes = sizes        # slot number -> array size, None for scalars
+        self.nglobals = nglobals  # slots [0, nglobals) are the program's global variables
+        self.lines = lines        # instruction offset -> source line, for runtime errors
+
+
+class Compiler:
+    """
+    Lowers a Program built by Parser.program() to Bytecode.
+    The program is type-checked first, so type errors are raised at compile time and each
+    operator's result type is read off the annotated AST.
+    """
+    def __init__(self):
+        self.methods = {}
+
+    def visit(self, node):
+        # Dispatch on the node class name, e.g. Assign -> visit_Assign
+        cls = node.__class__
+        method = self.methods.get(cls)
+        if method is None:
+            method = self.methods[cls] = getattr(self, 'visit_' + cls.__name__)
+        return method(node)
+
+    def compile(self, program):
+        check_types(program)
+        self.code = []
+        self.lines = []
+        self.consts = []
+        self.const_index = {}
+        self.names = []
+        self.types = []
+        self.sizes = []
+        self.line = program.line
+        # scopes[depth] maps the active scope's frame slots at that depth to VM slots
+        self.scopes = [self.declare(program.declarations)]
+        with nesting_room(program_height(program)):
+            for statement in program.statements:
+                self.visit(statement)
+        self.emit(HALT)
+        return Bytecode(program.name, self.code, self.consts, self.names, self.types, self.sizes,
+                        len(program.declarations), self.lines)
+
+    def emit(self, opcode, arg=0):
+        self.code.append(opcode)
+        self.code.append(arg)
+        self.lines.append(self.line)
+        return len(self.code) - 2
+
+    def patch(self, offset, target):
+        self.code[offset + 1] = target
+
+    def const(self, value):
+        # (type, value) keys keep 1 and 1.0 apart
+        key = (type(value), value)
+        index = self.const_index.get(key)
+        if index is None:
+            index = self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return index
+
+    def declare(self, declarations):
+        # Give each declaration a fresh VM slot; returns the VM slots in frame order
+        slots = []
+        for declaration in declarations:
+            slots.append(len(self.names))
+            self.names.append(declaration.name)
+            self.types.append(declaration.type)
+            self.sizes.append(declaration.size)
+        return slots
+
+    def slot(self, var):
+        return self.scopes[var.depth][var.slot]
+
+    # Statements
+
+    def visit_Assign(self, node):
+        self.line = node.line
+        target = node.target
+        slot = self.slot(target)
+        index = target.index
+        if index is not None:
+            self.visit(index)
+            # A bad index must be reported before any error computing the value, as Evaluator does;
+            # if computing the value cannot fail, STORE_INDEX checking the index is soon enough
+            if not cannot_fail(node.expr):
+                self.emit(CHECK_INDEX, slot)
+        self.visit(node.expr)
+        self.emit(STORE_VAR if index is None else STORE_INDEX, slot)
+
+    def visit_Compound(self, node):
+        if node.declarations:
+            scopes = self.scopes
+            while len(scopes) <= node.depth:
+                scopes.append(None)
+            slots = scopes[node.depth] = self.declare(node.declarations)
+            # Entering the block zeroes its variables, as Evaluator's fresh frame does
+            self.line = node.line
+            for declaration, slot in zip(node.declarations, slots):
+                if declaration.size is not None:
+                    self.emit(NEW_ARRAY, slot)
+                else:
+                    self.emit(LOAD_CONST, self.const(INITIAL_VALUES.get(declaration.type)))
+                    self.emit(STORE_VAR, slot)
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_If(self, node):
+        self.line = node.line
+        self.visit(node.cond)
+        jump_to_else = self.emit(JUMP_IF_FALSE)
+        self.visit(node.then)
+        if node.orelse is None:
+            self.patch(jump_to_else, len(self.code))
+        else:
+            jump_to_end = self.emit(JUMP)
+            self.patch(jump_to_else, len(self.code))
+            self.visit(node.orelse)
+            self.patch(jump_to_end, len(self.code))
+
+    def visit_While(self, node):
+        self.line = node.line
+        loop_start = len(self.code)
+        self.visit(node.cond)
+        self.line = node.line
+        jump_to_end = self.emit(LOOP)
+        self.visit(node.body)
+        self.line = node.line
+        self.emit(JUMP, loop_start)
+        self.patch(jump_to_end, len(self.code))
+
+    # Expressions: each emits code leaving one value on the stack
+
+    def visit_Num(self, node):
+        self.emit(LOAD_CONST, self.const(node.value))
+
+    def visit_Var(self, node):
+        if node.index is None:
+            self.emit(LOAD_VAR, self.slot(node))
+        else:
+            self.visit(node.index)
+            self.emit(LOAD_INDEX, self.slot(node))
+
+    def visit_BinOp(self, node):
+        op = node.op
+        self.visit(node.left)
+        self.visit(node.right)
+        self.line = node.line
+        if op == '/':
+            self.emit(IDIV if node.type == 'int' else DIV)
+        else:
+            self.emit(BINARY_OPCODES[op])
+
+
+class VM:
+    """
+    Stack machine for Bytecode. run() mirrors Evaluator.run(): it starts from zeroed
+    variables and returns a SymbolTable with the final values, and takes the same ExecutionLimits.
+    """
+    def __init__(self):
+        self.slots = None
+
+    def run(self, bytecode, limits=None):
+        return finish(self.execute(bytecode, limits))
+
+    def execute(self, bytecode, limits=None):
+        # Generator running the program: it pauses after every limits check, so a caller can
+        # interleave runs, and returns the final SymbolTable
+        code = bytecode.code
+        consts = bytecode.consts
+        slots = self.slots = [INITIAL_VALUES.get(var_type) if size is None else new_array(var_type, size)
+                              for var_type, size in zip(bytecode.types, bytecode.sizes)]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        # Each LOOP counts down to the next limits check; without limits the countdown never reaches 0
+        countdown = limits.start() if limits is not None else -1
+        # Opcodes are tested roughly in order of how often typical loops execute them
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if op == LOAD_VAR:
+                push(slots[arg])
+            elif op == LOAD_CONST:
+                push(consts[arg])
+            elif op == STORE_VAR:
+                slots[arg] = pop()
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == LOAD_INDEX:
+                buffer = slots[arg]
+                index = stack[-1]
+                if not 0 <= index < len(buffer):
+                    self.index_error(bytecode, arg, index)
+                stack[-1] = buffer[index]
+            elif op == STORE_INDEX:
+                value = pop()
+                index = pop()
+                buffer = slots[arg]
+                if not 0 <= index < len(buffer):
+                    self.index_error(bytecode, arg, index)
+                try:
+                    buffer[index] = value
+                except OverflowError:
+                    raise Exception(f"Runtime error: Value {value} does not fit in an element of array '{bytecode.names[arg]}'.")
+            elif op == LOOP:
+                if not pop():
+                    pc = arg
+                else:
+                    countdown -= 1
+                    if not countdown:
+                        countdown = limits.check('while', bytecode.lines[(pc - 2) // 2])
+                        yield
+            elif op == JUMP:
+                pc = arg
+            elif op == CHECK_INDEX:
+                index = stack[-1]
+                if not 0 <= index < len(slots[arg]):
+                    self.index_error(bytecode, arg, index)
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == LT:
+                right = pop()
+                stack[-1] = 1 if stack[-1] < right else 0
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == LE:
+                right = pop()
+                stack[-1] = 1 if stack[-1] <= right else 0
+            elif op == GT:
+                right = pop()
+                stack[-1] = 1 if stack[-1] > right else 0
+            elif op == GE:
+                right = pop()
+                stack[-1] = 1 if stack[-1] >= right else 0
+            elif op == EQ:
+                right = pop()
+                stack[-1] = 1 if stack[-1] == right else 0
+            elif op == NE:
+                right = pop()
+                stack[-1] = 1 if stack[-1] != right else 0
+            elif op == IDIV:
+                right = pop()
+                if right == 0:
+                    raise Exception("Runtime error: Division by zero.")
+                stack[-1] = int(stack[-1] / right)
+            elif op == DIV:
+                right = pop()
+                if right == 0:
+                    raise Exception("Runtime error: Division by zero.")
+                stack[-1] = stack[-1] / right
+            elif op == NEW_ARRAY:
+                slots[arg] = new_array(bytecode.types[arg], bytecode.sizes[arg])
+            elif op == HALT:
+                break
+            else:
+                raise Exception(f"Unknown opcode {op} at offset {pc - 2}")
+        return self.symbol_table(bytecode)
+
+    def index_error(self, bytecode, slot, index):
+        raise Exception(f"Runtime error: Index {index} out of bounds for array '{bytecode.names[slot]}' of size {bytecode.sizes[slot]}.")
+
+    def symbol_table(self, bytecode):
+        # Rebuild the debug view Evaluator produces, so print_table works for both backends
+        symbol_table = SymbolTable()
+        for slot in range(bytecode.nglobals):
+            symbol_table.declare(bytecode.names[slot], bytecode.types[slot], bytecode.sizes[slot]).value = self.slots[slot]
+        return symbol_table
+
+
+def disassemble(bytecode):
+    """
+    Return a human-readable listing of the bytecode, one instruction per line.
+    """
+    lines = [f"Program {bytecode.name}: {len(bytecode.code) // 2} instructions, "
+             f"{len(bytecode.consts)} constants, {len(bytecode.names)} slots"]
+    code = bytecode.code
+    for offset in range(0, len(code), 2):
+        op, arg = code[offset], code[offset + 1]
+        if op == LOAD_CONST:
+            operand = f"{arg} ({bytecode.consts[arg]!r})"
+        elif op in (LOAD_VAR, STORE_VAR, LOAD_INDEX, CHECK_INDEX, STORE_INDEX, NEW_ARRAY):
+            operand = f"{arg} ({bytecode.names[arg]})"
+        elif op in (JUMP, LOOP, JUMP_IF_FALSE):
+            operand = f"-> {arg}"
+        else:
+            operand = ''
+        line = bytecode.lines[offset // 2]
+        source_line = f"{line:>4}" if line is not None else '    '
+        lines.append(f"{source_line} {offset:>6} {OPNAMES[op]:<14} {operand}".rstrip())
+    return '\n'.join(lines)